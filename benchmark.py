@@ -0,0 +1,992 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+def bench_link_store(sizes=(100_000, 1_000_000), batch_size=20):
+    """
+    Đo tốc độ thêm liên kết vào LinkStore, mỗi lần thêm batch_size liên kết
+    (tương đương số sản phẩm trên một trang danh sách).
+    Mỗi lô gồm một nửa liên kết mới và một nửa liên kết đã có để đo cả việc kiểm tra trùng lặp.
+    """
+    from linkStore import LinkStore
+
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            with LinkStore(os.path.join(tmp, 'links.db')) as store:
+                start = time.perf_counter()
+                inserted = 0
+                for offset in range(0, size, batch_size):
+                    links = [f"https://batdongsan.com.vn/ban-nha-pr{i}" for i in range(offset, offset + batch_size)]
+                    # Lặp lại một nửa lô trước đó để mô phỏng liên kết trùng lặp
+                    links += [f"https://batdongsan.com.vn/ban-nha-pr{i}" for i in range(max(0, offset - batch_size // 2), offset)]
+                    inserted += store.add_links(links)
+                elapsed = time.perf_counter() - start
+        result = {
+            "links": size,
+            "inserted": inserted,
+            "seconds": round(elapsed, 2),
+            "links_per_second": round(inserted / elapsed),
+        }
+        print(f"LinkStore {size:>10,} liên kết: {result['seconds']} giây, {result['links_per_second']:,} liên kết/giây")
+        results.append(result)
+    return results
+
+def _load_sample_records(source_file='property_data.csv'):
+    """Đọc các bản ghi mẫu từ file dữ liệu có sẵn, bỏ các ô rỗng giống bản ghi cào được"""
+    with open(source_file, 'r', encoding='utf-8-sig', newline='') as f:
+        return [{k: v for k, v in row.items() if v} for row in csv.DictReader(f)]
+
+def _legacy_append(records, output_file):
+    """Cách ghi cũ: đọc lại toàn bộ file CSV mỗi lô để so sánh cột"""
+    import pandas as pd
+    df = pd.DataFrame(records)
+    if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+        existing_df = pd.read_csv(output_file)
+        if set(existing_df.columns) != set(df.columns):
+            pd.concat([existing_df, df], ignore_index=True).to_csv(output_file, index=False, encoding='utf-8-sig')
+        else:
+            df.to_csv(output_file, mode='a', header=False, index=False, encoding='utf-8-sig')
+    else:
+        df.to_csv(output_file, index=False, encoding='utf-8-sig')
+
+def bench_csv_sink(total_records=20000, checkpoint=2000, flush_size=200, legacy=True):
+    """
+    Đo chi phí ghi mỗi bản ghi khi file CSV lớn dần: cách ghi mới (write_records, lô flush_size)
+    so với cách cũ (đọc lại file bằng pandas mỗi 10 bản ghi).
+    """
+    from csvSink import write_records
+
+    samples = _load_sample_records()
+    records = [samples[i % len(samples)] for i in range(total_records)]
+    methods = [("sink", flush_size)]
+    if legacy:
+        methods.append(("legacy", 10))
+
+    results = []
+    for method, batch in methods:
+        with tempfile.TemporaryDirectory() as tmp:
+            output_file = os.path.join(tmp, 'property_data.csv')
+            columns = []
+            elapsed = 0.0
+            for offset in range(0, total_records, batch):
+                chunk = records[offset:offset + batch]
+                start = time.perf_counter()
+                if method == "sink":
+                    write_records(chunk, output_file, columns)
+                else:
+                    _legacy_append(chunk, output_file)
+                elapsed += time.perf_counter() - start
+
+                written = offset + len(chunk)
+                if written % checkpoint == 0 or written == total_records:
+                    result = {
+                        "method": method,
+                        "records": written,
+                        "us_per_record": round(elapsed / checkpoint * 1e6),
+                    }
+                    print(f"{method:>6} {written:>7,} bản ghi: {result['us_per_record']:>7,} µs/bản ghi")
+                    results.append(result)
+                    elapsed = 0.0
+    return results
+
+def _task_duration(task_id):
+    """Thời gian xử lý giả lập của một URL: đa số nhanh, một ít trang rất chậm"""
+    rng = random.Random(task_id)
+    return rng.uniform(0.3, 0.6) if rng.random() < 0.03 else rng.uniform(0.01, 0.04)
+
+def _static_worker(task_ids):
+    """Tiến trình xử lý một phần danh sách chia sẵn"""
+    busy = 0.0
+    for task_id in task_ids:
+        duration = _task_duration(task_id)
+        time.sleep(duration)
+        busy += duration
+    return busy
+
+def _dynamic_worker(args):
+    """Tiến trình nhận việc từ frontier theo lô nhỏ cho đến khi hết"""
+    from frontier import Frontier, DETAIL
+    frontier_file, lease_batch = args
+    busy = 0.0
+    with Frontier(frontier_file) as frontier:
+        while True:
+            keys = frontier.lease(DETAIL, limit=lease_batch, lease_seconds=60)
+            if not keys:
+                return busy
+            for key in keys:
+                duration = _task_duration(int(key))
+                time.sleep(duration)
+                busy += duration
+            frontier.complete(DETAIL, keys)
+
+def bench_scheduler(num_tasks=600, num_workers=4, lease_batch=5):
+    """
+    So sánh chia việc cố định theo num_workers phần (cách cũ) với việc các tiến trình
+    cùng nhận lô nhỏ từ frontier, trên các công việc giả lập có thời gian không đều.
+    """
+    from frontier import Frontier, DETAIL
+
+    task_ids = list(range(num_tasks))
+    results = []
+    for method in ("static", "dynamic"):
+        with tempfile.TemporaryDirectory() as tmp:
+            if method == "static":
+                chunk_size = num_tasks // num_workers
+                jobs = [task_ids[i * chunk_size:(i + 1) * chunk_size if i < num_workers - 1 else num_tasks]
+                        for i in range(num_workers)]
+                worker = _static_worker
+            else:
+                frontier_file = os.path.join(tmp, 'frontier.db')
+                with Frontier(frontier_file) as frontier:
+                    frontier.add(DETAIL, task_ids)
+                jobs = [(frontier_file, lease_batch)] * num_workers
+                worker = _dynamic_worker
+
+            start = time.perf_counter()
+            with multiprocessing.Pool(num_workers) as pool:
+                busy = sum(pool.map(worker, jobs))
+            elapsed = time.perf_counter() - start
+
+        result = {
+            "method": method,
+            "seconds": round(elapsed, 2),
+            "tasks_per_second": round(num_tasks / elapsed, 1),
+            "utilisation": round(busy / (elapsed * num_workers) * 100, 1),
+        }
+        print(f"{method:>7}: {result['seconds']} giây, {result['tasks_per_second']} việc/giây, "
+              f"sử dụng {result['utilisation']}%")
+        results.append(result)
+    return results
+
+def bench_rate_control(num_pages=150, concurrency=8, capacity=6, error_rate=0.02, latency=0.1):
+    """
+    Chạy discover_links với RateController trên máy chủ giả lập có độ trễ, lỗi ngẫu nhiên
+    và giới hạn capacity yêu cầu/giây (vượt quá sẽ bị chặn bằng HTTP 429), rồi in
+    diễn biến giới hạn của RateController.
+    """
+    from crawlLink import discover_links
+    from httpExtract import create_session
+    from localServer import start_server
+    from pacing import RateController, format_limits
+
+    server = start_server(latency=latency, jitter=latency, error_rate=error_rate, capacity=capacity)
+    controller = RateController(initial_rate=2.0, initial_concurrency=2, max_concurrency=concurrency,
+                                target_latency=latency * 5, backoff_base=1.0, backoff_max=8.0)
+    session = create_session(pool_size=concurrency)
+    listing_url = server.base_url + "/nha-dat-ban-ha-noi/p{}"
+
+    ok = failed = 0
+    start = time.perf_counter()
+    try:
+        for done, (page, links, error) in enumerate(
+                discover_links(range(1, num_pages + 1), concurrency, session,
+                               rate_controller=controller, listing_url=listing_url), 1):
+            if error:
+                failed += 1
+            else:
+                ok += 1
+            if done % 25 == 0:
+                print(f"[{done}/{num_pages}] {format_limits(controller.limits())}")
+    finally:
+        session.close()
+        server.shutdown()
+    elapsed = time.perf_counter() - start
+
+    limits = next(iter(controller.limits().values()))
+    result = {
+        "pages": num_pages,
+        "ok": ok,
+        "failed": failed,
+        "seconds": round(elapsed, 2),
+        "pages_per_second": round(num_pages / elapsed, 2),
+        "server_capacity": capacity,
+        "final_limits": limits,
+    }
+    print(f"{ok}/{num_pages} trang thành công, {failed} lỗi, {result['pages_per_second']} trang/giây "
+          f"(máy chủ cho phép {capacity}/giây)")
+    return [result]
+
+def bench_lean_mode(input_csv='linkProduct.csv', num_urls=10, wait_timeout=15):
+    """
+    Tải cùng các trang chi tiết bằng Chrome đầy đủ và Chrome ở chế độ tải gọn (leanMode),
+    so sánh dung lượng tải về và thời gian tải trung bình mỗi trang. Cần Chrome và mạng.
+    URL lấy từ input_csv (file liên kết của filterData.py); báo lỗi nếu không có URL hoặc
+    không tải được trang nào thay vì báo tiết kiệm 0 KB.
+    """
+    from leanMode import page_weight
+    from main import READY_SELECTOR, read_urls_from_csv, setup_driver
+    from driverPool import wait_for_selector
+
+    urls = read_urls_from_csv(input_csv)[:num_urls]
+    if not urls:
+        raise ValueError(f"Không có URL nào trong {input_csv}, chạy crawlLink.py và filterData.py trước")
+    results = []
+    for lean in (False, True):
+        driver = setup_driver(lean=lean)
+        weights = []
+        try:
+            for url in urls:
+                start = time.perf_counter()
+                try:
+                    driver.get(url)
+                    wait_for_selector(driver, READY_SELECTOR, wait_timeout)
+                except Exception as e:
+                    print(f"Lỗi khi tải {url}: {str(e)[:100]}")
+                    continue
+                weight = page_weight(driver)
+                weight["seconds"] = time.perf_counter() - start
+                weights.append(weight)
+        finally:
+            driver.quit()
+
+        if not weights:
+            raise RuntimeError(f"Không tải được trang nào trong {len(urls)} URL ở chế độ {'lean' if lean else 'full'}")
+        count = len(weights)
+        result = {
+            "mode": "lean" if lean else "full",
+            "pages": len(weights),
+            "avg_kb": round(sum(w["bytes"] for w in weights) / count / 1024, 1),
+            "avg_resources": round(sum(w["resources"] for w in weights) / count, 1),
+            "avg_seconds": round(sum(w["seconds"] for w in weights) / count, 2),
+        }
+        print(f"{result['mode']:>4}: {result['pages']} trang, {result['avg_kb']} KB/trang, "
+              f"{result['avg_resources']} tài nguyên/trang, {result['avg_seconds']} giây/trang")
+        results.append(result)
+
+    full, lean = results
+    print(f"Tiết kiệm {full['avg_kb'] - lean['avg_kb']:.1f} KB và "
+          f"{full['avg_seconds'] - lean['avg_seconds']:.2f} giây mỗi trang")
+    return results
+
+def _count_round_trips(driver):
+    """Bọc driver.execute để đếm số lệnh WebDriver (mỗi lệnh là một lượt HTTP tới chromedriver)"""
+    counter = {"calls": 0}
+    execute = driver.execute
+
+    def counting_execute(*args, **kwargs):
+        counter["calls"] += 1
+        return execute(*args, **kwargs)
+
+    driver.execute = counting_execute
+    return counter
+
+def _legacy_spec_data(driver):
+    """Cách đọc cũ của crawl_property_info: find_elements rồi item.text cho từng khối"""
+    from selenium.webdriver.common.by import By
+    from httpExtract import add_spec_text
+
+    property_data = {}
+    for selector in ("div.re__pr-specs-content-item", "div.re__pr-short-info-item.js__pr-config-item"):
+        for item in driver.find_elements(By.CSS_SELECTOR, selector):
+            add_spec_text(property_data, item.text)
+    return property_data
+
+def _legacy_card_hrefs(driver, card_selector):
+    """Cách đọc cũ của crawl_batdongsan: find_element/get_attribute cho từng thẻ sản phẩm"""
+    from selenium.webdriver.common.by import By
+
+    container = driver.find_element(By.ID, "product-lists-web")
+    return [card.find_element(By.TAG_NAME, "a").get_attribute("href")
+            for card in container.find_elements(By.CSS_SELECTOR, card_selector)]
+
+def bench_round_trips(num_pages=20):
+    """
+    So sánh số lượt gọi WebDriver và thời gian trích xuất mỗi trang giữa cách đọc từng phần tử
+    và một lần execute_script (domExtract), trên trang chi tiết và trang danh sách của máy chủ
+    giả lập. Cần Chrome.
+    """
+    from crawlLink import CARD_SELECTOR
+    from domExtract import extract_card_hrefs, extract_spec_data
+    from localServer import start_server
+    from main import setup_driver
+
+    server = start_server(latency=0.0, jitter=0.0)
+    driver = setup_driver(lean=True)
+    counter = _count_round_trips(driver)
+    methods = [
+        ("detail", "legacy", lambda: _legacy_spec_data(driver)),
+        ("detail", "script", lambda: extract_spec_data(driver)),
+        ("listing", "legacy", lambda: _legacy_card_hrefs(driver, CARD_SELECTOR)),
+        ("listing", "script", lambda: extract_card_hrefs(driver, CARD_SELECTOR)),
+    ]
+    results = []
+    try:
+        for page_type, method, extract in methods:
+            calls = 0
+            elapsed = 0.0
+            for i in range(1, num_pages + 1):
+                if page_type == "detail":
+                    driver.get(f"{server.base_url}/ban-nha-rieng-pr{i}")
+                else:
+                    driver.get(f"{server.base_url}/nha-dat-ban-ha-noi/p{i}")
+                counter["calls"] = 0
+                start = time.perf_counter()
+                extract()
+                elapsed += time.perf_counter() - start
+                calls += counter["calls"]
+            result = {
+                "page": page_type,
+                "method": method,
+                "round_trips_per_page": round(calls / num_pages, 1),
+                "ms_per_page": round(elapsed / num_pages * 1000, 2),
+            }
+            print(f"{page_type:>7} {method:>6}: {result['round_trips_per_page']} lượt gọi/trang, "
+                  f"{result['ms_per_page']} ms/trang")
+            results.append(result)
+    finally:
+        driver.quit()
+        server.shutdown()
+    return results
+
+def _normalize_row(row):
+    """Cách chuẩn hóa từng dòng bằng DataFrame.apply, dùng làm mốc so sánh với normalizeData"""
+    import re
+    from datetime import datetime
+    import pandas as pd
+    from normalizeData import (DATE_COLUMNS, DATE_FORMAT, LISTING_ID_COLUMN, MEASURE_COLUMNS,
+                               NEGOTIABLE_PATTERN, NUMBER_PATTERN, PRICE_COLUMN, PRICE_PATTERN, PRICE_UNITS)
+
+    def number(text):
+        return float(text.replace(".", "").replace(",", "."))
+
+    result = {}
+    for source, (target, unit, _) in MEASURE_COLUMNS.items():
+        match = re.match(rf"^({NUMBER_PATTERN})\s*{unit}$", str(row[source]).strip())
+        result[target] = number(match.group(1)) if match else None
+
+    price = str(row[PRICE_COLUMN]).strip()
+    match = re.match(PRICE_PATTERN, price)
+    area = result["area_m2"] if result["area_m2"] else None
+    amount = number(match.group("value")) * PRICE_UNITS[match.group("unit")] if match else None
+    per_m2 = bool(match and match.group("per_m2"))
+    result["price_vnd"] = amount * area if per_m2 and area else (None if per_m2 else amount)
+    result["price_per_m2_vnd"] = amount if per_m2 else (amount / area if amount and area else None)
+    result["price_negotiable"] = bool(re.match(NEGOTIABLE_PATTERN, price, re.IGNORECASE))
+
+    for source, target in DATE_COLUMNS.items():
+        try:
+            result[target] = datetime.strptime(str(row[source]).strip(), DATE_FORMAT)
+        except ValueError:
+            result[target] = None
+
+    listing_id = str(row[LISTING_ID_COLUMN]).strip()
+    result["listing_id"] = int(listing_id) if listing_id.isdigit() else None
+    return pd.Series(result)
+
+def bench_normalize(source_file='property_data.csv', repeat=3):
+    """
+    So sánh thời gian chuẩn hóa file dữ liệu bằng normalize_frame (phép toán vector của
+    pandas/NumPy) với cách xử lý từng dòng bằng DataFrame.apply, và kiểm tra hai cách cho cùng kết quả.
+    """
+    import pandas as pd
+    from normalizeData import normalize_frame
+
+    df = pd.read_csv(source_file, dtype=str, encoding='utf-8-sig')
+    timings = {}
+    for method, run in (("vectorized", lambda: normalize_frame(df)),
+                        ("apply", lambda: df.apply(_normalize_row, axis=1))):
+        best = None
+        for _ in range(repeat if method == "vectorized" else 1):
+            start = time.perf_counter()
+            output = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[method] = (best, output)
+
+    vectorized, applied = timings["vectorized"][1], timings["apply"][1]
+    mismatched = [
+        column for column in applied.columns
+        if not vectorized[column].astype("string").fillna("").equals(
+            applied[column].astype(vectorized[column].dtype).astype("string").fillna(""))
+    ]
+
+    results = []
+    for method, (elapsed, _) in timings.items():
+        result = {
+            "method": method,
+            "rows": len(df),
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(len(df) / elapsed),
+        }
+        print(f"{method:>10}: {result['seconds']} giây, {result['rows_per_second']:,} dòng/giây")
+        results.append(result)
+    speedup = timings["apply"][0] / timings["vectorized"][0]
+    print(f"Nhanh hơn {speedup:.0f} lần, cột khác nhau: {mismatched or 'không có'}")
+    results.append({"speedup": round(speedup, 1), "mismatched_columns": mismatched})
+    return results
+
+def _resource_usage():
+    """Thời gian CPU (giây) và RSS lớn nhất (MB) của tiến trình hiện tại cộng các tiến trình con"""
+    import resource
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "cpu": own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        # ru_maxrss tính bằng KB trên Linux
+        "peak_rss_mb": max(own.ru_maxrss, children.ru_maxrss) / 1024,
+    }
+
+def _stage_result(stage, pages, elapsed, latencies, usage_before, p50=None, p95=None):
+    """Kết quả một giai đoạn: trang/giây, độ trễ p50/p95 (ms), CPU và RSS lớn nhất"""
+    from pacing import percentile
+
+    usage = _resource_usage()
+    p50 = percentile(latencies, 0.5) if p50 is None else p50
+    p95 = percentile(latencies, 0.95) if p95 is None else p95
+    result = {
+        "stage": stage,
+        "pages": pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+        "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        "cpu_seconds": round(usage["cpu"] - usage_before["cpu"], 2),
+        "peak_rss_mb": round(usage["peak_rss_mb"], 1),
+    }
+    print(f"{stage:>16}: {result['pages']} trang, {result['pages_per_second']} trang/giây, "
+          f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, CPU {result['cpu_seconds']} giây, "
+          f"RSS {result['peak_rss_mb']} MB")
+    return result
+
+def _git_version():
+    """Mã commit hiện tại để đánh dấu kết quả đo, None nếu không lấy được"""
+    import subprocess
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+def compare_pipeline_results(previous, current, tolerance=0.1, min_seconds=0.1):
+    """
+    So sánh hai lần đo bench_pipeline, in các giai đoạn chậm đi quá tolerance
+    (trang/giây giảm hoặc p95 tăng). Giai đoạn chạy dưới min_seconds quá ngắn để so sánh.
+
+    Returns:
+        list: Các dòng mô tả giai đoạn bị chậm đi
+    """
+    before = {stage["stage"]: stage for stage in previous["stages"]}
+    regressions = []
+    for stage in current["stages"]:
+        old = before.get(stage["stage"])
+        if not old or stage.get("skipped") or old.get("skipped"):
+            continue
+        if min(old["seconds"], stage["seconds"]) < min_seconds:
+            continue
+        if old["pages_per_second"] and stage["pages_per_second"] is not None \
+                and stage["pages_per_second"] < old["pages_per_second"] * (1 - tolerance):
+            regressions.append(f"{stage['stage']}: {old['pages_per_second']} -> {stage['pages_per_second']} trang/giây")
+        if old["p95_ms"] and stage["p95_ms"] is not None and stage["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{stage['stage']}: p95 {old['p95_ms']} -> {stage['p95_ms']} ms")
+    return regressions
+
+def bench_pipeline(listing_pages=20, detail_pages=300, num_processes=4, latency=0.05, jitter=0.05,
+                   recordings_dir=None, selenium_pages=3, json_pages=200, results_dir='bench_results'):
+    """
+    Đo toàn bộ quy trình trên máy chủ giả lập (trang đã ghi trong recordings_dir nếu có,
+    ngược lại trang sinh ra) thay vì trang thật:
+
+    - listing_http: discover_links tải listing_pages trang danh sách
+    - listing_selenium: crawl_batdongsan với Chrome (bỏ qua nếu không khởi động được Chrome)
+    - detail_workers: process_with_multiprocessing tải detail_pages trang chi tiết bằng HTTP
+    - csv_writer, json_writer: ghi bản ghi bằng write_records và liên kết của json_pages trang
+      danh sách bằng save_links_to_json
+
+    Kết quả được lưu vào results_dir và so sánh với lần đo trước để phát hiện chậm đi.
+    """
+    import contextlib
+    import io
+    from crawlLink import crawl_batdongsan, discover_links, save_links_to_json
+    from csvSink import write_records
+    from frontier import Frontier, DETAIL
+    from httpExtract import create_session
+    from linkStore import LinkStore
+    from localServer import start_server
+    from main import process_with_multiprocessing
+
+    server = start_server(latency=latency, jitter=jitter, recordings_dir=recordings_dir)
+    listing_url = server.base_url + "/nha-dat-ban-ha-noi/p{}"
+    stages = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Trang danh sách bằng HTTP, độ trễ lấy từ response.elapsed của từng yêu cầu
+            latencies = []
+            session = create_session(pool_size=8)
+            session.hooks["response"].append(lambda response, *args, **kwargs: latencies.append(
+                response.elapsed.total_seconds()))
+            usage = _resource_usage()
+            start = time.perf_counter()
+            links = []
+            for page, page_links, error in discover_links(range(1, listing_pages + 1), 8, session,
+                                                          listing_url=listing_url):
+                links.extend(page_links or [])
+            stages.append(_stage_result("listing_http", listing_pages, time.perf_counter() - start,
+                                        latencies, usage))
+            session.close()
+
+            # Trang danh sách bằng Selenium
+            usage = _resource_usage()
+            latencies = []
+            try:
+                with LinkStore(os.path.join(tmp, "links.db")) as store, contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    for page in range(1, selenium_pages + 1):
+                        page_start = time.perf_counter()
+                        crawl_batdongsan(page, store, listing_url=listing_url)
+                        latencies.append(time.perf_counter() - page_start)
+                stages.append(_stage_result("listing_selenium", selenium_pages, time.perf_counter() - start,
+                                            latencies, usage))
+            except Exception as e:
+                print(f"{'listing_selenium':>16}: bỏ qua, không khởi động được Chrome ({str(e).splitlines()[0]})")
+                stages.append({"stage": "listing_selenium", "skipped": str(e).splitlines()[0]})
+
+            # Trang chi tiết với các tiến trình của main.py, độ trễ p50/p95 lấy từ RateController
+            frontier_file = os.path.join(tmp, "frontier.db")
+            detail_urls = (links * (detail_pages // max(1, len(links)) + 1))[:detail_pages]
+            detail_urls = [f"{url}?n={i}" for i, url in enumerate(detail_urls)]
+            with Frontier(frontier_file) as frontier:
+                frontier.add(DETAIL, detail_urls)
+            output_file = os.path.join(tmp, "property_data.csv")
+            usage = _resource_usage()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                limits = process_with_multiprocessing(
+                    frontier_file, num_processes, output_file, engine='http', poll_interval=0.2,
+                    page_interval=(0.0, 0.0), dead_letter_file=os.path.join(tmp, "dead_letter.jsonl"),
+                    rate_settings={"initial_rate": 100.0, "max_rate": 1000.0, "target_latency": 10.0})
+            elapsed = time.perf_counter() - start
+            with Frontier(frontier_file) as frontier:
+                done = frontier.counts(DETAIL)["done"]
+            host = limits.get(server.base_url.split("//")[1], {})
+            stages.append(_stage_result("detail_workers", done, elapsed, [], usage,
+                                        p50=host.get("p50"), p95=host.get("p95")))
+
+            # Ghi bản ghi vào CSV theo lô như tiến trình ghi
+            records = _load_sample_records(output_file)
+            latencies = []
+            columns = []
+            usage = _resource_usage()
+            start = time.perf_counter()
+            for offset in range(0, len(records), 200):
+                batch_start = time.perf_counter()
+                write_records(records[offset:offset + 200], os.path.join(tmp, "sink.csv"), columns)
+                latencies.append(time.perf_counter() - batch_start)
+            stages.append(_stage_result("csv_writer", len(records), time.perf_counter() - start, latencies, usage))
+
+            # Cộng dồn liên kết của từng trang danh sách vào file JSON như crawl_batdongsan
+            latencies = []
+            json_file = os.path.join(tmp, "links.json")
+            usage = _resource_usage()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for page in range(json_pages):
+                    batch_start = time.perf_counter()
+                    save_links_to_json([f"{link}?page={page}" for link in links[:20]], json_file)
+                    latencies.append(time.perf_counter() - batch_start)
+            stages.append(_stage_result("json_writer", len(latencies), time.perf_counter() - start,
+                                        latencies, usage))
+    finally:
+        server.shutdown()
+
+    result = {
+        "version": _git_version(),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "settings": {"listing_pages": listing_pages, "detail_pages": detail_pages, "num_processes": num_processes,
+                     "latency": latency, "jitter": jitter, "recordings_dir": recordings_dir},
+        "stages": stages,
+    }
+    if results_dir:
+        os.makedirs(results_dir, exist_ok=True)
+        previous_files = sorted(f for f in os.listdir(results_dir) if f.startswith("pipeline-"))
+        if previous_files:
+            with open(os.path.join(results_dir, previous_files[-1]), "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            regressions = compare_pipeline_results(previous, result)
+            print(f"So với {previous_files[-1]} (phiên bản {previous.get('version')}): "
+                  + ("; ".join(regressions) if regressions else "không có giai đoạn nào chậm đi"))
+        path = os.path.join(results_dir, f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=4)
+        print(f"Đã lưu kết quả vào {path}")
+    return stages
+
+def bench_streaming(listing_pages=20, num_processes=4, latency=0.1, jitter=0.05, concurrency=4):
+    """
+    So sánh chạy theo từng bước (tìm hết liên kết rồi mới tải trang chi tiết) với pipeline.py
+    (trang chi tiết được tải ngay khi có liên kết) trên máy chủ giả lập: thời gian đến khi trang
+    chi tiết đầu tiên được nhận xử lý và tổng thời gian.
+    """
+    import contextlib
+    import io
+    import sqlite3
+    import threading
+    from frontier import Frontier, DETAIL
+    from localServer import start_server
+    from main import process_with_multiprocessing
+    from pipeline import discovery_process, run_pipeline
+
+    server = start_server(latency=latency, jitter=jitter)
+    listing_url = server.base_url + "/nha-dat-ban-ha-noi/p{}"
+    listing_settings = {"initial_rate": 4.0, "initial_concurrency": concurrency}
+    results = []
+    try:
+        for mode in ("staged", "streaming"):
+            with tempfile.TemporaryDirectory() as tmp:
+                frontier_file = os.path.join(tmp, "frontier.db")
+                link_db = os.path.join(tmp, "links.db")
+                detail_options = {"output_file": os.path.join(tmp, "property_data.csv"), "engine": "http",
+                                  "page_interval": (0.0, 0.0), "poll_interval": 1,
+                                  "dead_letter_file": os.path.join(tmp, "dead_letter.jsonl"),
+                                  "rate_settings": {"initial_rate": 100.0, "max_rate": 1000.0, "target_latency": 10.0}}
+                start = time.time()
+                first_detail = []
+                finished = threading.Event()
+
+                def watch_first_detail():
+                    # Thời điểm đầu tiên có URL chi tiết được nhận xử lý
+                    while not finished.is_set():
+                        if os.path.exists(frontier_file):
+                            with contextlib.closing(sqlite3.connect(frontier_file, timeout=60)) as conn:
+                                row = conn.execute("SELECT 1 FROM frontier WHERE kind = ? AND status != 'pending'"
+                                                   " LIMIT 1", (DETAIL,)).fetchone()
+                            if row:
+                                first_detail.append(time.time())
+                                return
+                        time.sleep(0.05)
+
+                watcher = threading.Thread(target=watch_first_detail, daemon=True)
+                watcher.start()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if mode == "staged":
+                        discovery_process(1, listing_pages + 1, frontier_file, link_db, concurrency,
+                                          listing_url=listing_url, page_interval=(0.0, 0.0),
+                                          rate_settings=listing_settings, quiet=True)
+                        process_with_multiprocessing(frontier_file, num_processes, **detail_options)
+                    else:
+                        run_pipeline(1, listing_pages + 1, frontier_file, link_db, num_processes, concurrency,
+                                     listing_url=listing_url, listing_interval=(0.0, 0.0),
+                                     listing_rate_settings=listing_settings, **detail_options)
+                elapsed = time.time() - start
+                finished.set()
+                watcher.join()
+                with Frontier(frontier_file) as frontier:
+                    counts = frontier.counts(DETAIL)
+            result = {"mode": mode, "detail_pages": counts["done"], "first_detail_seconds": round(first_detail[0] - start, 2) if first_detail else None,
+                      "total_seconds": round(elapsed, 2)}
+            results.append(result)
+            print(f"{mode:>10}: trang chi tiết đầu tiên sau {result['first_detail_seconds']} giây, "
+                  f"{counts['done']} trang chi tiết xong sau {elapsed:.1f} giây")
+    finally:
+        server.shutdown()
+    return results
+
+def _dedup_worker(args):
+    """Chạy một cách lọc trùng trong tiến trình mới, trả về thời gian và RSS lớn nhất (MB)"""
+    import contextlib
+    import io
+    import resource
+    import filterData
+
+    method, input_file, output_file, capacity = args
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if method == "pandas":
+            kept = filterData.remove_duplicates_from_json(input_file, output_file)
+        else:
+            result = filterData.streaming_dedup(input_file, output_file, None, None, method, capacity)
+            kept = result["links"]["kept"]
+    return {"method": method, "kept": kept, "seconds": round(time.perf_counter() - start, 2),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+def bench_dedup(num_links=300_000, distinct=200_000, tracking_rate=0.3):
+    """
+    Lọc trùng file liên kết JSON bằng pandas (remove_duplicates_from_json) so với lọc theo luồng
+    (streaming_dedup, 'exact' và 'bloom'). Một phần liên kết có thêm tham số theo dõi: pandas coi
+    là liên kết khác, lọc theo luồng so theo mã tin. Mỗi cách chạy trong một tiến trình mới để đo RSS.
+    """
+    rng = random.Random(1)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "links.json")
+        # Ghi từng liên kết thay vì json.dump cả danh sách: RSS lớn nhất của tiến trình này được
+        # tiến trình con kế thừa qua exec nên không được giữ cả danh sách trong bộ nhớ
+        with open(input_file, "w", encoding="utf-8") as f:
+            f.write("[")
+            for i in range(num_links):
+                link = f"https://batdongsan.com.vn/ban-nha-rieng-pr{40_000_000 + rng.randrange(distinct)}"
+                if rng.random() < tracking_rate:
+                    link += "?utm_source=facebook&utm_campaign=ads"
+                f.write(("," if i else "") + "\n    " + json.dumps(link))
+            f.write("\n]")
+
+        context = multiprocessing.get_context("spawn")
+        for method in ("pandas", "exact", "bloom"):
+            with context.Pool(1) as pool:
+                result = pool.apply(_dedup_worker, ((method, input_file, os.path.join(tmp, f"{method}.json"),
+                                                     num_links),))
+            results.append(result)
+            print(f"{method:>8}: giữ {result['kept']} liên kết, {result['seconds']} giây, "
+                  f"RSS lớn nhất {result['peak_rss_mb']} MB")
+    return results
+
+def _run_node(address, num_processes, tmp):
+    """Chạy một node main.py trong nhóm tiến trình riêng để có thể dừng cả node như khi máy bị sập"""
+    import contextlib
+    import io
+    from main import process_with_multiprocessing
+
+    os.setpgrp()
+    with contextlib.redirect_stdout(io.StringIO()):
+        process_with_multiprocessing(
+            address, num_processes, engine='http', poll_interval=0.2, page_interval=(0.0, 0.0),
+            dead_letter_file=os.path.join(tmp, f"dead_letter-{os.getpid()}.jsonl"),
+            rate_settings={"initial_rate": 100.0, "max_rate": 1000.0, "target_latency": 10.0},
+            heartbeat_timeout=2)
+
+def bench_nodes(node_counts=(1, 2, 4), detail_pages=240, processes_per_node=2, latency=0.2, jitter=0.05,
+                kill_after=3.0):
+    """
+    Chạy nhiều node main.py (mỗi node processes_per_node tiến trình HTTP) với một máy chủ frontier
+    chung trên máy chủ giả lập, đo số trang/giây theo số node.
+
+    Lần chạy cuối dùng 2 node và dừng hẳn một node (cả nhóm tiến trình) sau kill_after giây để kiểm tra
+    công việc của node chết được trả lại cho node còn lại: mọi URL vẫn phải xong.
+    """
+    import signal
+    from csvSink import csv_writer_process
+    from frontier import Frontier, DETAIL
+    from frontierServer import start_frontier_server
+    from localServer import start_server
+
+    site = start_server(latency=latency, jitter=jitter)
+    results = []
+    runs = [(count, None) for count in node_counts] + ([(2, kill_after)] if kill_after else [])
+    try:
+        for count, kill in runs:
+            with tempfile.TemporaryDirectory() as tmp:
+                frontier_file = os.path.join(tmp, "frontier.db")
+                output_file = os.path.join(tmp, "property_data.csv")
+                with Frontier(frontier_file) as frontier:
+                    frontier.add(DETAIL, [f"{site.base_url}/ban-nha-rieng-pr{i}" for i in range(detail_pages)])
+                record_queue = multiprocessing.Queue()
+                writer = multiprocessing.Process(target=csv_writer_process, args=(record_queue, output_file),
+                                                 kwargs={"frontier_file": frontier_file, "flush_interval": 0.5,
+                                                         "quiet": True})
+                writer.start()
+                server = start_frontier_server(db_file=frontier_file, port=0, record_queue=record_queue,
+                                               heartbeat_timeout=2)
+
+                start = time.perf_counter()
+                nodes = [multiprocessing.Process(target=_run_node, args=(server.base_url, processes_per_node, tmp))
+                         for _ in range(count)]
+                for node in nodes:
+                    node.start()
+                killed = False
+                with Frontier(frontier_file) as frontier:
+                    while True:
+                        counts = frontier.counts(DETAIL)
+                        if counts["done"] + counts["failed"] == detail_pages:
+                            break
+                        if kill and not killed and time.perf_counter() - start >= kill:
+                            os.killpg(nodes[0].pid, signal.SIGKILL)
+                            killed = True
+                        if not any(node.is_alive() for node in nodes):
+                            break
+                        time.sleep(0.1)
+                    elapsed = time.perf_counter() - start
+                    counts = frontier.counts(DETAIL)
+                    node_states = [node["status"] for node in frontier.nodes()]
+                for node in nodes:
+                    node.join()
+                server.shutdown()
+                server.server_close()
+                record_queue.put(None)
+                writer.join()
+                with open(output_file, "r", encoding="utf-8-sig") as f:
+                    rows = sum(1 for _ in f) - 1
+
+            result = {
+                "nodes": count,
+                "killed_node": bool(kill),
+                "pages_done": counts["done"],
+                "rows_written": rows,
+                "seconds": round(elapsed, 2),
+                "pages_per_second": round(counts["done"] / elapsed, 1),
+                "node_states": node_states,
+            }
+            results.append(result)
+            label = f"{count} node" + (f", dừng 1 node sau {kill:.0f} giây" if kill else "")
+            print(f"{label:>28}: {counts['done']}/{detail_pages} trang trong {elapsed:.1f} giây "
+                  f"({result['pages_per_second']} trang/giây), {rows} dòng, node: {', '.join(node_states)}")
+    finally:
+        site.shutdown()
+    base = next((r["pages_per_second"] for r in results if r["nodes"] == node_counts[0] and not r["killed_node"]), 0)
+    for r in results:
+        if base and not r["killed_node"]:
+            r["speedup"] = round(r["pages_per_second"] / base, 2)
+    return results
+
+def bench_query(source_file='property_data.csv', copies=10, batch_rows=200, repeat=5):
+    """
+    Truy vấn bằng chỉ mục (queryIndex.PropertyIndex) so với đọc lại file CSV bằng pandas, chuẩn hóa
+    và lọc, trên file gồm copies bản sao của source_file. Đo cả thời gian xây chỉ mục và cập nhật
+    chỉ mục khi ghi thêm một lô batch_rows dòng, kiểm tra hai cách cho cùng số dòng.
+    """
+    import pandas as pd
+    from normalizeData import normalize_frame
+    from queryIndex import PropertyIndex
+
+    queries = {
+        "giá 2-7 tỷ, 2-4 phòng ngủ, sổ đỏ": (
+            {"ranges": {"price_vnd": (2e9, 7e9), "bedrooms": (2, 4)}, "contains": {"Pháp lý": "sổ đỏ"}},
+            lambda df: df[df["price_vnd"].between(2e9, 7e9) & df["bedrooms"].between(2, 4)
+                          & df["Pháp lý"].str.contains("sổ đỏ", case=False, na=False)]),
+        "30-100 m², giá theo loại tin": (
+            {"ranges": {"area_m2": (30, 100)}, "by": "Loại tin"},
+            lambda df: df[df["area_m2"].between(30, 100)]),
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "property_data.csv")
+        with open(source_file, "rb") as f:
+            header = f.readline()
+            body = f.read()
+        with open(data_file, "wb") as f:
+            f.write(header + body * copies)
+        index = PropertyIndex(os.path.join(tmp, "index"))
+        start = time.perf_counter()
+        rows = index.update(data_file)
+        build_seconds = time.perf_counter() - start
+        print(f"Xây chỉ mục {rows:,} dòng: {build_seconds:.2f} giây")
+
+        for name, (query, filter_frame) in queries.items():
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                ids = index.select(query.get("ranges"), contains=query.get("contains"))
+                index.aggregate(ids, "price_vnd", query.get("by"))
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            start = time.perf_counter()
+            df = normalize_frame(pd.read_csv(data_file, dtype=str, encoding="utf-8-sig"))
+            matched = filter_frame(df)
+            if query.get("by"):
+                matched.groupby("Loại tin")["price_vnd"].agg(["count", "min", "median", "mean", "max"])
+            else:
+                matched["price_vnd"].agg(["count", "min", "median", "mean", "max"])
+            pandas_seconds = time.perf_counter() - start
+            result = {"query": name, "rows": rows, "matched": len(ids), "pandas_matched": len(matched),
+                      "index_ms": round(best * 1000, 2), "pandas_ms": round(pandas_seconds * 1000),
+                      "speedup": round(pandas_seconds / best)}
+            print(f"{name}: {len(ids)} dòng, chỉ mục {result['index_ms']} ms, "
+                  f"pandas {result['pandas_ms']} ms ({len(matched)} dòng)")
+            results.append(result)
+
+        # Một lô mới của tiến trình ghi: chỉ phần cuối file được đọc
+        lines = body.splitlines(keepends=True)[:batch_rows]
+        with open(data_file, "ab") as f:
+            f.write(b"".join(lines))
+        start = time.perf_counter()
+        added = index.update(data_file)
+        update_seconds = time.perf_counter() - start
+        print(f"Cập nhật chỉ mục với {added} dòng mới: {update_seconds * 1000:.0f} ms")
+        results.append({"build_seconds": round(build_seconds, 2), "update_rows": added,
+                        "update_ms": round(update_seconds * 1000), "rows": len(index)})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Đo hiệu năng các thành phần của HouseCrawl")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    link_parser = subparsers.add_parser("linkstore", help="Tốc độ thêm liên kết vào LinkStore")
+    link_parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+
+    sink_parser = subparsers.add_parser("csvsink", help="Chi phí ghi mỗi bản ghi khi file CSV lớn dần")
+    sink_parser.add_argument("--records", type=int, default=20000)
+    sink_parser.add_argument("--no-legacy", action="store_true", help="Bỏ qua cách ghi cũ")
+
+    scheduler_parser = subparsers.add_parser("scheduler", help="Chia việc cố định so với nhận việc theo lô nhỏ")
+    scheduler_parser.add_argument("--tasks", type=int, default=600)
+    scheduler_parser.add_argument("--workers", type=int, default=4)
+
+    rate_parser = subparsers.add_parser("ratecontrol", help="RateController trên máy chủ giả lập có lỗi và giới hạn tốc độ")
+    rate_parser.add_argument("--pages", type=int, default=150)
+    rate_parser.add_argument("--capacity", type=float, default=6)
+    rate_parser.add_argument("--error-rate", type=float, default=0.02)
+
+    lean_parser = subparsers.add_parser("lean", help="Dung lượng và thời gian tải trang khi bật chế độ tải gọn")
+    lean_parser.add_argument("--input", default="linkProduct.csv")
+    lean_parser.add_argument("--urls", type=int, default=10)
+
+    trips_parser = subparsers.add_parser("roundtrips", help="Số lượt gọi WebDriver khi trích xuất mỗi trang")
+    trips_parser.add_argument("--pages", type=int, default=20)
+
+    normalize_parser = subparsers.add_parser("normalize", help="Chuẩn hóa bằng phép toán vector so với apply từng dòng")
+    normalize_parser.add_argument("--input", default="property_data.csv")
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="Toàn bộ quy trình trên máy chủ giả lập, lưu kết quả để so sánh")
+    pipeline_parser.add_argument("--listing-pages", type=int, default=20)
+    pipeline_parser.add_argument("--detail-pages", type=int, default=300)
+    pipeline_parser.add_argument("--processes", type=int, default=4)
+    pipeline_parser.add_argument("--latency", type=float, default=0.05)
+    pipeline_parser.add_argument("--jitter", type=float, default=0.05)
+    pipeline_parser.add_argument("--recordings", default=None, help="Thư mục trang đã ghi (localServer.py --record)")
+    pipeline_parser.add_argument("--selenium-pages", type=int, default=3)
+    pipeline_parser.add_argument("--json-pages", type=int, default=200)
+    pipeline_parser.add_argument("--results-dir", default="bench_results")
+
+    nodes_parser = subparsers.add_parser("nodes", help="Nhiều node dùng chung máy chủ frontier, kể cả khi một node bị sập")
+    nodes_parser.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 4])
+    nodes_parser.add_argument("--pages", type=int, default=240)
+    nodes_parser.add_argument("--processes", type=int, default=2, help="Số tiến trình mỗi node")
+    nodes_parser.add_argument("--latency", type=float, default=0.2)
+    nodes_parser.add_argument("--kill-after", type=float, default=3.0, help="0 để bỏ qua lần chạy có node bị sập")
+
+    streaming_parser = subparsers.add_parser("streaming", help="Chạy từng bước so với pipeline.py liền một mạch")
+    streaming_parser.add_argument("--listing-pages", type=int, default=20)
+    streaming_parser.add_argument("--processes", type=int, default=4)
+    streaming_parser.add_argument("--latency", type=float, default=0.1)
+
+    dedup_parser = subparsers.add_parser("dedup", help="Lọc trùng bằng pandas so với lọc theo luồng")
+    dedup_parser.add_argument("--links", type=int, default=300_000)
+    dedup_parser.add_argument("--distinct", type=int, default=200_000)
+
+    query_parser = subparsers.add_parser("query", help="Truy vấn bằng chỉ mục so với đọc lại file CSV bằng pandas")
+    query_parser.add_argument("--input", default="property_data.csv")
+    query_parser.add_argument("--copies", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "linkstore":
+        results = bench_link_store(args.sizes)
+    elif args.command == "csvsink":
+        results = bench_csv_sink(args.records, legacy=not args.no_legacy)
+    elif args.command == "scheduler":
+        results = bench_scheduler(args.tasks, args.workers)
+    elif args.command == "ratecontrol":
+        results = bench_rate_control(args.pages, capacity=args.capacity, error_rate=args.error_rate)
+    elif args.command == "lean":
+        results = bench_lean_mode(args.input, args.urls)
+    elif args.command == "roundtrips":
+        results = bench_round_trips(args.pages)
+    elif args.command == "normalize":
+        results = bench_normalize(args.input)
+    elif args.command == "pipeline":
+        results = bench_pipeline(args.listing_pages, args.detail_pages, args.processes, args.latency, args.jitter,
+                                 args.recordings, args.selenium_pages, args.json_pages, args.results_dir)
+    elif args.command == "streaming":
+        results = bench_streaming(args.listing_pages, args.processes, args.latency)
+    elif args.command == "dedup":
+        results = bench_dedup(args.links, args.distinct)
+    elif args.command == "nodes":
+        results = bench_nodes(args.nodes, args.pages, args.processes, args.latency, kill_after=args.kill_after)
+    elif args.command == "query":
+        results = bench_query(args.input, args.copies)
+    print(json.dumps(results, ensure_ascii=False, indent=4))
@@ -5,8 +5,37 @@ from selenium.webdriver.common.by import By
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import json
-def setup_driver():
-    """Khởi tạo trình duyệt Chrome"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urlparse
+from httpExtract import create_session, looks_blocked, parse_html, response_html, BLOCKED_ERROR
+from linkStore import LinkStore
+from frontier import Frontier, DETAIL, LISTING
+from driverPool import driver_error_message, wait_for_selector
+from pacing import Pacer, RateController, OK, ERROR, BLOCKED, format_limits
+from domExtract import extract_card_hrefs
+from leanMode import apply_lean_options, enable_request_blocking
+from retryQueue import fail_exhausted, handle_failure, LAUNCH_ERROR
+from metrics import Metrics, export, format_summary
+from tqdm import tqdm
+
+# Trang danh sách tin đăng, {} là số trang
+LISTING_URL = "https://batdongsan.com.vn/nha-dat-ban-ha-noi/p{}"
+
+# Thẻ sản phẩm trong trang danh sách
+CARD_SELECTOR = "div.js__card.js__card-full-web.pr-container.re__card-full"
+# Cùng bộ chọn với CARD_SELECTOR, viết dưới dạng XPath
+CARD_XPATH = ("//*[@id='product-lists-web']//div[contains(concat(' ', normalize-space(@class), ' '), ' js__card ')"
+              " and contains(concat(' ', normalize-space(@class), ' '), ' js__card-full-web ')"
+              " and contains(concat(' ', normalize-space(@class), ' '), ' pr-container ')"
+              " and contains(concat(' ', normalize-space(@class), ' '), ' re__card-full ')]")
+
+def setup_driver(lean=False, blocked_domains=None):
+    """
+    Khởi tạo trình duyệt Chrome.
+    
+    lean=True bật chế độ tải gọn: không tải ảnh, font, media và chặn các tên miền
+    quảng cáo/tracker (blocked_domains, mặc định leanMode.BLOCKED_DOMAINS).
+    """
     options = Options()
     # options.add_argument("--headless")  # Bỏ comment nếu muốn chạy ẩn
     options.add_argument("--no-sandbox")
@@ -19,86 +48,95 @@ def setup_driver():
     # User-Agent giống trình duyệt thật
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     
+    if lean:
+        apply_lean_options(options)
+    
     service = Service(ChromeDriverManager().install())
     driver = webdriver.Chrome(service=service, options=options)
     
     # Giả mạo thông tin webdriver
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     
+    if lean:
+        enable_request_blocking(driver, blocked_domains)
+    
     return driver
 
-def crawl_batdongsan(page=1):
-    """Cào dữ liệu từ batdongsan.com.vn"""
-    driver = setup_driver()
+def crawl_batdongsan(page=1, link_store=None, wait_timeout=15, lean=True, listing_url=LISTING_URL, quiet=False,
+                     save=True):
+    """
+    Cào dữ liệu từ batdongsan.com.vn.
+    
+    Nếu truyền link_store (LinkStore) thì liên kết được thêm vào kho SQLite,
+    ngược lại được cộng dồn vào file linkProduct.json; save=False không lưu ở đâu cả, để người gọi
+    tự lưu (record_page). lean=True mở Chrome ở chế độ tải gọn, quiet=True tắt mọi dòng in.
+    
+    Returns:
+        tuple: (product_links, error). error là None nếu thành công, ngược lại là thông báo lỗi
+        mở đầu theo nhóm lỗi (driverPool.driver_error_message) để handle_failure phân loại.
+        Lỗi khởi động trình duyệt không được bắt.
+    """
+    log = (lambda *args, **kwargs: None) if quiet else print
+    driver = setup_driver(lean=lean)
     product_links = []
+    error = None
     
     try:
         # 1. Truy cập website
-        url = "https://batdongsan.com.vn/nha-dat-ban-ha-noi/p" + str(page)
-        print(f"Đang truy cập {url}...")
+        url = listing_url.format(page)
+        log(f"Đang truy cập {url}...")
         driver.get(url)
         
-        # Đợi trang tải xong
-        time.sleep(2)
+        # Đợi đến khi container sản phẩm xuất hiện thay vì ngủ cố định
+        wait_seconds = wait_for_selector(driver, "#product-lists-web", wait_timeout)
         
         # 2. Tìm container sản phẩm
-        print("Đang tìm container sản phẩm...")
+        log("Đang tìm container sản phẩm...")
         product_container = driver.find_element(By.ID, "product-lists-web")
         
-        # Cuộn trang để đảm bảo tải tất cả sản phẩm
+        # Cuộn trang để đảm bảo tải tất cả sản phẩm, chờ đến khi có thẻ sản phẩm
         driver.execute_script("arguments[0].scrollIntoView(true);", product_container)
-        time.sleep(1)
+        wait_seconds += wait_for_selector(driver, f"#product-lists-web {CARD_SELECTOR}", wait_timeout)
+        log(f"Trang sẵn sàng sau {wait_seconds:.2f} giây")
         
-        # 3. Tìm các thẻ div con có class chứa "js__card js__card-full-web"
-        print("Đang tìm các sản phẩm...")
-        product_cards = product_container.find_elements(By.CSS_SELECTOR, 
-            "div.js__card.js__card-full-web.pr-container.re__card-full")
+        # 3. Lấy link của tất cả thẻ con có class chứa "js__card js__card-full-web"
+        # trong một lần gọi execute_script thay vì một lần gọi cho mỗi thẻ
+        log("Đang tìm các sản phẩm...")
+        card_hrefs = extract_card_hrefs(driver, CARD_SELECTOR)
         
-        print(f"Đã tìm thấy {len(product_cards)} sản phẩm. Đang trích xuất liên kết...")
+        log(f"Đã tìm thấy {len(card_hrefs)} sản phẩm. Đang trích xuất liên kết...")
         
         # 4. Chỉ lấy link từ các sản phẩm
-        for i, card in enumerate(product_cards, 1):
-            try:
-                link = card.find_element(By.TAG_NAME, "a").get_attribute("href")
+        for i, link in enumerate(card_hrefs, 1):
+            if link:
                 product_links.append(link)
-                print(f"Đã lấy link [{i}/{len(product_cards)}]: {link}")
-            except Exception as e:
-                print(f"Không thể lấy link cho sản phẩm {i}: {e}")
-        
-        # 5. Lưu tất cả link vào file JSON (ĐÃ CHỈNH SỬA - CỘNG DỒN THAY VÌ GHI ĐÈ)
-        # Kiểm tra xem file đã tồn tại chưa
-        import os
-        existing_links = []
-        if os.path.exists('linkProduct.json') and os.path.getsize('linkProduct.json') > 0:
-            try:
-                with open('linkProduct.json', 'r', encoding='utf-8') as f:
-                    existing_links = json.load(f)
-                print(f"Đã tìm thấy file cũ với {len(existing_links)} liên kết")
-            except json.JSONDecodeError:
-                print("File JSON hiện tại không hợp lệ, tạo mới")
-                existing_links = []
-        
-        # Thêm các liên kết mới vào danh sách hiện có
-        for link in product_links:
-            if link not in existing_links:
-                existing_links.append(link)
-                
-        # Ghi toàn bộ danh sách đã cập nhật vào file
-        with open('linkProduct.json', 'w', encoding='utf-8') as f:
-            json.dump(existing_links, f, ensure_ascii=False, indent=4)
+                log(f"Đã lấy link [{i}/{len(card_hrefs)}]: {link}")
+            else:
+                log(f"Không thể lấy link cho sản phẩm {i}")
         
-        print(f"\nHoàn thành! Đã lưu {len(existing_links)} liên kết vào file linkProduct.json")
-        print(f"(Trong đó có {len(product_links)} liên kết mới từ lần cào này)")
+        # 5. Lưu tất cả link (ĐÃ CHỈNH SỬA - CỘNG DỒN THAY VÌ GHI ĐÈ)
+        if save and link_store is not None:
+            new_count = link_store.add_links(product_links)
+            log(f"\nHoàn thành! Đã thêm {new_count}/{len(product_links)} liên kết mới, kho có {len(link_store)} liên kết")
+        elif save:
+            save_links_to_json(product_links)
         
     except Exception as e:
-        print(f"Lỗi: {e}")
+        error = driver_error_message(e)
+        try:
+            # Trang không có sản phẩm vì bị chặn (captcha...) thay vì lỗi thông thường
+            if looks_blocked(200, driver.title + driver.page_source[:5000]):
+                error = f"{BLOCKED_ERROR}: {error}"
+        except Exception:
+            pass
+        log(f"Lỗi: {error}")
     
     finally:
         # Đóng trình duyệt
-        print("Đóng trình duyệt...")
+        log("Đóng trình duyệt...")
         driver.quit()
-        
-        return product_links
+    
+    return product_links, error
     """Cào dữ liệu từ batdongsan.com.vn"""
     driver = setup_driver()
     product_links = []
@@ -152,9 +190,239 @@ def crawl_batdongsan(page=1):
         
         return product_links
 
+def save_links_to_json(product_links, json_file='linkProduct.json'):
+    """Cộng dồn các liên kết mới vào file JSON, bỏ qua liên kết đã có"""
+    import os
+    existing_links = []
+    if os.path.exists(json_file) and os.path.getsize(json_file) > 0:
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                existing_links = json.load(f)
+            print(f"Đã tìm thấy file cũ với {len(existing_links)} liên kết")
+        except json.JSONDecodeError:
+            print("File JSON hiện tại không hợp lệ, tạo mới")
+            existing_links = []
+    
+    # Thêm các liên kết mới vào danh sách hiện có
+    for link in product_links:
+        if link not in existing_links:
+            existing_links.append(link)
+            
+    # Ghi toàn bộ danh sách đã cập nhật vào file
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(existing_links, f, ensure_ascii=False, indent=4)
+    
+    print(f"\nHoàn thành! Đã lưu {len(existing_links)} liên kết vào file {json_file}")
+    print(f"(Trong đó có {len(product_links)} liên kết mới từ lần cào này)")
+
+def extract_card_links(page_html, base_url=LISTING_URL.format(1)):
+    """Lấy link của từng sản phẩm trong HTML trang danh sách"""
+    tree = parse_html(page_html)
+    product_links = []
+    if tree is None:
+        return product_links
+    for card in tree.xpath(CARD_XPATH):
+        anchors = card.xpath(".//a[@href]")
+        if anchors:
+            product_links.append(urljoin(base_url, anchors[0].get("href")))
+    return product_links
+
+def _fetch_listing(url, session, timeout):
+    """
+    Tải một trang danh sách và lấy link sản phẩm.
+    
+    Returns:
+        tuple: (product_links, error, outcome) với outcome là OK, ERROR hoặc BLOCKED
+    """
+    try:
+        response = session.get(url, timeout=timeout)
+    except Exception as e:
+        return [], f"HTTP lỗi: {e}", ERROR
+    
+    page_html = response_html(response)
+    if response.status_code == 200:
+        try:
+            product_links = extract_card_links(page_html, url)
+        except Exception as e:
+            # Lỗi phân tích HTML được thử lại như các lỗi khác thay vì dừng cả quá trình tìm liên kết
+            return [], f"Lỗi phân tích trang: {e}", ERROR
+        if product_links:
+            return product_links, None, OK
+    
+    # Không có liên kết: xem mã trạng thái và nội dung trang để biết có bị chặn không
+    if looks_blocked(response.status_code, page_html):
+        return [], f"{BLOCKED_ERROR} (HTTP {response.status_code})", BLOCKED
+    if response.status_code != 200:
+        return [], f"HTTP {response.status_code}", ERROR
+    return [], "Không tìm thấy sản phẩm", ERROR
+
+def fetch_listing_page(page, session, timeout=15, pacer=None, rate_controller=None, listing_url=LISTING_URL,
+                       metrics=None):
+    """
+    Tải một trang danh sách bằng HTTP và lấy link sản phẩm.
+    
+    Nếu có rate_controller (RateController), lượt tải phải chờ đến khi host cho phép
+    và kết quả được báo lại để điều chỉnh tốc độ. Nếu có metrics (Metrics), thời gian tải
+    và kết quả của trang được ghi vào đó.
+    
+    Returns:
+        tuple: (page, product_links, error). error là None nếu thành công.
+    """
+    url = listing_url.format(page)
+    if pacer is not None:
+        pacer.wait()
+    
+    host = urlparse(url).netloc
+    token = rate_controller.acquire(host) if rate_controller is not None else None
+    start = time.time()
+    product_links, error, outcome = _fetch_listing(url, session, timeout)
+    elapsed = time.time() - start
+    if rate_controller is not None:
+        rate_controller.record(host, token, elapsed, outcome)
+    if metrics is not None:
+        metrics.observe("listing_load_seconds", elapsed)
+        metrics.inc("listing_pages_total", outcome=outcome)
+    return page, product_links, error
+
+def discover_links(pages, concurrency=8, session=None, pacer=None, rate_controller=None, listing_url=LISTING_URL,
+                   metrics=None):
+    """
+    Tải song song các trang danh sách trong pages và trả về kết quả của từng trang
+    ngay khi trang đó tải xong.
+    
+    Số trang đang tải cùng lúc không vượt quá concurrency; pacer (Pacer) giãn cách
+    thời điểm bắt đầu tải giữa các trang, rate_controller (RateController) tự điều chỉnh
+    tốc độ và số trang tải đồng thời (không vượt quá concurrency) theo độ trễ và lỗi của host,
+    metrics (Metrics) ghi thời gian tải và kết quả từng trang.
+    
+    Yields:
+        tuple: (page, product_links, error)
+    """
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=concurrency)
+    
+    pages = iter(pages)
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = set()
+            for page in pages:
+                pending.add(executor.submit(fetch_listing_page, page, session, pacer=pacer,
+                                           rate_controller=rate_controller, listing_url=listing_url,
+                                           metrics=metrics))
+                if len(pending) >= concurrency:
+                    break
+            
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                    # Mỗi trang xong thì nạp thêm một trang mới
+                    next_page = next(pages, None)
+                    if next_page is not None:
+                        pending.add(executor.submit(fetch_listing_page, next_page, session, pacer=pacer,
+                                                   rate_controller=rate_controller, listing_url=listing_url,
+                                                   metrics=metrics))
+    finally:
+        if own_session:
+            session.close()
+
+def record_page(frontier, link_store, page, product_links, error, metrics=None, quiet=False):
+    """
+    Lưu liên kết của một trang danh sách và cập nhật trạng thái trang trong frontier.
+
+    Liên kết được thêm vào link_store (LinkStore) và đưa thẳng vào frontier để main.py xử lý;
+    liên kết đã có ở cả hai nơi được bỏ qua. Trang lỗi được thử lại sau một khoảng chờ theo
+    nhóm lỗi, hoặc ghi vào dead_letter.jsonl khi đã thử đủ số lần.
+
+    Returns:
+        int: Số liên kết mới được thêm vào frontier
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    if error or not product_links:
+        error = error or "Không tìm thấy sản phẩm"
+        error_class, retry_in = handle_failure(frontier, LISTING, page, error)
+        metrics.inc("errors_total", error_class=error_class)
+        if not quiet:
+            retry_text = "đã thử đủ số lần" if retry_in is None else f"thử lại sau {retry_in} giây"
+            print(f"❌ Trang {page} ({error_class}, {retry_text}): {error}")
+        return 0
+    with metrics.timer("write_seconds"):
+        new_count = link_store.add_links(product_links)
+        queued = frontier.add(DETAIL, product_links)
+        frontier.complete(LISTING, [page])
+    metrics.inc("links_found_total", len(product_links))
+    metrics.inc("links_new_total", new_count)
+    if not quiet:
+        print(f"✅ Trang {page}: {len(product_links)} liên kết ({new_count} mới)")
+    return queued
+
 if __name__ == "__main__":
-    for i in range(2245, 2890): 
-        print(f"\n{'='*50}")
-        print(f"ĐANG XỬ LÝ TRANG {i}/2890")
-        print(f"{'='*50}\n")
-        crawl_batdongsan(page=i)
\ No newline at end of file
+    start_page, end_page = 2245, 2890
+    mode = 'concurrent'  # 'concurrent' (HTTP song song) hoặc 'sequential' (Selenium từng trang)
+    concurrency = 8  # Số trang danh sách tải cùng lúc
+    frontier_file = 'frontier.db'  # Trạng thái từng trang, dùng để tiếp tục khi bị dừng
+    pacer = Pacer(0.2, 0.5)  # Khoảng cách giữa hai lần bắt đầu tải trang danh sách (giây)
+    # Tự điều chỉnh tốc độ và số trang tải đồng thời theo độ trễ/lỗi của host
+    rate_controller = RateController(initial_rate=2.0, initial_concurrency=4, max_concurrency=concurrency)
+    quiet = True  # Chỉ hiện một thanh tiến trình thay vì in từng trang
+    metrics = Metrics()
+    metrics_file = 'metrics_links.prom'  # Metrics cho Prometheus textfile collector (.json để ghi JSON)
+    
+    link_store = LinkStore('linkProduct.db')
+    imported = link_store.import_json('linkProduct.json')
+    if imported:
+        print(f"Đã nhập {imported} liên kết từ linkProduct.json vào linkProduct.db")
+    
+    # Chỉ xử lý các trang chưa xong; trang đã xong ở lần chạy trước được bỏ qua
+    frontier = Frontier(frontier_file)
+    frontier.add(LISTING, range(start_page, end_page))
+    frontier.reset_leases(LISTING)
+    
+    try:
+        # Lặp lại cho đến khi không còn trang chờ xử lý hoặc chờ thử lại
+        while True:
+            fail_exhausted(frontier, LISTING)
+            pages = [int(page) for page in frontier.lease(LISTING, lease_seconds=24 * 3600)]
+            if not pages:
+                next_retry = frontier.next_retry_time(LISTING)
+                if next_retry is None:
+                    break
+                print(f"Chờ {next_retry - time.time():.0f} giây để thử lại các trang lỗi...")
+                time.sleep(max(0, next_retry - time.time()))
+                continue
+            print(f"Còn {len(pages)} trang danh sách cần xử lý")
+            
+            if mode == 'concurrent':
+                results = discover_links(pages, concurrency, pacer=pacer, rate_controller=rate_controller,
+                                         metrics=metrics)
+                for done_count, (page, product_links, error) in enumerate(
+                        tqdm(results, total=len(pages), unit="trang", disable=not quiet), 1):
+                    record_page(frontier, link_store, page, product_links, error, metrics, quiet)
+                    if done_count % 50 == 0:
+                        export(metrics.snapshot(), metrics_file)
+                        if not quiet:
+                            print(format_limits(rate_controller.limits()))
+            else:
+                for i in tqdm(pages, unit="trang", disable=not quiet):
+                    pacer.wait()
+                    if not quiet:
+                        print(f"\n{'='*50}")
+                        print(f"ĐANG XỬ LÝ TRANG {i}/{end_page}")
+                        print(f"{'='*50}\n")
+                    with metrics.timer("listing_load_seconds"):
+                        try:
+                            product_links, error = crawl_batdongsan(page=i, quiet=quiet, save=False)
+                        except Exception as e:
+                            product_links, error = [], f"{LAUNCH_ERROR}: {e}"
+                    record_page(frontier, link_store, i, product_links, error, metrics, quiet)
+        
+        print(f"\nKho linkProduct.db có {len(link_store)} liên kết")
+        counts = frontier.counts(LISTING)
+        print(f"Trang danh sách: {counts['done']} xong, {counts['failed']} lỗi")
+        snapshot = metrics.snapshot()
+        export(snapshot, metrics_file)
+        print(format_summary(snapshot))
+    finally:
+        frontier.close()
+        link_store.close()
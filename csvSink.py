@@ -0,0 +1,204 @@
+import csv
+import os
+import queue
+import shutil
+import time
+from io import StringIO
+from frontier import Frontier, DETAIL
+
+# Các cột đã gặp trên trang chi tiết (theo thứ tự của property_data.csv). File mới được tạo với đủ
+# các cột này để hầu như không phải ghi lại dòng tiêu đề khi gặp cột chỉ có ở một số tin
+KNOWN_COLUMNS = [
+    "Khoảng giá", "Diện tích", "Số phòng ngủ", "Số phòng tắm, vệ sinh", "Hướng ban công", "Pháp lý",
+    "Nội thất", "Ngày đăng", "Ngày hết hạn", "Loại tin", "Mã tin", "Hướng nhà", "Số tầng", "Mặt tiền",
+    "Đường vào", "URL", "Error", "Mức giá điện", "Mức giá nước", "Mức giá internet",
+]
+
+def read_csv_columns(output_file):
+    """Đọc danh sách cột từ dòng tiêu đề của file CSV (không đọc phần dữ liệu)"""
+    if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+        return []
+    with open(output_file, 'r', encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), [])
+
+def rewrite_csv_header(output_file, columns):
+    """
+    Thay dòng tiêu đề của file CSV bằng danh sách cột mới.
+
+    Cột mới luôn được thêm vào cuối nên các dòng cũ không cần sửa: khi đọc lại,
+    các ô còn thiếu ở cuối dòng được hiểu là rỗng. Phần dữ liệu không được phân tích lại
+    nhưng vẫn phải sao chép nguyên khối sang file mới (chi phí tỉ lệ với kích thước file),
+    vì vậy file mới được tạo sẵn với KNOWN_COLUMNS để việc này hiếm khi xảy ra.
+    """
+    temp_file = output_file + '.tmp'
+    with open(output_file, 'rb') as src, open(temp_file, 'wb') as dst:
+        src.readline()
+        header = _format_row(columns)
+        dst.write(('\ufeff' + header).encode('utf-8'))
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(temp_file, output_file)
+
+def _format_row(row):
+    """Định dạng một dòng CSV giống các dòng do write_records ghi"""
+    buffer = StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(row)
+    return buffer.getvalue()
+
+def write_records(records, output_file, columns):
+    """
+    Ghi một lô bản ghi (list các dict) vào cuối file CSV.
+
+    Parameters:
+        records (list): Các bản ghi cần ghi
+        output_file (str): File CSV đầu ra
+        columns (list): Danh sách cột hiện tại của file (được cập nhật tại chỗ)
+
+    Returns:
+        bool: True nếu phải ghi lại dòng tiêu đề vì có cột mới
+    """
+    file_exists = os.path.exists(output_file) and os.path.getsize(output_file) > 0
+    if not file_exists and not columns:
+        columns.extend(KNOWN_COLUMNS)
+    known = set(columns)
+    new_columns = []
+    for record in records:
+        for key in record:
+            if key not in known:
+                known.add(key)
+                new_columns.append(key)
+
+    header_rewritten = False
+    if new_columns:
+        columns.extend(new_columns)
+        if file_exists:
+            rewrite_csv_header(output_file, columns)
+            header_rewritten = True
+
+    with open(output_file, 'a', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval='', lineterminator='\n')
+        if not file_exists:
+            writer.writeheader()
+        writer.writerows(records)
+    return header_rewritten
+
+def csv_writer_process(record_queue, output_file='property_data.csv', flush_size=200, flush_interval=5.0,
+                       frontier_file=None, parquet_dir=None, fingerprint_file=None,
+                       events_file='change_events.jsonl', metrics=None, quiet=False, index_dir=None,
+                       index_interval=60.0):
+    """
+    Tiến trình ghi duy nhất: nhận (url, bản ghi) từ record_queue và ghi vào file CSV theo lô lớn.
+
+    Danh sách cột được giữ trong bộ nhớ nên không cần đọc lại file. File mới có sẵn các cột
+    KNOWN_COLUMNS; cột chưa từng gặp khiến dòng tiêu đề được ghi lại bằng một lần sao chép file. Nếu có frontier_file, URL chỉ được
+    đánh dấu done sau khi bản ghi đã nằm trong file. Nếu có parquet_dir, mỗi lô cũng được ghi vào
+    thư mục Parquet (parquetSink). Gửi None vào hàng đợi để kết thúc.
+    
+    Nếu có fingerprint_file (FingerprintStore), chỉ tin mới được ghi ra file; tin tải lại không
+    đổi bị bỏ qua, tin có thay đổi (đổi giá, đăng lại...) được ghi thành sự kiện vào events_file.
+    
+    Nếu có metrics (Metrics), thời gian ghi mỗi lô và số bản ghi được ghi vào đó.
+    quiet=True tắt dòng in sau mỗi lô.
+    
+    Nếu có index_dir, chỉ mục truy vấn (queryIndex.PropertyIndex) được cập nhật với các dòng mới
+    tối đa mỗi index_interval giây và một lần khi kết thúc.
+    """
+    if parquet_dir:
+        from parquetSink import write_parquet_records
+    if fingerprint_file:
+        from fingerprintStore import FingerprintStore, NEW, append_events
+    if index_dir:
+        from queryIndex import PropertyIndex
+    frontier = Frontier(frontier_file) if frontier_file else None
+    fingerprints = FingerprintStore(fingerprint_file) if fingerprint_file else None
+    index = PropertyIndex(index_dir) if index_dir else None
+    columns = read_csv_columns(output_file)
+    buffer = []
+    buffer_urls = []
+    written = 0
+    header_rewrites = 0
+    unchanged = 0
+    changes = 0
+    write_time = 0.0
+    last_flush = time.time()
+    last_index = time.time()
+
+    def update_index():
+        nonlocal last_index
+        if index is not None and os.path.exists(output_file):
+            start = time.perf_counter()
+            added = index.update(output_file)
+            if metrics is not None:
+                metrics.observe("index_update_seconds", time.perf_counter() - start)
+            if added and not quiet:
+                print(f"🗂 Đã thêm {added} dòng vào chỉ mục {index_dir}")
+        last_index = time.time()
+
+    def flush():
+        nonlocal buffer, buffer_urls, written, header_rewrites, unchanged, changes, write_time, last_flush
+        if buffer:
+            start = time.perf_counter()
+            records = buffer
+            events = []
+            if fingerprints is not None:
+                records = []
+                for url, record in zip(buffer_urls, buffer):
+                    status, record_events = fingerprints.compare(url, record)
+                    if status == NEW:
+                        records.append(record)
+                    elif not record_events:
+                        unchanged += 1
+                    events.extend(record_events)
+            if records:
+                if write_records(records, output_file, columns):
+                    header_rewrites += 1
+                if parquet_dir:
+                    write_parquet_records(records, parquet_dir)
+            if fingerprints is not None:
+                append_events(events, events_file)
+                fingerprints.update(zip(buffer_urls, buffer))
+                changes += len(events)
+            elapsed = time.perf_counter() - start
+            write_time += elapsed
+            if frontier is not None:
+                frontier.complete(DETAIL, buffer_urls)
+            written += len(records)
+            if metrics is not None:
+                metrics.observe("write_seconds", elapsed)
+                metrics.inc("records_written_total", len(records))
+                if fingerprints is not None:
+                    metrics.inc("change_events_total", len(events))
+            if not quiet:
+                print(f"💾 Đã lưu {len(records)} bản ghi, tổng {written} bản ghi vào {output_file}")
+            buffer = []
+            buffer_urls = []
+        last_flush = time.time()
+        if time.time() - last_index >= index_interval:
+            update_index()
+
+    while True:
+        try:
+            item = record_queue.get(timeout=flush_interval)
+        except queue.Empty:
+            flush()
+            continue
+
+        if item is None:
+            break
+        url, record = item
+        buffer.append(record)
+        buffer_urls.append(url)
+        if len(buffer) >= flush_size or time.time() - last_flush >= flush_interval:
+            flush()
+
+    flush()
+    update_index()
+    if frontier is not None:
+        frontier.close()
+    if fingerprints is not None:
+        fingerprints.close()
+        if not quiet:
+            print(f"💾 Tải lại: {unchanged} tin không đổi, {changes} sự kiện thay đổi ghi vào {events_file}")
+    per_record = write_time / written * 1e6 if written else 0.0
+    if not quiet:
+        print(f"💾 Tiến trình ghi kết thúc: {written} bản ghi, {header_rewrites} lần thêm cột, "
+              f"{per_record:.0f} µs/bản ghi")
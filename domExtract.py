@@ -0,0 +1,53 @@
+from httpExtract import add_spec_text
+
+# Lấy nội dung của tất cả khối thông tin trong một lần gọi execute_script,
+# thay vì một lần gọi WebDriver cho mỗi item.text
+SPEC_TEXTS_SCRIPT = """
+const selectors = arguments[0];
+const texts = [];
+for (const selector of selectors) {
+    for (const el of document.querySelectorAll(selector)) {
+        texts.push(el.innerText);
+    }
+}
+return texts;
+"""
+
+# Khối thông tin được đọc theo thứ tự: đặc điểm bất động sản, rồi thông tin tin đăng
+SPEC_SELECTORS = [
+    "div.re__pr-specs-content-item",
+    "div.re__pr-short-info-item.js__pr-config-item",
+]
+
+# Lấy href của thẻ <a> đầu tiên trong mỗi thẻ sản phẩm, null nếu thẻ không có liên kết
+CARD_HREFS_SCRIPT = """
+const container = document.getElementById(arguments[0]);
+if (!container) {
+    return [];
+}
+return Array.from(container.querySelectorAll(arguments[1]), card => {
+    const a = card.querySelector('a');
+    return a ? a.href : null;
+});
+"""
+
+def extract_spec_data(driver, selectors=None):
+    """
+    Đọc thông tin bất động sản trên trang hiện tại bằng một lần gọi WebDriver.
+
+    Returns:
+        dict: Tên thuộc tính -> giá trị, cùng quy tắc tách dòng với httpExtract.add_spec_text
+    """
+    property_data = {}
+    for text in driver.execute_script(SPEC_TEXTS_SCRIPT, selectors or SPEC_SELECTORS):
+        add_spec_text(property_data, text)
+    return property_data
+
+def extract_card_hrefs(driver, card_selector, container_id="product-lists-web"):
+    """
+    Đọc liên kết của tất cả thẻ sản phẩm trên trang hiện tại bằng một lần gọi WebDriver.
+
+    Returns:
+        list: href của từng thẻ, None với thẻ không có liên kết
+    """
+    return driver.execute_script(CARD_HREFS_SCRIPT, container_id, card_selector)
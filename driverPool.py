@@ -0,0 +1,237 @@
+import threading
+import time
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from retryQueue import DRIVER_ERROR, MISSING_ELEMENT_ERROR, TIMEOUT_ERROR
+
+def wait_for_selector(driver, css_selector, timeout=10):
+    """
+    Chờ đến khi có phần tử khớp css_selector trên trang, trả về ngay khi phần tử xuất hiện.
+
+    Returns:
+        float: Số giây đã chờ
+
+    Raises:
+        NoSuchElementException: Nếu sau timeout giây vẫn chưa có phần tử. Trang đã tải xong nhưng
+            thiếu phần tử nên driver_error_message xếp vào nhóm thiếu phần tử, không phải hết thời gian
+            tải trang, cho cả trang chi tiết lẫn trang danh sách.
+    """
+    start = time.time()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)))
+    except TimeoutException:
+        raise NoSuchElementException(f"{css_selector} sau {timeout} giây")
+    return time.time() - start
+
+def driver_error_message(error):
+    """
+    Thông báo lỗi của một lượt tải bằng Selenium, mở đầu theo nhóm lỗi để retryQueue.classify_error
+    phân loại: thiếu phần tử, hết thời gian, hoặc lỗi trình duyệt (DRIVER_ERROR) với các lỗi khác.
+    """
+    if isinstance(error, NoSuchElementException):
+        return f"{MISSING_ELEMENT_ERROR}: {error.msg}"
+    if isinstance(error, TimeoutException):
+        return f"{TIMEOUT_ERROR}: {error.msg}"
+    return f"{DRIVER_ERROR}: {error}"
+
+
+class DriverPool:
+    """
+    Giữ sẵn các trình duyệt Chrome đã khởi động cho một tiến trình, tránh việc
+    mở/đóng Chrome cho từng URL.
+
+    Lần acquire đầu tiên khởi động trước size trình duyệt; các trình duyệt được dùng lần lượt.
+    Bộ đếm trang của chúng bắt đầu lệch nhau nên không cùng lúc đến lượt khởi động lại. Trình duyệt
+    bị đóng (lỗi hoặc đủ max_pages trang) được thay bằng trình duyệt mới khởi động ở luồng nền
+    trong khi các trình duyệt còn lại tiếp tục xử lý trang.
+
+    Parameters:
+        factory (callable): Hàm tạo trình duyệt mới (ví dụ setup_driver)
+        size (int): Số trình duyệt giữ sẵn trong tiến trình
+        max_pages (int): Số trang tối đa một trình duyệt xử lý trước khi được khởi động lại
+        metrics (Metrics): Nếu có, ghi thời gian khởi động và số trình duyệt bị lỗi/khởi động lại
+    """
+
+    def __init__(self, factory, size=1, max_pages=50, metrics=None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.metrics = metrics
+        self._idle = []
+        self._pages = {}
+        self._live = 0
+        self._launching = 0
+        self._warmed = False
+        self._threads = []
+        self._cond = threading.Condition()
+
+        # Thống kê khởi động trình duyệt
+        self.launches = 0
+        self.launch_time = 0.0
+        self.pages = 0
+        self.recycled = 0
+        self.crashed = 0
+
+    def _launch(self):
+        """Khởi động một trình duyệt mới và ghi lại thời gian khởi động"""
+        start = time.time()
+        driver = self.factory()
+        elapsed = time.time() - start
+        if self.metrics is not None:
+            self.metrics.observe("driver_launch_seconds", elapsed)
+        with self._cond:
+            self.launch_time += elapsed
+            self.launches += 1
+            self._live += 1
+            self._pages[id(driver)] = 0
+        return driver
+
+    def warm(self):
+        """
+        Khởi động cho đủ size trình duyệt. Trình duyệt thứ k bắt đầu với bộ đếm
+        k * max_pages / size trang để các lần khởi động lại rải đều theo thời gian.
+        """
+        while self._live + self._launching < self.size:
+            offset = self._live * self.max_pages // self.size
+            driver = self._launch()
+            with self._cond:
+                self._pages[id(driver)] = offset
+                self._idle.append(driver)
+
+    def _replace(self):
+        """Khởi động một trình duyệt thay thế ở luồng nền nếu pool đang thiếu"""
+        with self._cond:
+            if self._live + self._launching >= self.size:
+                return
+            self._launching += 1
+
+        def launch():
+            try:
+                driver = self._launch()
+            except Exception:
+                driver = None
+            with self._cond:
+                self._launching -= 1
+                if driver is not None:
+                    self._idle.append(driver)
+                self._cond.notify_all()
+
+        thread = threading.Thread(target=launch, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def acquire(self):
+        """
+        Lấy trình duyệt rảnh lâu nhất. Nếu không có trình duyệt rảnh thì chờ trình duyệt
+        đang khởi động ở luồng nền, hoặc khởi động mới.
+        """
+        if not self._warmed:
+            self._warmed = True
+            self.warm()
+        with self._cond:
+            while not self._idle and self._launching:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop(0)
+        return self._launch()
+
+    def release(self, driver, error=None):
+        """
+        Trả trình duyệt về pool sau khi xử lý xong một trang.
+
+        Nếu có lỗi thì kiểm tra trình duyệt còn sống không; trình duyệt bị treo
+        hoặc đã xử lý đủ max_pages trang sẽ bị đóng để lần sau khởi động lại.
+        """
+        self.pages += 1
+        self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+
+        if error and not self._is_alive(driver):
+            self._count("driver_crashes_total")
+            self.crashed += 1
+            self._discard(driver)
+            self._replace()
+            return
+
+        if self._pages[id(driver)] >= self.max_pages:
+            self._count("driver_recycles_total")
+            self.recycled += 1
+            self._discard(driver)
+            self._replace()
+            return
+
+        if not self._reset(driver):
+            self._count("driver_crashes_total")
+            self.crashed += 1
+            self._discard(driver)
+            self._replace()
+            return
+
+        with self._cond:
+            if len(self._idle) < self.size:
+                self._idle.append(driver)
+                return
+        self._discard(driver)
+
+    def _count(self, name):
+        if self.metrics is not None:
+            self.metrics.inc(name)
+
+    def _is_alive(self, driver):
+        """Kiểm tra trình duyệt còn phản hồi hay không"""
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, driver):
+        """Xóa cookie và storage giữa các tin đăng"""
+        try:
+            driver.delete_all_cookies()
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        """Đóng trình duyệt và bỏ khỏi pool"""
+        with self._cond:
+            self._pages.pop(id(driver), None)
+            self._live -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """Đóng tất cả trình duyệt trong pool, kể cả trình duyệt đang khởi động ở luồng nền"""
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        while self._idle:
+            self._discard(self._idle.pop())
+
+    def stats(self):
+        """
+        Thống kê số lần khởi động và thời gian tiết kiệm được so với việc
+        khởi động một trình duyệt cho mỗi trang.
+        """
+        avg_launch = self.launch_time / self.launches if self.launches else 0.0
+        saved = max(0, self.pages - self.launches) * avg_launch
+        return {
+            "pages": self.pages,
+            "launches": self.launches,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+            "avg_launch_seconds": round(avg_launch, 3),
+            "saved_seconds": round(saved, 1),
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,6 +1,15 @@
 import pandas as pd
+import argparse
+import csv
+import hashlib
 import json
+import math
 import os
+import re
+import sqlite3
+import tempfile
+import time
+from linkStore import LinkStore
 
 def remove_duplicates_from_json(input_file='linkProduct.json', output_file=None):
     """
@@ -106,5 +115,374 @@ def convert_json_to_csv(input_file='linkProduct.json', output_file='linkProduct.
         print(f"Lỗi khi chuyển đổi file: {e}")
         return False
 
+def convert_store_to_csv(db_file='linkProduct.db', output_file='linkProduct.csv', json_file='linkProduct.json'):
+    """
+    Xuất các liên kết trong kho SQLite (LinkStore) ra file CSV.
+    
+    Kho đã đảm bảo không có liên kết trùng lặp nên không cần bước lọc riêng.
+    Nếu kho chưa có, các liên kết trong json_file sẽ được nhập vào trước.
+    
+    Parameters:
+        db_file (str): Đường dẫn đến file SQLite của LinkStore
+        output_file (str): Đường dẫn đến file CSV đầu ra
+        json_file (str): File JSON cũ dùng để nhập vào kho nếu cần
+    
+    Returns:
+        int: Số liên kết đã xuất
+    """
+    try:
+        with LinkStore(db_file) as store:
+            imported = store.import_json(json_file)
+            if imported:
+                print(f"Đã nhập {imported} liên kết từ {json_file} vào {db_file}")
+            
+            count = 0
+            with open(output_file, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['url'])
+                for link in store.iter_links():
+                    writer.writerow([link])
+                    count += 1
+        
+        print(f"Đã lưu {count} liên kết vào file {output_file}")
+        return count
+    
+    except Exception as e:
+        print(f"Lỗi khi xuất kho liên kết: {e}")
+        return 0
+
+def convert_csv_to_parquet(input_file='property_data.csv', output_dir='property_data_parquet', crawl_date=None):
+    """
+    Chuyển file dữ liệu CSV đã cào sang thư mục Parquet chia theo ngày cào và loại tin.
+    
+    File CSV không lưu ngày cào nên mặc định dùng ngày sửa đổi cuối của file. Chạy lại
+    sẽ ghi đè các thư mục con của ngày đó thay vì thêm dữ liệu trùng.
+    
+    Parameters:
+        input_file (str): Đường dẫn đến file CSV đầu vào
+        output_dir (str): Thư mục Parquet đầu ra
+        crawl_date (str): Ngày cào (YYYY-MM-DD) ghi cho các dòng
+    
+    Returns:
+        int: Số dòng đã chuyển
+    """
+    from parquetSink import write_parquet_records
+    
+    if not os.path.exists(input_file):
+        print(f"Lỗi: File {input_file} không tồn tại.")
+        return 0
+    
+    try:
+        if crawl_date is None:
+            crawl_date = time.strftime("%Y-%m-%d", time.localtime(os.path.getmtime(input_file)))
+        
+        df = pd.read_csv(input_file, dtype=str, encoding='utf-8-sig')
+        count = write_parquet_records(df.to_dict('records'), output_dir, crawl_date, replace=True)
+        print(f"Đã chuyển {count} dòng từ {input_file} sang {output_dir}")
+        return count
+    
+    except Exception as e:
+        print(f"Lỗi khi chuyển sang Parquet: {e}")
+        return 0
+
+# Mã tin nằm ở cuối đường dẫn trang chi tiết, ví dụ /ban-nha-rieng-...-pr42291037?utm_source=...
+LISTING_ID_URL_PATTERN = re.compile(r"-pr(\d+)/?(?:[?#]|$)")
+LISTING_ID_COLUMN = "Mã tin"
+URL_COLUMNS = ("url", "URL", "link", "Link")
+
+def canonical_url(url):
+    """
+    Dạng chuẩn của một liên kết: https, tên miền chữ thường không có www., bỏ query string
+    (tham số theo dõi như utm_source), phần # và dấu / ở cuối.
+    """
+    # Tách chuỗi trực tiếp thay vì urlsplit vì hàm được gọi cho từng liên kết trong file rất lớn
+    url = str(url).strip().split('#', 1)[0].split('?', 1)[0]
+    _, _, rest = url.rpartition('://')
+    host, _, path = rest.partition('/')
+    host = host.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.endswith((":80", ":443")):
+        host = host.rsplit(":", 1)[0]
+    return f"https://{host}/{path.rstrip('/')}"
+
+def listing_id_from_url(url):
+    """Mã tin lấy từ đường dẫn trang chi tiết, None nếu không có"""
+    match = LISTING_ID_URL_PATTERN.search(str(url).strip())
+    return match.group(1) if match else None
+
+def link_key(url):
+    """Khóa so trùng của một liên kết: mã tin nếu có, ngược lại liên kết dạng chuẩn"""
+    listing_id = listing_id_from_url(url)
+    return f"id:{listing_id}" if listing_id else f"url:{canonical_url(url)}"
+
+def record_key(row, columns):
+    """
+    Khóa so trùng của một dòng dữ liệu: cột "Mã tin" nếu là số, mã tin lấy từ cột URL nếu có,
+    ngược lại mã băm cả dòng (dòng lệch cột chỉ bị bỏ khi trùng hoàn toàn).
+    """
+    values = dict(zip(columns, row))
+    listing_id = (values.get(LISTING_ID_COLUMN) or "").strip()
+    if listing_id.isdigit():
+        return f"id:{listing_id}"
+    for column in URL_COLUMNS:
+        if values.get(column):
+            listing_id = listing_id_from_url(values[column])
+            if listing_id:
+                return f"id:{listing_id}"
+    return "row:" + hashlib.sha1("\x1f".join(row).encode("utf-8")).hexdigest()
+
+
+class BloomFilter:
+    """
+    Tập hợp xác suất với bộ nhớ cố định: khoảng 1,8 MB cho mỗi triệu khóa với tỉ lệ báo trùng
+    nhầm 0,1% (khoảng 90 MB cho 50 triệu khóa). Không bao giờ bỏ sót khóa đã thêm, nhưng có thể
+    coi nhầm một khóa mới là đã có với tỉ lệ error_rate, tức là bỏ nhầm một phần nhỏ dòng không trùng.
+    """
+
+    def __init__(self, capacity=10_000_000, error_rate=0.001):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key):
+        # Băm kép: vị trí thứ i là h1 + i * h2. Dùng hash() có sẵn vì nhanh hơn hashlib nhiều lần;
+        # giá trị hash() đổi giữa các lần chạy nhưng bộ lọc chỉ sống trong một lần chạy
+        num_bits = self.num_bits
+        position = hash(key) % num_bits
+        step = hash((key, num_bits)) % num_bits or 1
+        for _ in range(self.num_hashes):
+            yield position
+            position = (position + step) % num_bits
+
+    def add(self, key):
+        """Thêm khóa, trả về True nếu khóa chưa có (theo bộ lọc)"""
+        bits = self.bits
+        new = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        return new
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def close(self):
+        pass
+
+
+class DiskSeenSet:
+    """
+    Tập hợp chính xác lưu trên SQLite (file tạm nếu không có db_file) nên bộ nhớ không tăng theo
+    số khóa; chậm hơn BloomFilter nhưng không bỏ nhầm dòng nào.
+    """
+
+    def __init__(self, db_file=None):
+        self._temp_dir = None
+        if db_file is None:
+            self._temp_dir = tempfile.TemporaryDirectory()
+            db_file = os.path.join(self._temp_dir.name, "seen.db")
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.conn.execute("BEGIN")
+        self._pending = 0
+
+    def add(self, key):
+        """Thêm khóa, trả về True nếu khóa chưa có"""
+        new = self.conn.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,)).rowcount > 0
+        self._pending += 1
+        if self._pending >= 100_000:
+            self.conn.commit()
+            self.conn.execute("BEGIN")
+            self._pending = 0
+        return new
+
+    def __contains__(self, key):
+        return self.conn.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone() is not None
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+
+def make_seen_set(method='exact', capacity=10_000_000, error_rate=0.001, db_file=None):
+    """Tạo tập khóa đã gặp: 'exact' (DiskSeenSet) hoặc 'bloom' (BloomFilter)"""
+    if method == 'bloom':
+        return BloomFilter(capacity, error_rate)
+    if method == 'exact':
+        return DiskSeenSet(db_file)
+    raise ValueError(f"Không hỗ trợ cách lọc trùng: {method}")
+
+def iter_json_array(input_file, chunk_size=1024 * 1024):
+    """Đọc lần lượt từng phần tử của một mảng JSON lớn mà không tải cả file vào bộ nhớ"""
+    decoder = json.JSONDecoder()
+    separator = re.compile(r"[\s,]*")
+    with open(input_file, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"File {input_file} không phải mảng JSON")
+        position = 1
+        while True:
+            position = separator.match(buffer, position).end()
+            if len(buffer) - position < chunk_size // 2:
+                # Chỉ giữ phần chưa đọc của bộ đệm rồi nạp thêm từ file
+                buffer = buffer[position:] + f.read(chunk_size)
+                position = separator.match(buffer, 0).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item
+
+def iter_links(input_file):
+    """Đọc lần lượt các liên kết từ file JSON (mảng chuỗi) hoặc CSV (cột url)"""
+    if input_file.endswith('.json'):
+        yield from iter_json_array(input_file)
+        return
+    with open(input_file, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        index = next((header.index(c) for c in URL_COLUMNS if c in header), 0)
+        for row in reader:
+            if len(row) > index and row[index]:
+                yield row[index]
+
+class _LinkWriter:
+    """Ghi liên kết lần lượt ra file JSON (cùng định dạng json.dump indent=4) hoặc CSV (cột url)"""
+
+    def __init__(self, output_file):
+        self.json = output_file.endswith('.json')
+        self.f = open(output_file, 'w', encoding='utf-8', newline='')
+        self.count = 0
+        if self.json:
+            self.f.write('[')
+        else:
+            self.writer = csv.writer(self.f)
+            self.writer.writerow(['url'])
+
+    def write(self, link):
+        if self.json:
+            self.f.write((',' if self.count else '') + '\n    ' + json.dumps(link, ensure_ascii=False))
+        else:
+            self.writer.writerow([link])
+        self.count += 1
+
+    def close(self):
+        if self.json:
+            self.f.write('\n]' if self.count else ']')
+        self.f.close()
+
+def dedup_links_stream(input_file='linkProduct.json', output_file='linkProduct.csv', seen=None):
+    """
+    Lọc trùng liên kết theo luồng: mỗi liên kết được đưa về dạng chuẩn (canonical_url) và so trùng
+    theo mã tin, nên cùng một tin với query string hay tham số theo dõi khác nhau chỉ giữ một lần.
+    Giữ liên kết xuất hiện đầu tiên; output_file là .json hoặc .csv.
+
+    Returns:
+        tuple: (số liên kết đọc được, số liên kết giữ lại)
+    """
+    own_seen = seen is None
+    seen = make_seen_set() if own_seen else seen
+    writer = _LinkWriter(output_file)
+    total = 0
+    try:
+        for link in iter_links(input_file):
+            if not isinstance(link, str) or not link.strip():
+                continue
+            total += 1
+            if seen.add(link_key(link)):
+                writer.write(canonical_url(link))
+    finally:
+        writer.close()
+        if own_seen:
+            seen.close()
+    return total, writer.count
+
+def dedup_records_stream(input_file='property_data.csv', output_file='property_dedup.csv', seen=None):
+    """
+    Lọc trùng dữ liệu đã cào theo luồng, so trùng theo "Mã tin" (xem record_key) và giữ dòng
+    xuất hiện đầu tiên. Mỗi lần chỉ đọc một dòng nên dùng được với file lớn hơn bộ nhớ.
+
+    Returns:
+        tuple: (số dòng đọc được, số dòng giữ lại)
+    """
+    own_seen = seen is None
+    seen = make_seen_set() if own_seen else seen
+    total = kept = 0
+    try:
+        with open(input_file, 'r', encoding='utf-8-sig', newline='') as src, \
+                open(output_file, 'w', encoding='utf-8-sig', newline='') as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst, lineterminator='\n')
+            columns = next(reader, [])
+            writer.writerow(columns)
+            for row in reader:
+                total += 1
+                if seen.add(record_key(row, columns)):
+                    writer.writerow(row)
+                    kept += 1
+    finally:
+        if own_seen:
+            seen.close()
+    return total, kept
+
+def streaming_dedup(links_file='linkProduct.json', links_output='linkProduct.csv',
+                    records_file='property_data.csv', records_output='property_dedup.csv',
+                    method='exact', capacity=10_000_000, error_rate=0.001):
+    """
+    Lọc trùng liên kết và dữ liệu đã cào trong một lần đọc mỗi file, bộ nhớ không phụ thuộc kích
+    thước file: method='exact' lưu khóa đã gặp trên đĩa (SQLite), method='bloom' dùng BloomFilter
+    cho capacity khóa với tỉ lệ bỏ nhầm error_rate. Bỏ qua file đầu vào không tồn tại.
+
+    Returns:
+        dict: Số dòng đọc được và giữ lại của từng file
+    """
+    result = {}
+    for name, input_file, output_file, dedup in (("links", links_file, links_output, dedup_links_stream),
+                                                 ("records", records_file, records_output, dedup_records_stream)):
+        if not input_file or not os.path.exists(input_file):
+            continue
+        seen = make_seen_set(method, capacity, error_rate)
+        try:
+            start = time.time()
+            total, kept = dedup(input_file, output_file, seen)
+        finally:
+            seen.close()
+        print(f"Đã lọc {input_file}: {total} dòng, giữ {kept}, bỏ {total - kept} trùng lặp "
+              f"({time.time() - start:.1f} giây) -> {output_file}")
+        result[name] = {"total": total, "kept": kept}
+    return result
+
 if __name__ == "__main__":
-    convert_json_to_csv()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Lọc trùng và xuất liên kết/dữ liệu của HouseCrawl")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("export", help="Xuất kho liên kết linkProduct.db ra CSV (mặc định)")
+    stream_parser = subparsers.add_parser("stream-dedup",
+                                          help="Lọc trùng file liên kết và file dữ liệu lớn với bộ nhớ giới hạn")
+    stream_parser.add_argument("--links", default="linkProduct.json", help="File liên kết (.json hoặc .csv)")
+    stream_parser.add_argument("--links-output", default="linkProduct.csv", help="File kết quả (.json hoặc .csv)")
+    stream_parser.add_argument("--records", default="property_data.csv", help="File dữ liệu đã cào")
+    stream_parser.add_argument("--records-output", default="property_dedup.csv")
+    stream_parser.add_argument("--method", choices=("exact", "bloom"), default="exact",
+                               help="exact: lưu khóa trên đĩa (SQLite), bloom: BloomFilter")
+    stream_parser.add_argument("--capacity", type=int, default=10_000_000, help="Số khóa dự kiến của BloomFilter")
+    stream_parser.add_argument("--error-rate", type=float, default=0.001, help="Tỉ lệ bỏ nhầm của BloomFilter")
+    args = parser.parse_args()
+
+    if args.command == "stream-dedup":
+        streaming_dedup(args.links, args.links_output, args.records, args.records_output,
+                        args.method, args.capacity, args.error_rate)
+    else:
+        convert_store_to_csv()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from frontier import DETAIL
+
+# Trạng thái của một bản ghi so với lần tải trước
+NEW = 'new'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+# Loại sự kiện thay đổi
+PRICE_CHANGED = 'price_changed'
+RELISTED = 'relisted'
+EXPIRY_CHANGED = 'expiry_changed'
+SPECS_CHANGED = 'specs_changed'
+
+LISTING_ID_FIELD = "Mã tin"
+POSTED_FIELD = "Ngày đăng"
+EXPIRY_FIELD = "Ngày hết hạn"
+PRICE_FIELD = "Khoảng giá"
+DATE_FORMAT = "%d/%m/%Y"
+
+def _iso_date(value):
+    """Chuyển ngày dạng dd/mm/yyyy thành yyyy-mm-dd để so sánh được, None nếu không hợp lệ"""
+    try:
+        return datetime.strptime(str(value).strip(), DATE_FORMAT).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+def spec_hash(record):
+    """Mã băm các thông tin của tin đăng, không tính mã tin và ngày đăng/hết hạn"""
+    specs = {k: v for k, v in record.items() if k not in (LISTING_ID_FIELD, POSTED_FIELD, EXPIRY_FIELD)}
+    return hashlib.sha1(json.dumps(specs, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+def fingerprint(record):
+    """Dấu vân tay của một tin đăng: mã tin, ngày đăng, ngày hết hạn, giá và mã băm thông tin"""
+    return {
+        "listing_id": record.get(LISTING_ID_FIELD),
+        "posted_date": _iso_date(record.get(POSTED_FIELD)),
+        "expiry_date": _iso_date(record.get(EXPIRY_FIELD)),
+        "price": record.get(PRICE_FIELD),
+        "spec_hash": spec_hash(record),
+    }
+
+
+class FingerprintStore:
+    """
+    Lưu dấu vân tay của từng tin đăng đã tải trên SQLite để lần cào sau chỉ ghi những tin
+    mới hoặc đã thay đổi, kèm các sự kiện thay đổi (đổi giá, đăng lại...) thay vì bản sao đầy đủ.
+    """
+
+    def __init__(self, db_file='fingerprints.db'):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " url TEXT PRIMARY KEY,"
+            " listing_id TEXT,"
+            " posted_date TEXT,"
+            " expiry_date TEXT,"
+            " price TEXT,"
+            " spec_hash TEXT NOT NULL,"
+            " first_seen REAL NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " changed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_fingerprints_expiry ON fingerprints (expiry_date)")
+        self.conn.commit()
+
+    def compare(self, url, record):
+        """
+        So sánh bản ghi vừa tải với dấu vân tay đã lưu (không ghi gì vào kho).
+
+        Returns:
+            tuple: (trạng thái NEW/CHANGED/UNCHANGED, danh sách sự kiện thay đổi)
+        """
+        row = self.conn.execute(
+            "SELECT listing_id, posted_date, expiry_date, price, spec_hash FROM fingerprints WHERE url = ?",
+            (url,),
+        ).fetchone()
+        current = fingerprint(record)
+        if row is None:
+            return NEW, []
+
+        old = dict(zip(("listing_id", "posted_date", "expiry_date", "price", "spec_hash"), row))
+        events = []
+
+        def event(kind, field, before, after):
+            events.append({"event": kind, "url": url, "listing_id": current["listing_id"] or old["listing_id"],
+                           "field": field, "old": before, "new": after})
+
+        if current["posted_date"] and old["posted_date"] and current["posted_date"] > old["posted_date"]:
+            event(RELISTED, POSTED_FIELD, old["posted_date"], current["posted_date"])
+        elif current["expiry_date"] != old["expiry_date"]:
+            event(EXPIRY_CHANGED, EXPIRY_FIELD, old["expiry_date"], current["expiry_date"])
+        if current["price"] != old["price"]:
+            event(PRICE_CHANGED, PRICE_FIELD, old["price"], current["price"])
+        elif current["spec_hash"] != old["spec_hash"]:
+            event(SPECS_CHANGED, None, None, record)
+        return (CHANGED if events else UNCHANGED), events
+
+    def update(self, items):
+        """Lưu dấu vân tay của các cặp (url, bản ghi) vừa được ghi ra file"""
+        now = time.time()
+        with self.conn:
+            for url, record in items:
+                fp = fingerprint(record)
+                self.conn.execute(
+                    "INSERT INTO fingerprints (url, listing_id, posted_date, expiry_date, price, spec_hash,"
+                    " first_seen, fetched_at, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(url) DO UPDATE SET"
+                    " changed_at = CASE WHEN spec_hash != excluded.spec_hash OR posted_date IS NOT excluded.posted_date"
+                    "   OR expiry_date IS NOT excluded.expiry_date THEN excluded.changed_at ELSE changed_at END,"
+                    " listing_id = excluded.listing_id, posted_date = excluded.posted_date,"
+                    " expiry_date = excluded.expiry_date, price = excluded.price,"
+                    " spec_hash = excluded.spec_hash, fetched_at = excluded.fetched_at",
+                    (url, fp["listing_id"], fp["posted_date"], fp["expiry_date"], fp["price"], fp["spec_hash"],
+                     now, now, now),
+                )
+
+    def expired_urls(self, today=None):
+        """Các tin đã hết hạn và chưa được tải lại kể từ ngày hết hạn"""
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        rows = self.conn.execute(
+            "SELECT url, expiry_date, fetched_at FROM fingerprints WHERE expiry_date < ?", (today,))
+        urls = []
+        for url, expiry_date, fetched_at in rows:
+            expired_at = datetime.strptime(expiry_date, "%Y-%m-%d") + timedelta(days=1)
+            if fetched_at < expired_at.timestamp():
+                urls.append(url)
+        return urls
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def schedule_refresh(frontier, fingerprints, refresh_days=7, refresh_expired=True):
+    """
+    Đưa lại vào frontier các tin cần tải lại theo chính sách làm mới: tin đã tải quá
+    refresh_days ngày (None để tắt) và tin đã hết hạn từ lần tải trước (để biết tin được
+    đăng lại hay gia hạn). Tin chưa từng tải vẫn được thêm như bình thường qua frontier.add.
+
+    Returns:
+        int: Số tin được đưa lại
+    """
+    due = set()
+    if refresh_days is not None:
+        due.update(frontier.done_before(DETAIL, time.time() - refresh_days * 86400))
+    if refresh_expired:
+        due.update(fingerprints.expired_urls())
+    return frontier.requeue(DETAIL, due)
+
+def append_events(events, events_file='change_events.jsonl'):
+    """Ghi các sự kiện thay đổi vào cuối file JSONL, mỗi dòng một sự kiện"""
+    if not events:
+        return
+    detected_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(events_file, 'a', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps({**event, "detected_at": detected_at}, ensure_ascii=False) + "\n")
@@ -0,0 +1,409 @@
+import argparse
+import json
+import sqlite3
+import time
+
+# Trạng thái của mỗi URL/trang trong frontier
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+STATUSES = (PENDING, LEASED, DONE, FAILED)
+
+# Loại công việc: trang chi tiết (URL) và trang danh sách (số trang)
+DETAIL = 'detail'
+LISTING = 'listing'
+
+# Điều kiện công việc có thể nhận ngay, tham số là thời điểm hiện tại (2 lần)
+AVAILABLE_CONDITION = ("((status = 'pending' AND (not_before IS NULL OR not_before <= ?))"
+                       " OR (status = 'leased' AND lease_until < ?))")
+
+# Số tiến trình mong muốn, có thể thay đổi khi đang chạy
+NUM_WORKERS_SETTING = 'num_workers'
+
+# Trạng thái của một máy (node) chạy main.py
+NODE_ACTIVE = 'active'
+NODE_STOPPED = 'stopped'
+NODE_DEAD = 'dead'
+
+
+class Frontier:
+    """
+    Danh sách công việc lưu trên SQLite, ghi lại trạng thái từng URL chi tiết và từng trang
+    danh sách (pending, leased, done, failed) kèm thời gian, để có thể tiếp tục đúng chỗ
+    đã dừng thay vì sửa tay urls[3574:] hay range(2245, 2890).
+
+    Mỗi tiến trình mở một Frontier riêng trên cùng file. Khi chạy trên nhiều máy, frontierServer.py
+    phục vụ một Frontier qua HTTP; mỗi máy đăng ký một node, nhận việc kèm node_id và gửi
+    heartbeat, công việc của node ngừng gửi heartbeat được trả lại cho node khác.
+    """
+
+    def __init__(self, db_file='frontier.db', check_same_thread=True):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, timeout=60, check_same_thread=check_same_thread)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            " kind TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " lease_until REAL,"
+            " error TEXT,"
+            " error_class TEXT,"
+            " not_before REAL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " done_at REAL,"
+            " leased_by TEXT,"
+            " PRIMARY KEY (kind, key))"
+        )
+        # Thêm các cột mới cho file frontier tạo bởi phiên bản cũ
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(frontier)")}
+        for column in ("error_class TEXT", "not_before REAL", "leased_by TEXT"):
+            if column.split()[0] not in columns:
+                self.conn.execute(f"ALTER TABLE frontier ADD COLUMN {column}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_frontier_status ON frontier (kind, status)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            " node_id TEXT PRIMARY KEY,"
+            " info TEXT,"
+            " status TEXT NOT NULL,"
+            " registered_at REAL NOT NULL,"
+            " heartbeat_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def add(self, kind, keys):
+        """
+        Thêm công việc mới ở trạng thái pending, bỏ qua công việc đã có.
+
+        Returns:
+            int: Số công việc mới được thêm
+        """
+        now = time.time()
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO frontier (kind, key, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                ((kind, str(key), now, now) for key in keys if key),
+            )
+        return self.conn.total_changes - before
+
+    def lease(self, kind, limit=None, lease_seconds=600, node_id=None):
+        """
+        Nhận các công việc đang chờ (hoặc có lease đã hết hạn) và đánh dấu leased bởi node_id.
+        Công việc đang chờ thử lại chỉ được nhận khi đã qua thời điểm not_before.
+
+        Returns:
+            list: Các key đã nhận
+        """
+        now = time.time()
+        with self.conn:
+            # BEGIN IMMEDIATE để hai tiến trình không nhận cùng một công việc
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(
+                "SELECT key FROM frontier WHERE kind = ? AND " + AVAILABLE_CONDITION +
+                " ORDER BY created_at, rowid LIMIT ?",
+                (kind, now, now, -1 if limit is None else limit),
+            ).fetchall()
+            keys = [row[0] for row in rows]
+            self.conn.executemany(
+                "UPDATE frontier SET status = 'leased', lease_until = ?, leased_by = ?, attempts = attempts + 1,"
+                " updated_at = ? WHERE kind = ? AND key = ?",
+                ((now + lease_seconds, node_id, now, kind, key) for key in keys),
+            )
+        return keys
+
+    def fail_exhausted(self, kind, attempt_limits, default_limit):
+        """
+        Đánh dấu failed các công việc có thể nhận lại (lease hết hạn hoặc đã được trả về pending
+        bằng reset_leases/reclaim_dead_nodes) nhưng đã được nhận đủ số lần cho phép. Lần xử lý cuối
+        của chúng không báo lại kết quả (tiến trình chết hoặc bị treo) nên chưa qua handle_failure,
+        nếu không dừng lại thì attempts tăng mãi.
+
+        Parameters:
+            attempt_limits (dict): Số lần nhận tối đa theo nhóm lỗi của lần lỗi gần nhất
+            default_limit (int): Số lần nhận tối đa của công việc chưa từng bị lỗi
+
+        Returns:
+            list: Các (key, attempts, error, error_class) đã bị đánh dấu failed
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(
+                "SELECT key, attempts, error, error_class FROM frontier WHERE kind = ? AND " + AVAILABLE_CONDITION +
+                " AND attempts >= ?",
+                (kind, now, now, min([default_limit, *attempt_limits.values()])),
+            ).fetchall()
+            exhausted = []
+            for key, attempts, error, error_class in rows:
+                if attempts < attempt_limits.get(error_class, default_limit):
+                    continue
+                error = f"Không nhận được kết quả sau {attempts} lần xử lý" + (
+                    f"; lỗi trước đó: {error}" if error else "")
+                exhausted.append((key, attempts, error[:1000], error_class))
+            self.conn.executemany(
+                "UPDATE frontier SET status = 'failed', lease_until = NULL, error = ?, updated_at = ?"
+                " WHERE kind = ? AND key = ?",
+                ((error, now, kind, key) for key, _, error, _ in exhausted),
+            )
+        return exhausted
+
+    def complete(self, kind, keys):
+        """Đánh dấu các công việc đã xong"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE frontier SET status = 'done', lease_until = NULL, error = NULL, error_class = NULL,"
+                " updated_at = ?, done_at = ? WHERE kind = ? AND key = ?",
+                ((now, now, kind, str(key)) for key in keys),
+            )
+
+    def fail(self, kind, key, error, error_class=None):
+        """Đánh dấu công việc bị lỗi và không thử lại nữa"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE frontier SET status = 'failed', lease_until = NULL, error = ?, error_class = ?,"
+                " updated_at = ? WHERE kind = ? AND key = ?",
+                (str(error)[:1000], error_class, now, kind, str(key)),
+            )
+
+    def retry(self, kind, key, error, error_class, delay):
+        """Trả công việc bị lỗi về pending, chỉ được nhận lại sau delay giây"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE frontier SET status = 'pending', lease_until = NULL, error = ?, error_class = ?,"
+                " not_before = ?, updated_at = ? WHERE kind = ? AND key = ?",
+                (str(error)[:1000], error_class, now + delay, now, kind, str(key)),
+            )
+
+    def attempts(self, kind, key):
+        """Số lần công việc đã được nhận xử lý"""
+        row = self.conn.execute(
+            "SELECT attempts FROM frontier WHERE kind = ? AND key = ?", (kind, str(key))).fetchone()
+        return row[0] if row else 0
+
+    def next_retry_time(self, kind):
+        """Thời điểm sớm nhất có công việc đang chờ thử lại, None nếu không có"""
+        return self.conn.execute(
+            "SELECT MIN(not_before) FROM frontier WHERE kind = ? AND status = 'pending' AND not_before > ?",
+            (kind, time.time()),
+        ).fetchone()[0]
+
+    def reset_leases(self, kind):
+        """
+        Trả các công việc đang leased về pending. Dùng khi bắt đầu một lần chạy mới
+        để nhận lại công việc của lần chạy trước bị dừng giữa chừng.
+
+        Returns:
+            int: Số công việc được trả lại
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE frontier SET status = 'pending', lease_until = NULL, updated_at = ?"
+                " WHERE kind = ? AND status = 'leased'",
+                (time.time(), kind),
+            )
+        return cursor.rowcount
+
+    def register_node(self, node_id, info=None):
+        """Đăng ký (hoặc đăng ký lại) một node đang chạy, info là thông tin mô tả node"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO nodes (node_id, info, status, registered_at, heartbeat_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (node_id, json.dumps(info or {}, ensure_ascii=False), NODE_ACTIVE, now, now),
+            )
+
+    def heartbeat(self, node_id):
+        """
+        Báo node còn sống. Lease của từng lô không được gia hạn: tiến trình bị treo trong một node
+        còn sống vẫn được xử lý bằng lease_seconds như khi chạy một máy.
+
+        Returns:
+            bool: False nếu node đã bị coi là chết (công việc của nó đã được trả lại)
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE nodes SET heartbeat_at = ? WHERE node_id = ? AND status = ?",
+                (time.time(), node_id, NODE_ACTIVE))
+        return cursor.rowcount > 0
+
+    def unregister_node(self, node_id):
+        """Đánh dấu node đã dừng bình thường"""
+        with self.conn:
+            self.conn.execute("UPDATE nodes SET status = ? WHERE node_id = ?", (NODE_STOPPED, node_id))
+
+    def reclaim_dead_nodes(self, heartbeat_timeout=60):
+        """
+        Đánh dấu chết các node không gửi heartbeat quá heartbeat_timeout giây và trả các
+        công việc chúng đang giữ về pending, không phải chờ lease hết hạn.
+
+        Returns:
+            int: Số công việc được trả lại
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            dead = [row[0] for row in self.conn.execute(
+                "SELECT node_id FROM nodes WHERE status = ? AND heartbeat_at < ?",
+                (NODE_ACTIVE, now - heartbeat_timeout))]
+            reclaimed = 0
+            for node_id in dead:
+                self.conn.execute("UPDATE nodes SET status = ? WHERE node_id = ?", (NODE_DEAD, node_id))
+                reclaimed += self.conn.execute(
+                    "UPDATE frontier SET status = 'pending', lease_until = NULL, leased_by = NULL, updated_at = ?"
+                    " WHERE status = 'leased' AND leased_by = ?", (now, node_id)).rowcount
+        return reclaimed
+
+    def nodes(self):
+        """Danh sách node đã đăng ký kèm số công việc đang giữ"""
+        now = time.time()
+        rows = self.conn.execute(
+            "SELECT n.node_id, n.info, n.status, n.heartbeat_at,"
+            " (SELECT COUNT(*) FROM frontier f WHERE f.status = 'leased' AND f.leased_by = n.node_id)"
+            " FROM nodes n ORDER BY n.registered_at").fetchall()
+        return [{"node_id": node_id, "info": json.loads(info or "{}"), "status": status,
+                 "heartbeat_seconds_ago": round(now - heartbeat_at, 1), "leased": leased}
+                for node_id, info, status, heartbeat_at, leased in rows]
+
+    def done_before(self, kind, timestamp):
+        """Các công việc đã xong trước thời điểm timestamp"""
+        return [row[0] for row in self.conn.execute(
+            "SELECT key FROM frontier WHERE kind = ? AND status = 'done' AND done_at < ?", (kind, timestamp))]
+
+    def requeue(self, kind, keys):
+        """
+        Đưa các công việc đã xong về pending để xử lý lại (ví dụ làm mới tin đăng).
+
+        Returns:
+            int: Số công việc được đưa lại
+        """
+        now = time.time()
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE frontier SET status = 'pending', attempts = 0, lease_until = NULL, not_before = NULL,"
+                " updated_at = ? WHERE kind = ? AND key = ? AND status = 'done'",
+                ((now, kind, str(key)) for key in keys),
+            )
+        return self.conn.total_changes - before
+
+    def available(self, kind):
+        """Số công việc có thể nhận ngay (pending đã đến lượt hoặc có lease đã hết hạn)"""
+        now = time.time()
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM frontier WHERE kind = ? AND " + AVAILABLE_CONDITION,
+            (kind, now, now),
+        ).fetchone()[0]
+
+    def get_setting(self, name, default=None):
+        """Đọc một thiết lập dùng chung giữa các tiến trình (số nguyên)"""
+        row = self.conn.execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+        return int(row[0]) if row else default
+
+    def set_setting(self, name, value):
+        """Ghi một thiết lập dùng chung giữa các tiến trình"""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def error_classes(self, kind):
+        """Số công việc đang chờ thử lại và đã lỗi hẳn theo từng nhóm lỗi"""
+        result = {}
+        for status, error_class, count in self.conn.execute(
+                "SELECT status, error_class, COUNT(*) FROM frontier WHERE kind = ? AND error_class IS NOT NULL"
+                " GROUP BY status, error_class", (kind,)):
+            result.setdefault(error_class, {"retrying": 0, "failed": 0})
+            result[error_class]["failed" if status == FAILED else "retrying"] += count
+        return result
+
+    def counts(self, kind):
+        """Số công việc theo từng trạng thái"""
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self.conn.execute(
+                "SELECT status, COUNT(*) FROM frontier WHERE kind = ? GROUP BY status", (kind,)):
+            counts[status] = count
+        return counts
+
+    def summary(self, kind, window_seconds=3600):
+        """
+        Thống kê trạng thái và ước tính thời gian còn lại dựa trên tốc độ hoàn thành
+        trong window_seconds giây gần nhất.
+        """
+        counts = self.counts(kind)
+        now = time.time()
+        recent, first_done = self.conn.execute(
+            "SELECT COUNT(*), MIN(done_at) FROM frontier WHERE kind = ? AND status = 'done' AND done_at >= ?",
+            (kind, now - window_seconds),
+        ).fetchone()
+
+        rate = recent / (now - first_done) if recent > 1 and now > first_done else 0.0
+        remaining = counts[PENDING] + counts[LEASED]
+        eta = remaining / rate if rate > 0 else None
+        return {
+            "kind": kind,
+            **counts,
+            "total": sum(counts.values()),
+            "per_minute": round(rate * 60, 1),
+            "eta_seconds": round(eta) if eta is not None else None,
+        }
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def workers_setting(node_id=None):
+    """Tên thiết lập số tiến trình: dùng chung khi chạy một máy, riêng cho từng node khi chạy nhiều máy"""
+    return NUM_WORKERS_SETTING if node_id is None else f"{NUM_WORKERS_SETTING}:{node_id}"
+
+def format_eta(seconds):
+    """Định dạng số giây thành HH:MM:SS"""
+    if seconds is None:
+        return "không xác định"
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def print_status(db_file='frontier.db'):
+    """In thống kê trạng thái của frontier"""
+    with Frontier(db_file) as frontier:
+        for kind, label in ((LISTING, "Trang danh sách"), (DETAIL, "Trang chi tiết")):
+            info = frontier.summary(kind)
+            print(f"{label}: tổng {info['total']} | chờ {info['pending']} | đang xử lý {info['leased']}"
+                  f" | xong {info['done']} | lỗi {info['failed']}"
+                  f" | {info['per_minute']}/phút | còn lại ~{format_eta(info['eta_seconds'])}")
+            for error_class, info in sorted(frontier.error_classes(kind).items()):
+                print(f"    {error_class}: {info['retrying']} chờ thử lại, {info['failed']} lỗi hẳn")
+        for node in frontier.nodes():
+            if node['status'] == NODE_ACTIVE or node['leased']:
+                print(f"Node {node['node_id']}: {node['status']}, heartbeat {node['heartbeat_seconds_ago']} giây trước,"
+                      f" đang giữ {node['leased']} công việc")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quản lý frontier của HouseCrawl")
+    parser.add_argument("--db", default="frontier.db", help="File SQLite của frontier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Thống kê trạng thái và thời gian còn lại")
+    workers_parser = subparsers.add_parser("workers", help="Thay đổi số tiến trình của main.py khi đang chạy")
+    workers_parser.add_argument("count", type=int)
+    workers_parser.add_argument("--node", default=None, help="Chỉ đổi số tiến trình của node này (chạy nhiều máy)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print_status(args.db)
+    elif args.command == "workers":
+        with Frontier(args.db) as frontier:
+            frontier.set_setting(workers_setting(args.node), max(1, args.count))
+        print(f"Đã đặt số tiến trình là {max(1, args.count)}")
@@ -0,0 +1,288 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from frontier import Frontier
+from csvSink import csv_writer_process
+
+# Các phương thức của Frontier được phép gọi qua mạng. reset_leases không có ở đây vì sẽ lấy mất
+# công việc của các node khác đang chạy; node chết được xử lý bằng reclaim_dead_nodes
+RPC_METHODS = (
+    "add", "lease", "fail_exhausted", "complete", "fail", "retry", "attempts", "next_retry_time", "available",
+    "get_setting", "set_setting", "error_classes", "counts", "summary", "done_before", "requeue",
+    "register_node", "heartbeat", "unregister_node", "reclaim_dead_nodes", "nodes",
+)
+
+# Header chứa mã bí mật dùng chung giữa máy chủ và các node (biến môi trường FRONTIER_TOKEN)
+TOKEN_HEADER = "X-Frontier-Token"
+
+def is_remote(address):
+    """Kiểm tra frontier là địa chỉ máy chủ frontier (http://...) hay file SQLite cục bộ"""
+    return str(address).startswith(("http://", "https://"))
+
+def open_frontier(address):
+    """Mở frontier theo địa chỉ: RemoteFrontier nếu là địa chỉ máy chủ, ngược lại Frontier trên file"""
+    return RemoteFrontier(address) if is_remote(address) else Frontier(address)
+
+def new_node_id():
+    """Mã node gồm tên máy và pid của tiến trình điều phối, ví dụ crawler-02-4182"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class RemoteFrontier:
+    """
+    Frontier trên máy chủ frontierServer.py, có cùng các phương thức với Frontier (danh sách
+    RPC_METHODS) nên process_url_batch và handle_failure dùng được mà không cần sửa.
+
+    Mỗi lần gọi là một yêu cầu HTTP; số lần gọi ít vì các tiến trình nhận việc theo lô
+    và bản ghi được gửi theo lô lớn bằng push_records.
+    """
+
+    def __init__(self, base_url, token=None, timeout=30, retries=3):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.session = requests.Session()
+        token = token or os.environ.get("FRONTIER_TOKEN")
+        if token:
+            self.session.headers[TOKEN_HEADER] = token
+
+    def _post(self, path, payload):
+        """Gửi yêu cầu POST, thử lại khi lỗi kết nối (máy chủ khởi động lại, mạng chập chờn)"""
+        import requests
+
+        data = json.dumps(payload, ensure_ascii=False, default=list).encode("utf-8")
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(self.base_url + path, data=data, timeout=self.timeout,
+                                             headers={"Content-Type": "application/json"})
+                break
+            except requests.ConnectionError:
+                if attempt == self.retries:
+                    raise
+                time.sleep(2 ** attempt)
+        body = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(f"Máy chủ frontier báo lỗi ({response.status_code}): {body.get('error')}")
+        return body.get("result")
+
+    def _call(self, method, args, kwargs):
+        return self._post(f"/rpc/{method}", {"args": list(args), "kwargs": kwargs})
+
+    def __getattr__(self, name):
+        if name not in RPC_METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._call(name, args, kwargs)
+
+    def push_records(self, items):
+        """Gửi một lô (url, bản ghi) tới tiến trình ghi của máy chủ"""
+        return self._post("/records", {"items": [list(item) for item in items]})
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def remote_sink_process(record_queue, address, flush_size=200, flush_interval=1.0, metrics=None, quiet=False):
+    """
+    Tiến trình gửi bản ghi của một node: nhận (url, bản ghi) từ record_queue như csv_writer_process
+    và gửi theo lô tới máy chủ frontier, nơi tiến trình ghi duy nhất ghi file và đánh dấu URL xong.
+    Gửi None vào hàng đợi để kết thúc.
+
+    Lô được gửi thường xuyên hơn csv_writer_process (mỗi flush_interval giây) vì mỗi lần gửi
+    chỉ là một yêu cầu HTTP nhỏ. Lô gửi lỗi được giữ lại và gửi lại ở lần sau; nếu node dừng trước khi gửi được, các URL
+    vẫn ở trạng thái leased và được node khác tải lại sau khi lease hết hạn.
+    """
+    frontier = RemoteFrontier(address)
+    buffer = []
+    sent = 0
+    last_flush = time.time()
+
+    def flush():
+        nonlocal buffer, sent, last_flush
+        last_flush = time.time()
+        if not buffer:
+            return
+        start = time.perf_counter()
+        try:
+            frontier.push_records(buffer)
+        except Exception as e:
+            print(f"📡 Lỗi khi gửi {len(buffer)} bản ghi tới {address}: {e}")
+            return
+        sent += len(buffer)
+        if metrics is not None:
+            metrics.observe("push_seconds", time.perf_counter() - start)
+            metrics.inc("records_pushed_total", len(buffer))
+        if not quiet:
+            print(f"📡 Đã gửi {len(buffer)} bản ghi, tổng {sent} bản ghi tới {address}")
+        buffer = []
+
+    while True:
+        try:
+            item = record_queue.get(timeout=flush_interval)
+        except queue.Empty:
+            flush()
+            continue
+
+        if item is None:
+            break
+        buffer.append(item)
+        if len(buffer) >= flush_size or time.time() - last_flush >= flush_interval:
+            flush()
+
+    flush()
+    frontier.close()
+    if buffer:
+        print(f"📡 Còn {len(buffer)} bản ghi chưa gửi được, các URL sẽ được tải lại sau khi lease hết hạn")
+
+
+class FrontierHandler(BaseHTTPRequestHandler):
+    """Xử lý yêu cầu tới máy chủ frontier: /rpc/<phương thức> và /records"""
+
+    def do_POST(self):
+        if self.server.token and self.headers.get(TOKEN_HEADER) != self.server.token:
+            return self._reply(403, {"error": "Sai mã bí mật"})
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path.startswith("/rpc/"):
+                method = self.path[len("/rpc/"):]
+                if method not in RPC_METHODS:
+                    return self._reply(404, {"error": f"Không có phương thức {method}"})
+                with self.server.lock:
+                    result = getattr(self.server.frontier, method)(*payload.get("args", []),
+                                                                    **payload.get("kwargs", {}))
+                return self._reply(200, {"result": result})
+            if self.path == "/records":
+                for url, record in payload["items"]:
+                    self.server.record_queue.put((url, record))
+                return self._reply(200, {"result": len(payload["items"])})
+            return self._reply(404, {"error": "Không tìm thấy"})
+        except Exception as e:
+            return self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FrontierServer(ThreadingHTTPServer):
+    """
+    Máy chủ frontier dùng chung cho nhiều máy chạy main.py: phục vụ một Frontier trên file
+    SQLite qua HTTP và chuyển bản ghi các node gửi lên vào record_queue của tiến trình ghi.
+
+    Mọi lời gọi tới Frontier đi qua một kết nối và một khóa nên SQLite chỉ có một bên ghi; mỗi lời
+    gọi chỉ mất dưới một mili giây nên máy chủ không phải là điểm nghẽn khi thêm node.
+    Một luồng nền định kỳ trả lại công việc của các node không gửi heartbeat quá heartbeat_timeout giây.
+
+    Parameters:
+        db_file (str): File SQLite của frontier
+        record_queue: Hàng đợi của tiến trình ghi (csv_writer_process), None nếu không nhận bản ghi
+        heartbeat_timeout (float): Số giây không có heartbeat để coi một node là đã chết
+        token (str): Mã bí mật các node phải gửi kèm, None là không kiểm tra
+    """
+
+    daemon_threads = True
+
+    def __init__(self, db_file="frontier.db", host="127.0.0.1", port=8770, record_queue=None,
+                 heartbeat_timeout=60, token=None):
+        super().__init__((host, port), FrontierHandler)
+        self.frontier = Frontier(db_file, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.record_queue = record_queue
+        self.heartbeat_timeout = heartbeat_timeout
+        self.token = token
+        self._stopped = threading.Event()
+        self._reaper = threading.Thread(target=self._reap, daemon=True)
+        self._reaper.start()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}"
+
+    def handle_error(self, request, client_address):
+        # Node bị dừng giữa chừng làm đứt kết nối, không cần in traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def _reap(self):
+        """Luồng nền trả lại công việc của các node đã chết"""
+        while not self._stopped.wait(max(1.0, self.heartbeat_timeout / 3)):
+            with self.lock:
+                reclaimed = self.frontier.reclaim_dead_nodes(self.heartbeat_timeout)
+            if reclaimed:
+                print(f"♻ Trả lại {reclaimed} công việc của node không còn gửi heartbeat")
+
+    def server_close(self):
+        self._stopped.set()
+        super().server_close()
+        with self.lock:
+            self.frontier.close()
+
+def start_frontier_server(**settings):
+    """Khởi động FrontierServer trong một luồng nền và trả về server"""
+    server = FrontierServer(**settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def serve(db_file="frontier.db", host="127.0.0.1", port=8770, output_file="property_data.csv",
+          parquet_dir=None, fingerprint_file=None, events_file="change_events.jsonl", heartbeat_timeout=60,
+          token=None, index_dir=None):
+    """
+    Chạy máy chủ frontier cùng tiến trình ghi duy nhất cho đến khi nhấn Ctrl+C. Các node chạy
+    main.py với frontier_file là địa chỉ máy chủ; bản ghi của mọi node được ghi vào output_file
+    (và parquet_dir, fingerprint_file, chỉ mục truy vấn index_dir nếu có) trên máy này.
+    """
+    record_queue = multiprocessing.Queue(maxsize=10000)
+    writer = multiprocessing.Process(target=csv_writer_process,
+                                     kwargs={"record_queue": record_queue, "output_file": output_file,
+                                             "frontier_file": db_file, "parquet_dir": parquet_dir,
+                                             "fingerprint_file": fingerprint_file, "events_file": events_file,
+                                             "index_dir": index_dir})
+    writer.start()
+    server = FrontierServer(db_file, host, port, record_queue, heartbeat_timeout, token)
+    print(f"🛰 Máy chủ frontier tại {server.base_url} ({db_file}), ghi vào {output_file}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        record_queue.put(None)
+        writer.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Máy chủ frontier dùng chung cho nhiều máy chạy main.py")
+    parser.add_argument("--db", default="frontier.db", help="File SQLite của frontier")
+    parser.add_argument("--host", default="127.0.0.1", help="Địa chỉ lắng nghe, 0.0.0.0 để các máy khác kết nối")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--output", default="property_data.csv", help="File CSV nhận bản ghi của mọi node")
+    parser.add_argument("--parquet", default=None, help="Thư mục Parquet nhận bản ghi của mọi node")
+    parser.add_argument("--fingerprints", default=None, help="File dấu vân tay để chỉ ghi tin mới/thay đổi")
+    parser.add_argument("--events", default="change_events.jsonl", help="File sự kiện thay đổi")
+    parser.add_argument("--heartbeat-timeout", type=float, default=60,
+                        help="Số giây không có heartbeat để trả lại công việc của node")
+    parser.add_argument("--index", default=None, help="Thư mục chỉ mục truy vấn cập nhật theo file CSV")
+    args = parser.parse_args()
+
+    serve(args.db, args.host, args.port, args.output, args.parquet, args.fingerprints, args.events,
+          args.heartbeat_timeout, os.environ.get("FRONTIER_TOKEN"), args.index)
@@ -0,0 +1,193 @@
+import re
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import etree, html as lxml_html
+from pacing import OK, ERROR, BLOCKED
+
+# User-Agent giống với setup_driver để trang trả về cùng nội dung
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Cùng bộ chọn với crawl_property_info, viết dưới dạng XPath để không cần cssselect
+SPEC_ITEM_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' re__pr-specs-content-item ')]"
+SHORT_INFO_XPATH = ("//div[contains(concat(' ', normalize-space(@class), ' '), ' re__pr-short-info-item ')"
+                    " and contains(concat(' ', normalize-space(@class), ' '), ' js__pr-config-item ')]")
+
+# Dấu hiệu trang chặn (Cloudflare, DataDome...). Chỉ kiểm tra khi trang không có dữ liệu, và không
+# dùng chữ "captcha" đơn thuần vì trang bình thường cũng có thể nạp script reCAPTCHA trong <head>
+BLOCK_MARKERS = (
+    "cf-challenge",
+    "challenge-platform",
+    "<title>just a moment",
+    "attention required! | cloudflare",
+    "checking your browser",
+    "captcha-delivery.com",
+    "<title>access denied",
+)
+BLOCK_STATUS_CODES = (403, 429, 503)
+
+# Mở đầu thông báo lỗi khi trang bị chặn hoặc thiếu dữ liệu
+BLOCKED_ERROR = "Trang bị chặn"
+INCOMPLETE_ERROR = "Trang thiếu dữ liệu"
+
+def create_session(pool_size=4):
+    """Tạo HTTP session dùng chung kết nối cho nhiều lần tải trang"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8",
+    })
+    return session
+
+def add_spec_text(property_data, text):
+    """
+    Thêm một thuộc tính vào property_data theo quy tắc: dòng đầu tiên là tên
+    thuộc tính, phần còn lại là giá trị. Bỏ qua nếu chỉ có một dòng.
+    """
+    text = text.strip()
+    if "\n" in text:
+        parts = text.split("\n", 1)
+        property_data[parts[0].strip()] = parts[1].strip()
+
+# Thẻ hiển thị dạng khối mặc định: nội dung nằm trên dòng riêng như innerText của trình duyệt
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "fieldset", "figcaption", "figure",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p",
+    "pre", "section", "table", "tr", "ul",
+}
+# Thẻ không hiển thị nội dung
+HIDDEN_TAGS = {"script", "style", "noscript", "template", "head"}
+# Dấu xuống dòng tạm thời, tách biệt với khoảng trắng (kể cả "\n") có sẵn trong HTML
+LINE_BREAK = "\x00"
+
+def _is_rendered(element):
+    """Phần tử có được hiển thị hay không (bỏ qua thẻ ẩn, thuộc tính hidden và display:none)"""
+    if element.tag in HIDDEN_TAGS or element.get("hidden") is not None:
+        return False
+    return "display:none" not in (element.get("style") or "").replace(" ", "").lower()
+
+def _add_text(parts, text):
+    if text:
+        parts.append(re.sub(r"\s+", " ", text))
+
+def _collect_text(element, parts, block):
+    """Thêm nội dung chữ của element và các phần tử con vào parts, LINE_BREAK ở chỗ xuống dòng"""
+    if element.tag == "br":
+        parts.append(LINE_BREAK)
+        return
+    if block:
+        parts.append(LINE_BREAK)
+    _add_text(parts, element.text)
+    for child in element:
+        if isinstance(child.tag, str) and _is_rendered(child):
+            _collect_text(child, parts, child.tag in BLOCK_TAGS)
+        _add_text(parts, child.tail)
+    if block:
+        parts.append(LINE_BREAK)
+
+def element_text(element):
+    """
+    Lấy nội dung chữ của một phần tử giống với .text/innerText của Selenium.
+
+    Các phần tử con trực tiếp (tên và giá trị của khối thông tin, được CSS của trang hiển thị
+    dạng khối) nằm trên dòng riêng. Bên trong chúng, thẻ dạng khối (div, p, li...) và <br>
+    tạo dòng mới, thẻ nội dòng (span, b, a...) nối liền; thẻ ẩn bị bỏ qua và khoảng trắng
+    trong mỗi dòng được gộp lại.
+    """
+    parts = []
+    _add_text(parts, element.text)
+    for child in element:
+        if isinstance(child.tag, str) and _is_rendered(child):
+            _collect_text(child, parts, block=True)
+        _add_text(parts, child.tail)
+    lines = [re.sub(" +", " ", line).strip() for line in "".join(parts).split(LINE_BREAK)]
+    return "\n".join(line for line in lines if line)
+
+def parse_html(page_html):
+    """Phân tích HTML bằng lxml, None nếu trang rỗng (chỉ có khoảng trắng, chú thích...)"""
+    if not page_html or not page_html.strip():
+        return None
+    try:
+        return lxml_html.fromstring(page_html)
+    except etree.ParserError:
+        return None
+
+def extract_property_info(page_html):
+    """Trích xuất thông tin bất động sản từ HTML của trang chi tiết ({} nếu trang rỗng)"""
+    tree = parse_html(page_html)
+    if tree is None:
+        return {}
+    property_data = {}
+
+    for item in tree.xpath(SPEC_ITEM_XPATH):
+        add_spec_text(property_data, element_text(item))
+
+    for item in tree.xpath(SHORT_INFO_XPATH):
+        add_spec_text(property_data, element_text(item))
+
+    return property_data
+
+def response_html(response):
+    """Lấy HTML từ response, mặc định UTF-8 khi máy chủ không khai báo charset"""
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        response.encoding = "utf-8"
+    return response.text
+
+def looks_blocked(status_code, page_html):
+    """
+    Kiểm tra trang trả về có phải trang chặn/captcha hay không. Chỉ nên gọi khi trang
+    không trích xuất được dữ liệu.
+    """
+    if status_code in BLOCK_STATUS_CODES:
+        return True
+    head = page_html[:5000].lower()
+    return any(marker in head for marker in BLOCK_MARKERS)
+
+def request_outcome(error):
+    """
+    Kết quả của một lượt tải theo thông báo lỗi, dùng cho RateController.
+    Trang thiếu dữ liệu vẫn được tính là máy chủ trả lời bình thường.
+    """
+    if not error or error.startswith(INCOMPLETE_ERROR):
+        return OK
+    if error.startswith(BLOCKED_ERROR):
+        return BLOCKED
+    return ERROR
+
+def fetch_property_info(url, session, timeout=15, timings=None):
+    """
+    Tải trang chi tiết bằng HTTP và trích xuất thông tin, không cần trình duyệt.
+    Nếu truyền timings (dict), thời gian tải trang qua mạng được ghi vào timings['fetch']
+    và thời gian trích xuất vào timings['extract'].
+
+    Returns:
+        tuple: (property_data, error). error là None nếu thành công; nếu trang bị chặn
+        hoặc thiếu dữ liệu thì error khác None và nên chuyển sang Selenium.
+    """
+    fetch_start = time.perf_counter()
+    try:
+        response = session.get(url, timeout=timeout)
+    except requests.RequestException as e:
+        return {}, f"HTTP lỗi: {e}"
+
+    page_html = response_html(response)
+    if timings is not None:
+        timings['fetch'] = time.perf_counter() - fetch_start
+    if response.status_code == 200:
+        extract_start = time.perf_counter()
+        property_data = extract_property_info(page_html)
+        if timings is not None:
+            timings['extract'] = time.perf_counter() - extract_start
+        if property_data:
+            return property_data, None
+
+    # Không có dữ liệu: xem mã trạng thái và nội dung trang để biết có bị chặn không
+    if looks_blocked(response.status_code, page_html):
+        return {}, f"{BLOCKED_ERROR} (HTTP {response.status_code})"
+    if response.status_code != 200:
+        return {}, f"HTTP {response.status_code}"
+    return {}, INCOMPLETE_ERROR
@@ -0,0 +1,75 @@
+# Chế độ tải trang gọn: chặn ảnh, font, quảng cáo và tracker mà crawler không cần đọc
+
+# Các loại tài nguyên bị chặn theo đuôi file
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+]
+
+# Tên miền quảng cáo/phân tích bên thứ ba bị chặn, có thể truyền danh sách khác vào setup_driver
+BLOCKED_DOMAINS = [
+    "googletagmanager.com",
+    "google-analytics.com",
+    "analytics.google.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "criteo.com",
+    "criteo.net",
+    "tiktok.com",
+    "zalo.me",
+]
+
+# Đo dung lượng và thời gian tải trang bằng Navigation/Resource Timing API
+PAGE_WEIGHT_SCRIPT = """
+const nav = performance.getEntriesByType('navigation')[0];
+const entries = performance.getEntriesByType('resource');
+let bytes = nav ? (nav.transferSize || nav.encodedBodySize || 0) : 0;
+for (const entry of entries) {
+    bytes += entry.transferSize || entry.encodedBodySize || 0;
+}
+return {
+    bytes: bytes,
+    resources: entries.length,
+    load_ms: nav ? (nav.loadEventEnd || nav.domContentLoadedEventEnd) - nav.startTime : null
+};
+"""
+
+def apply_lean_options(options):
+    """Thêm các thiết lập Chrome để không tải ảnh và không hiện thông báo"""
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+        "profile.managed_default_content_settings.media_stream": 2,
+    })
+    return options
+
+def enable_request_blocking(driver, blocked_domains=None):
+    """
+    Chặn font, ảnh, media và các tên miền quảng cáo/tracker qua Chrome DevTools Protocol.
+
+    Parameters:
+        driver: Trình duyệt Chrome
+        blocked_domains (list): Tên miền bên thứ ba cần chặn, mặc định BLOCKED_DOMAINS
+    """
+    if blocked_domains is None:
+        blocked_domains = BLOCKED_DOMAINS
+    urls = BLOCKED_RESOURCE_PATTERNS + [f"*{domain}*" for domain in blocked_domains]
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+
+def page_weight(driver):
+    """
+    Dung lượng (byte, xấp xỉ) và thời gian tải (ms) của trang hiện tại.
+
+    Returns:
+        dict: {"bytes", "resources", "load_ms"}
+    """
+    return driver.execute_script(PAGE_WEIGHT_SCRIPT)
@@ -0,0 +1,77 @@
+import json
+import os
+import sqlite3
+import time
+
+
+class LinkStore:
+    """
+    Kho lưu liên kết sản phẩm trên SQLite với chỉ mục UNIQUE.
+
+    Kiểm tra trùng lặp do chỉ mục đảm nhiệm nên không cần đọc lại toàn bộ danh sách,
+    mỗi lần thêm chỉ ghi các liên kết mới trong một giao dịch, nên khi chương trình
+    dừng giữa chừng các liên kết đã ghi trước đó không bị mất.
+    """
+
+    def __init__(self, db_file='linkProduct.db'):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " id INTEGER PRIMARY KEY,"
+            " url TEXT NOT NULL UNIQUE,"
+            " added_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def add_links(self, links):
+        """
+        Thêm các liên kết vào kho, bỏ qua liên kết đã có.
+
+        Returns:
+            int: Số liên kết mới được thêm
+        """
+        now = time.time()
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO links (url, added_at) VALUES (?, ?)",
+                ((link, now) for link in links if link),
+            )
+        return self.conn.total_changes - before
+
+    def __contains__(self, link):
+        row = self.conn.execute("SELECT 1 FROM links WHERE url = ?", (link,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    def iter_links(self):
+        """Duyệt các liên kết theo thứ tự được thêm vào"""
+        for (url,) in self.conn.execute("SELECT url FROM links ORDER BY id"):
+            yield url
+
+    def import_json(self, json_file='linkProduct.json'):
+        """
+        Nhập các liên kết từ file linkProduct.json cũ.
+
+        Returns:
+            int: Số liên kết mới được thêm
+        """
+        if not os.path.exists(json_file) or os.path.getsize(json_file) == 0:
+            return 0
+        with open(json_file, 'r', encoding='utf-8') as f:
+            links = json.load(f)
+        return self.add_links(links)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
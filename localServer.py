@@ -0,0 +1,205 @@
+import argparse
+import collections
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Trang thật được thay địa chỉ bằng địa chỉ máy chủ giả lập khi phát lại
+LIVE_BASE_URL = "https://batdongsan.com.vn"
+
+# Trang trả về khi máy chủ giả lập chặn truy cập
+CAPTCHA_HTML = "<html><head><title>Just a moment...</title></head><body>captcha</body></html>"
+
+
+def listing_html(page, cards_per_page=20):
+    """Sinh HTML trang danh sách giống batdongsan.com.vn với cards_per_page sản phẩm"""
+    cards = "".join(
+        f'<div class="js__card js__card-full-web pr-container re__card-full">'
+        f'<a href="/ban-nha-rieng-pr{page * 1000 + i}">Tin {page * 1000 + i}</a></div>'
+        for i in range(cards_per_page)
+    )
+    return f'<html><body><div id="product-lists-web">{cards}</div></body></html>'
+
+
+def detail_html(listing_id):
+    """Sinh HTML trang chi tiết với các khối thông tin giống batdongsan.com.vn"""
+    rng = random.Random(listing_id)
+    specs = {
+        "Khoảng giá": f"{rng.randint(2, 30)},{rng.randint(0, 9)} tỷ",
+        "Diện tích": f"{rng.randint(30, 200)} m²",
+        "Số phòng ngủ": f"{rng.randint(1, 6)} phòng",
+        "Pháp lý": rng.choice(["Sổ đỏ/ Sổ hồng", "Hợp đồng mua bán"]),
+    }
+    short_info = {
+        "Ngày đăng": "01/10/2025",
+        "Ngày hết hạn": "08/10/2025",
+        "Loại tin": "Tin thường",
+        "Mã tin": str(listing_id),
+    }
+    spec_html = "".join(
+        f'<div class="re__pr-specs-content-item"><span class="re__pr-specs-content-item-title">{name}</span>'
+        f'<span class="re__pr-specs-content-item-value">{value}</span></div>'
+        for name, value in specs.items()
+    )
+    short_html = "".join(
+        f'<div class="re__pr-short-info-item js__pr-config-item"><span class="title">{name}</span>'
+        f'<span class="value">{value}</span></div>'
+        for name, value in short_info.items()
+    )
+    # Tên và giá trị hiển thị trên hai dòng như CSS của trang thật, để .text của Selenium cũng tách dòng
+    style = ("<style>.re__pr-specs-content-item > span, .re__pr-short-info-item > span"
+             " { display: block; }</style>")
+    return f"<html><head>{style}</head><body>{spec_html}{short_html}</body></html>"
+
+
+def recording_file(recordings_dir, path):
+    """Tên file lưu trang đã ghi cho đường dẫn path, ví dụ /nha-dat-ban-ha-noi/p2 -> nha-dat-ban-ha-noi__p2.html"""
+    name = urlparse(path).path.strip("/").replace("/", "__") or "index"
+    return os.path.join(recordings_dir, name + ".html")
+
+def record_pages(urls, recordings_dir="recordings", timeout=15):
+    """
+    Tải các trang thật và lưu vào recordings_dir để máy chủ giả lập phát lại khi đo hiệu năng.
+
+    Returns:
+        int: Số trang đã lưu
+    """
+    from httpExtract import create_session, response_html
+
+    os.makedirs(recordings_dir, exist_ok=True)
+    saved = 0
+    with create_session() as session:
+        for url in urls:
+            try:
+                response = session.get(url, timeout=timeout)
+                response.raise_for_status()
+            except Exception as e:
+                print(f"Lỗi khi ghi {url}: {e}")
+                continue
+            with open(recording_file(recordings_dir, url), "w", encoding="utf-8") as f:
+                f.write(response_html(response))
+            saved += 1
+            print(f"Đã ghi {url}")
+    return saved
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Xử lý yêu cầu cho máy chủ giả lập, thêm độ trễ, lỗi và chặn theo thiết lập của server"""
+
+    def do_GET(self):
+        settings = self.server.settings
+        time.sleep(settings["latency"] + random.uniform(0, settings["jitter"]))
+
+        status, body = self._route()
+        roll = random.random()
+        if self.server.overloaded():
+            status, body = 429, CAPTCHA_HTML
+        elif roll < settings["block_rate"]:
+            status, body = 403, CAPTCHA_HTML
+        elif roll < settings["block_rate"] + settings["error_rate"]:
+            status, body = 500, "<html><body>Lỗi máy chủ</body></html>"
+
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        """Chọn nội dung trang theo đường dẫn: trang đã ghi nếu có, ngược lại sinh trang giả lập"""
+        recordings_dir = self.server.settings["recordings_dir"]
+        if recordings_dir:
+            path = recording_file(recordings_dir, self.path)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return 200, f.read().replace(LIVE_BASE_URL, self.server.base_url)
+        match = re.search(r"/p(\d+)$", self.path)
+        if match:
+            return 200, listing_html(int(match.group(1)))
+        match = re.search(r"-pr(\d+)", self.path)
+        if match:
+            return 200, detail_html(int(match.group(1)))
+        return 404, "<html><body>Không tìm thấy</body></html>"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Máy chủ HTTP cục bộ đóng vai batdongsan.com.vn khi thử nghiệm.
+
+    Parameters:
+        latency (float): Độ trễ cố định mỗi yêu cầu (giây)
+        jitter (float): Độ trễ ngẫu nhiên thêm vào, trong [0, jitter]
+        error_rate (float): Tỉ lệ trả về HTTP 500
+        block_rate (float): Tỉ lệ trả về trang captcha (HTTP 403)
+        capacity (float): Số yêu cầu/giây tối đa, vượt quá sẽ trả về HTTP 429; None là không giới hạn
+        recordings_dir (str): Thư mục trang thật đã ghi bằng record_pages để phát lại
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.05, jitter=0.05, error_rate=0.0, block_rate=0.0, capacity=None,
+                 recordings_dir=None):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.settings = {
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "block_rate": block_rate,
+            "capacity": capacity,
+            "recordings_dir": recordings_dir,
+        }
+        self._recent = collections.deque()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def overloaded(self):
+        """Kiểm tra số yêu cầu trong giây vừa qua có vượt capacity không"""
+        capacity = self.settings["capacity"]
+        if capacity is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            return len(self._recent) > capacity
+
+
+def start_server(**settings):
+    """Khởi động StandInServer trong một luồng nền và trả về server"""
+    server = StandInServer(**settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Máy chủ giả lập batdongsan.com.vn để thử nghiệm")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--block-rate", type=float, default=0.0)
+    parser.add_argument("--capacity", type=float, default=None)
+    parser.add_argument("--recordings", default=None, help="Thư mục trang đã ghi để phát lại")
+    parser.add_argument("--record", nargs="+", metavar="URL", help="Ghi các trang thật vào --recordings rồi thoát")
+    args = parser.parse_args()
+
+    if args.record:
+        saved = record_pages(args.record, args.recordings or "recordings")
+        print(f"Đã ghi {saved}/{len(args.record)} trang")
+    else:
+        server = StandInServer(args.port, args.latency, args.jitter, args.error_rate, args.block_rate,
+                               args.capacity, args.recordings)
+        print(f"Máy chủ giả lập đang chạy tại {server.base_url}")
+        server.serve_forever()
@@ -1,20 +1,49 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import json
 import pandas as pd
 import os
-import random
 from tqdm import tqdm
 import multiprocessing
-from multiprocessing import Pool, Manager, Lock
+from multiprocessing.managers import SyncManager
+from urllib.parse import urlparse
 import functools
+from driverPool import DriverPool, driver_error_message, wait_for_selector
+from pacing import Pacer, RateController, format_limits
+from domExtract import extract_spec_data
+from metrics import Metrics, counter_value, export, format_summary
+from leanMode import apply_lean_options, enable_request_blocking
+from httpExtract import (create_session, fetch_property_info, looks_blocked,
+                         request_outcome, BLOCKED_ERROR)
+from csvSink import csv_writer_process
+from frontier import DETAIL, format_eta, workers_setting
+from frontierServer import is_remote, new_node_id, open_frontier, remote_sink_process
+from fingerprintStore import FingerprintStore, schedule_refresh
+from retryQueue import fail_exhausted, handle_failure, LAUNCH_ERROR
 
-def setup_driver():
-    """Khởi tạo trình duyệt Chrome"""
+# Trang chi tiết được coi là sẵn sàng khi đã có một trong các khối thông tin
+READY_SELECTOR = "div.re__pr-specs-content-item, div.re__pr-short-info-item.js__pr-config-item"
+
+# Đường dẫn chromedriver, chỉ tra cứu một lần cho mỗi tiến trình
+_chromedriver_path = None
+
+def get_chromedriver_path():
+    """Tải/tra cứu chromedriver một lần rồi dùng lại cho các lần khởi động sau"""
+    global _chromedriver_path
+    if _chromedriver_path is None:
+        _chromedriver_path = ChromeDriverManager().install()
+    return _chromedriver_path
+
+def setup_driver(lean=False, blocked_domains=None):
+    """
+    Khởi tạo trình duyệt Chrome.
+    
+    lean=True bật chế độ tải gọn: không tải ảnh, font, media và chặn các tên miền
+    quảng cáo/tracker (blocked_domains, mặc định leanMode.BLOCKED_DOMAINS).
+    """
     options = Options()
     options.add_argument("--headless")
     options.add_argument("--no-sandbox")
@@ -27,55 +56,71 @@ def setup_driver():
     # User-Agent giống trình duyệt thật
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     
-    service = Service(ChromeDriverManager().install())
+    if lean:
+        apply_lean_options(options)
+    
+    service = Service(get_chromedriver_path())
     driver = webdriver.Chrome(service=service, options=options)
     
     # Giả mạo thông tin webdriver
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     
+    if lean:
+        enable_request_blocking(driver, blocked_domains)
+    
     return driver
 
-def crawl_property_info(url):
-    """Cào thông tin bất động sản từ URL cụ thể"""
-    driver = setup_driver()
+def crawl_property_info(url, driver=None, wait_timeout=10, timings=None):
+    """
+    Cào thông tin bất động sản từ URL cụ thể.
+    
+    Nếu truyền driver (lấy từ DriverPool) thì dùng lại trình duyệt đó và không đóng nó,
+    ngược lại sẽ khởi động một trình duyệt riêng cho URL này.
+    Nếu truyền timings (dict), thời gian tải trang (driver.get) được ghi vào timings['load'],
+    thời gian chờ trang sẵn sàng vào timings['wait'] và thời gian trích xuất vào timings['extract'].
+    """
+    own_driver = driver is None
+    if own_driver:
+        driver = setup_driver()
     property_data = {}
     
     try:
+        load_start = time.perf_counter()
         driver.get(url)
-        wait_time = random.uniform(1, 1.5)
-        # Đợi trang tải xong
-        time.sleep(wait_time)
+        if timings is not None:
+            timings['load'] = time.perf_counter() - load_start
+        # Đợi đến khi các khối thông tin xuất hiện thay vì ngủ cố định
+        wait_seconds = wait_for_selector(driver, READY_SELECTOR, wait_timeout)
+        if timings is not None:
+            timings['wait'] = wait_seconds
         
-        # Tìm tất cả các thẻ div có class="re__pr-specs-content-item"
-        spec_items = driver.find_elements(By.CSS_SELECTOR, "div.re__pr-specs-content-item")
-        
-        for item in spec_items:
-            text = item.text.strip()
-            if "\n" in text:
-                # Tách dòng đầu tiên làm tên thuộc tính, phần còn lại là giá trị
-                parts = text.split("\n", 1)
-                property_name = parts[0].strip()
-                property_value = parts[1].strip()
-                property_data[property_name] = property_value
-        
-        # Tìm thẻ div có class="re__pr-short-info-item js__pr-config-item"
-        short_info_items = driver.find_elements(By.CSS_SELECTOR, "div.re__pr-short-info-item.js__pr-config-item")
-        
-        for item in short_info_items:
-            text = item.text.strip()
-            if "\n" in text:
-                parts = text.split("\n", 1)
-                property_name = parts[0].strip()
-                property_value = parts[1].strip()
-                property_data[property_name] = property_value
+        # Đọc các khối "re__pr-specs-content-item" và "re__pr-short-info-item js__pr-config-item"
+        # trong một lần gọi execute_script thay vì một lần gọi item.text cho mỗi khối
+        extract_start = time.perf_counter()
+        property_data = extract_spec_data(driver)
+        if timings is not None:
+            timings['extract'] = time.perf_counter() - extract_start
         
         return property_data, None
             
     except Exception as e:
-        error_message = str(e)
+        error_message = driver_error_message(e)
+        try:
+            # Trang không có dữ liệu vì bị chặn (captcha...) thay vì lỗi thông thường
+            if looks_blocked(200, driver.title + driver.page_source[:5000]):
+                error_message = f"{BLOCKED_ERROR}: {error_message}"
+        except Exception:
+            pass
         return {"URL": url, "Error": error_message}, error_message
     finally:
-        driver.quit()
+        if own_driver:
+            driver.quit()
+
+class CrawlManager(SyncManager):
+    """Manager dùng chung hàng đợi ghi file và RateController giữa các tiến trình"""
+
+CrawlManager.register('RateController', RateController)
+CrawlManager.register('Metrics', Metrics)
 
 def read_urls_from_csv(csv_file='linkProduct.csv'):
     """Đọc danh sách URL từ file CSV"""
@@ -122,140 +167,407 @@ def read_urls_from_csv(csv_file='linkProduct.csv'):
         print(f"Lỗi khi đọc file CSV: {e}")
         return []
 
-def append_to_csv_safe(df, output_file, file_lock, batch_info):
-    """Ghi DataFrame vào file CSV với khóa đồng bộ hóa giữa các tiến trình"""
-    # Sử dụng khóa để đảm bảo chỉ một tiến trình ghi file tại một thời điểm
-    with file_lock:
-        process_id, batch_id = batch_info
-        batch_count = f"{process_id}-{batch_id}"
-        
-        # Kiểm tra xem file đã tồn tại chưa
-        file_exists = os.path.exists(output_file) and os.path.getsize(output_file) > 0
-        
-        if file_exists:
-            try:
-                # Đọc header của file hiện có để kiểm tra cấu trúc
-                existing_df = pd.read_csv(output_file)
-                
-                # So sánh cấu trúc cột
-                existing_cols = set(existing_df.columns)
-                new_cols = set(df.columns)
-                
-                if existing_cols != new_cols:
-                    print(f"[Tiến trình {process_id}] Cấu trúc cột khác nhau. Đang kết hợp dữ liệu...")
-                    # Kết hợp DataFrame mới với dữ liệu hiện có
-                    combined_df = pd.concat([existing_df, df], ignore_index=True)
-                    
-                    # Ghi lại toàn bộ file
-                    combined_df.to_csv(output_file, index=False, encoding='utf-8-sig')
-                    print(f"[Tiến trình {process_id}] 💾 Đã lưu lô {batch_count}: {len(df)} bản ghi mới, tổng {len(combined_df)} bản ghi")
-                    return
-                
-                # Nếu cấu trúc cột giống nhau, chỉ cần append
-                df.to_csv(output_file, mode='a', header=False, index=False, encoding='utf-8-sig')
-                print(f"[Tiến trình {process_id}] 💾 Đã lưu lô {batch_count}: {len(df)} bản ghi")
-                
-            except Exception as e:
-                print(f"[Tiến trình {process_id}] ❌ Lỗi khi xử lý file: {e}")
-                # Nếu có lỗi, ghi đè file
-                df.to_csv(output_file, index=False, encoding='utf-8-sig')
-                print(f"[Tiến trình {process_id}] Đã ghi đè file với lô {batch_count}")
-        else:
-            # Nếu file chưa tồn tại, tạo mới
-            df.to_csv(output_file, index=False, encoding='utf-8-sig')
-            print(f"[Tiến trình {process_id}] 💾 Đã tạo file mới và lưu {len(df)} bản ghi vào {output_file}")
-
-def process_url_batch(batch_data):
-    """Hàm xử lý cho mỗi tiến trình"""
-    process_id, url_batch, output_file, file_lock = batch_data
+def process_url_batch(worker_data):
+    """
+    Hàm xử lý cho mỗi tiến trình: liên tục nhận từng lô nhỏ URL từ frontier cho đến khi hết.
     
-    print(f"[Tiến trình {process_id}] Bắt đầu xử lý {len(url_batch)} URLs")
-    batch_size = 10  # Ghi file sau mỗi 10 URL
-    total_urls = len(url_batch)
-    results = []
+    Tiến trình dừng sau lô hiện tại nếu số tiến trình mong muốn (frontier.py workers N)
+    giảm xuống dưới process_id. frontier_file có thể là địa chỉ máy chủ frontier (frontierServer.py);
+    các lô được nhận kèm node_id để máy chủ trả lại khi node ngừng gửi heartbeat.
     
-    # Xử lý URLs theo batch nhỏ
-    for i, url in enumerate(url_batch):
-        position = i + 1
-        print(f"[Tiến trình {process_id}] [{position}/{total_urls}] Đang xử lý: {url}")
-        
-        property_data, error = crawl_property_info(url)
+    Nếu có producer_done (multiprocessing.Event), liên kết vẫn đang được thêm vào frontier
+    (pipeline.py): khi hết việc, tiến trình chờ liên kết mới cho đến khi producer_done được đặt.
+    
+    Thời gian từng giai đoạn và số lỗi được ghi vào Metrics riêng của tiến trình và gửi sang
+    metrics chung sau mỗi lô. quiet=True tắt các dòng in cho từng URL.
+    """
+    (process_id, record_queue, rate_controller, frontier_file, pool_size, max_pages_per_driver, engine,
+     lease_batch, lease_seconds, page_interval, dead_letter_file, lean, metrics, quiet, node_id,
+     producer_done) = worker_data
+    log = (lambda *args, **kwargs: None) if quiet else print
+    local_metrics = Metrics()
+    
+    log(f"[Tiến trình {process_id}] Bắt đầu xử lý")
+    started = time.time()
+    busy_time = 0.0
+    total_urls = 0
+    # Giãn cách giữa các lần tải trang, tách riêng khỏi việc chờ trang sẵn sàng
+    pacer = Pacer(*page_interval)
+    wait_total = 0.0
+    wait_count = 0
+    
+    # Giữ trình duyệt sống giữa các URL thay vì khởi động lại cho mỗi URL
+    driver_pool = DriverPool(functools.partial(setup_driver, lean=lean), size=pool_size,
+                             max_pages=max_pages_per_driver, metrics=local_metrics)
+    session = create_session() if engine == 'http' else None
+    fallbacks = 0
+    frontier = open_frontier(frontier_file)
+    setting = workers_setting(node_id if is_remote(frontier_file) else None)
+    
+    while True:
+        if frontier.get_setting(setting, process_id) < process_id:
+            log(f"[Tiến trình {process_id}] Giảm số tiến trình, dừng tiến trình này")
+            break
         
-        if error:
-            print(f"[Tiến trình {process_id}] ❌ Lỗi: {error}")
-        else:
-            results.append(property_data)
-            print(f"[Tiến trình {process_id}] ✅ Xử lý thành công")
+        # Nhận lô URL tiếp theo; lô nào quá lease_seconds chưa xong sẽ được trả lại cho tiến trình khác,
+        # URL đã được nhận đủ số lần mà lần nào cũng không xong được đưa vào dead_letter_file
+        exhausted = fail_exhausted(frontier, DETAIL, dead_letter_file)
+        if exhausted:
+            local_metrics.inc("pages_total", exhausted, outcome="dead_letter")
+            log(f"[Tiến trình {process_id}] {exhausted} URL không xong sau nhiều lần xử lý, đã ghi vào {dead_letter_file}")
+        url_batch = frontier.lease(DETAIL, limit=lease_batch, lease_seconds=lease_seconds, node_id=node_id)
+        if not url_batch:
+            if producer_done is None or producer_done.is_set():
+                break
+            time.sleep(0.5)
+            continue
         
-        # Ghi kết quả sau mỗi batch_size hoặc khi đến URL cuối cùng
-        if len(results) >= batch_size or i == total_urls - 1:
-            if results:
-                batch_id = i // batch_size + 1
-                batch_info = (process_id, batch_id)
-                df = pd.DataFrame(results)
-                append_to_csv_safe(df, output_file, file_lock, batch_info)
-                results = []  # Reset danh sách kết quả sau khi ghi
+        batch_start = time.time()
+        for url in url_batch:
+            total_urls += 1
+            log(f"[Tiến trình {process_id}] [{total_urls}] Đang xử lý: {url}")
+            pacer.wait()
+            
+            host = urlparse(url).netloc
+            property_data, error = None, None
+            if session is not None:
+                # Thử tải bằng HTTP trước, chỉ dùng Selenium khi trang bị chặn hoặc thiếu dữ liệu
+                timings = {}
+                token = rate_controller.acquire(host)
+                request_start = time.time()
+                property_data, error = fetch_property_info(url, session, timings=timings)
+                elapsed = time.time() - request_start
+                # Độ trễ cho RateController chỉ tính phần tải qua mạng, không tính trích xuất
+                rate_controller.record(host, token, timings.get('fetch', elapsed), request_outcome(error))
+                local_metrics.observe("page_load_seconds", elapsed, engine="http")
+                if 'extract' in timings:
+                    local_metrics.observe("extract_seconds", timings['extract'], engine="http")
+                if error:
+                    fallbacks += 1
+                    local_metrics.inc("fallbacks_total")
+                    log(f"[Tiến trình {process_id}] ↪ {error}, chuyển sang Selenium")
+            
+            if session is None or error:
+                try:
+                    driver = driver_pool.acquire()
+                except Exception as e:
+                    error = f"{LAUNCH_ERROR}: {e}"
+                    error_class, retry_in = handle_failure(frontier, DETAIL, url, error, dead_letter_file)
+                    local_metrics.inc("errors_total", error_class=error_class)
+                    local_metrics.inc("pages_total", outcome="dead_letter" if retry_in is None else "retry")
+                    log(f"[Tiến trình {process_id}] ❌ {error}")
+                    continue
+                timings = {}
+                token = rate_controller.acquire(host)
+                request_start = time.time()
+                property_data, error = crawl_property_info(url, driver, timings=timings)
+                elapsed = time.time() - request_start
+                # Chỉ tính driver.get, không tính thời gian chờ phần tử và trích xuất của trình duyệt
+                rate_controller.record(host, token, timings.get('load', elapsed), request_outcome(error))
+                driver_pool.release(driver, error)
+                local_metrics.observe("page_load_seconds", elapsed, engine="selenium")
+                if 'wait' in timings:
+                    wait_total += timings['wait']
+                    wait_count += 1
+                    local_metrics.observe("wait_seconds", timings['wait'])
+                if 'extract' in timings:
+                    local_metrics.observe("extract_seconds", timings['extract'], engine="selenium")
+            
+            if error:
+                # Phân loại lỗi và đưa vào hàng đợi thử lại, hoặc dead letter khi đã thử đủ số lần
+                error_class, retry_in = handle_failure(frontier, DETAIL, url, error, dead_letter_file)
+                local_metrics.inc("errors_total", error_class=error_class)
+                local_metrics.inc("pages_total", outcome="dead_letter" if retry_in is None else "retry")
+                if retry_in is None:
+                    log(f"[Tiến trình {process_id}] ❌ Lỗi ({error_class}), đã thử đủ số lần: {error}")
+                else:
+                    log(f"[Tiến trình {process_id}] ❌ Lỗi ({error_class}), thử lại sau {retry_in} giây: {error}")
+            else:
+                # Gửi bản ghi cho tiến trình ghi file, URL được đánh dấu xong sau khi ghi
+                record_queue.put((url, property_data))
+                local_metrics.inc("pages_total", outcome="ok")
+                log(f"[Tiến trình {process_id}] ✅ Xử lý thành công")
+        busy_time += time.time() - batch_start
+        if metrics is not None:
+            metrics.merge(local_metrics.drain())
     
-    print(f"[Tiến trình {process_id}] Hoàn thành xử lý tất cả URLs")
+    frontier.close()
+    driver_pool.close()
+    stats = driver_pool.stats()
+    # Số lần khởi động và thời gian tiết kiệm được so với mỗi trang một trình duyệt, để in cả khi quiet
+    local_metrics.inc("driver_launches_total", stats['launches'])
+    local_metrics.inc("driver_pages_total", stats['pages'])
+    local_metrics.inc("driver_launch_saved_seconds_total", stats['saved_seconds'])
+    if metrics is not None:
+        metrics.merge(local_metrics.drain())
+    if session is not None:
+        session.close()
+        log(f"[Tiến trình {process_id}] 🌐 HTTP: {total_urls - fallbacks}/{total_urls} trang, "
+              f"{fallbacks} trang chuyển sang Selenium")
+    log(f"[Tiến trình {process_id}] 🚀 Khởi động {stats['launches']} trình duyệt cho {stats['pages']} trang "
+          f"(tái khởi động {stats['recycled']}, lỗi {stats['crashed']}), "
+          f"tiết kiệm ~{stats['saved_seconds']} giây khởi động")
+    if wait_count:
+        log(f"[Tiến trình {process_id}] ⏱ Chờ trang sẵn sàng trung bình {wait_total / wait_count:.2f} giây, "
+              f"giãn cách {pacer.slept:.0f} giây")
+    lifetime = time.time() - started
+    utilisation = busy_time / lifetime * 100 if lifetime > 0 else 0.0
+    log(f"[Tiến trình {process_id}] Hoàn thành {total_urls} URL trong {lifetime:.0f} giây, "
+          f"bận {utilisation:.0f}% thời gian")
     return process_id
 
-def process_with_multiprocessing(urls, num_processes=4, output_file='property_data.csv'):
-    """Xử lý các URL với đa tiến trình"""
-    # Khởi tạo Manager để chia sẻ khóa giữa các tiến trình
-    with Manager() as manager:
-        file_lock = manager.Lock()
-        
-        # Chia URLs thành các nhóm cho từng tiến trình
-        chunk_size = len(urls) // num_processes
-        url_batches = []
-        
-        for i in range(num_processes):
-            start_idx = i * chunk_size
-            # Đối với tiến trình cuối cùng, lấy tất cả các URL còn lại
-            end_idx = (i + 1) * chunk_size if i < num_processes - 1 else len(urls)
-            url_batches.append((i + 1, urls[start_idx:end_idx], output_file, file_lock))
+def process_with_multiprocessing(frontier_file='frontier.db', num_processes=4, output_file='property_data.csv',
+                                 pool_size=1, max_pages_per_driver=50, engine='selenium',
+                                 lease_batch=5, lease_seconds=300, poll_interval=5, page_interval=(1.0, 1.5),
+                                 rate_settings=None, dead_letter_file='dead_letter.jsonl', lean=False,
+                                 parquet_dir=None, fingerprint_file=None, events_file='change_events.jsonl',
+                                 quiet=False, metrics_file=None, metrics_interval=15, heartbeat_timeout=60,
+                                 producer_done=None, index_dir=None):
+    """
+    Xử lý các URL đang chờ trong frontier với đa tiến trình.
+    
+    Các tiến trình cùng lấy việc từ frontier theo lô nhỏ lease_batch URL nên tiến trình nào
+    xong trước sẽ nhận việc tiếp theo; lô bị treo quá lease_seconds được trả lại cho tiến trình khác.
+    Số tiến trình có thể thay đổi khi đang chạy bằng lệnh: python frontier.py workers N
+    
+    Để chạy trên nhiều máy, frontier_file là địa chỉ máy chủ frontier (python frontierServer.py),
+    ví dụ http://10.0.0.5:8770. Mỗi máy đăng ký một node, gửi heartbeat mỗi poll_interval giây và
+    gửi bản ghi về máy chủ, nơi tiến trình ghi duy nhất ghi output_file (tham số output_file,
+    parquet_dir, fingerprint_file của node không được dùng). Công việc của node ngừng gửi heartbeat
+    quá heartbeat_timeout giây được trả lại cho các node khác. Số tiến trình của từng node đổi bằng
+    python frontier.py workers N --node <mã node>.
+    
+    URL bị lỗi được phân loại (hết thời gian, bị chặn, thiếu phần tử, trình duyệt lỗi) và thử lại
+    sau một khoảng chờ theo nhóm lỗi; URL lỗi quá số lần cho phép được ghi vào dead_letter_file.
+    URL thành công chỉ được đánh dấu done sau khi bản ghi đã được ghi vào output_file, nên lần
+    chạy sau tiếp tục đúng chỗ đã dừng. Nếu có parquet_dir, bản ghi cũng được ghi vào thư mục
+    Parquet chia theo ngày cào và loại tin. Nếu có fingerprint_file, tin tải lại không đổi không
+    được ghi lại, thay đổi (đổi giá, đăng lại...) được ghi thành sự kiện vào events_file. Nếu có
+    index_dir, chỉ mục truy vấn của output_file (queryIndex.py) được cập nhật trong khi chạy.
+    
+    pool_size là số trình duyệt giữ sẵn trong mỗi tiến trình, max_pages_per_driver là số trang
+    một trình duyệt xử lý trước khi được khởi động lại. engine='http' tải trang bằng HTTP + lxml
+    và chỉ dùng Selenium khi trang bị chặn hoặc thiếu dữ liệu. lean=True mở Chrome ở chế độ tải gọn
+    (không tải ảnh, font, quảng cáo, tracker).
+    
+    page_interval là khoảng cách (giây, ngẫu nhiên trong khoảng) giữa hai lần bắt đầu tải trang
+    của mỗi tiến trình; trang tải lâu hơn khoảng này thì không phải chờ thêm.
+    
+    Các tiến trình dùng chung một RateController (tham số trong rate_settings) để tự điều chỉnh
+    tốc độ và số trang tải đồng thời theo độ trễ, lỗi và việc bị chặn của host.
+    
+    Thời gian khởi động trình duyệt, tải trang, chờ trang, trích xuất, ghi file và số lỗi của
+    mọi tiến trình được gộp vào một Metrics chung, ghi ra metrics_file (.prom cho Prometheus
+    textfile collector, ngược lại JSON) mỗi metrics_interval giây. quiet=True tắt các dòng in
+    cho từng URL và chỉ hiện một thanh tiến trình.
+    
+    Nếu có producer_done (multiprocessing.Event), một tiến trình khác vẫn đang thêm liên kết vào
+    frontier (pipeline.py): các tiến trình chờ việc mới thay vì kết thúc, và hàm chỉ kết thúc sau khi
+    producer_done được đặt và mọi URL đã xử lý xong.
+    
+    Returns:
+        dict: Giới hạn cuối cùng của RateController cho từng host (kèm độ trễ p50/p95)
+    """
+    remote = is_remote(frontier_file)
+    node_id = new_node_id()
+    frontier = open_frontier(frontier_file)
+    if remote:
+        # Chỉ nhận lại công việc của các node đã chết, các node khác có thể đang chạy
+        resumed = frontier.reclaim_dead_nodes(heartbeat_timeout)
+    else:
+        # Nhận lại các URL đang xử lý dở của lần chạy trước
+        resumed = frontier.reset_leases(DETAIL)
+    if resumed:
+        print(f"↩ Nhận lại {resumed} URL đang xử lý dở từ lần chạy trước")
+    node_info = {"host": node_id.rsplit("-", 1)[0], "processes": num_processes, "engine": engine}
+    frontier.register_node(node_id, node_info)
+    setting = workers_setting(node_id if remote else None)
+    frontier.set_setting(setting, num_processes)
+    if remote:
+        print(f"🛰 Node {node_id} kết nối tới frontier {frontier_file}")
+    
+    # Hàng đợi chuyển bản ghi từ các tiến trình cào sang tiến trình ghi file duy nhất
+    with CrawlManager() as manager:
+        record_queue = manager.Queue(maxsize=1000)
+        settings = {"initial_concurrency": num_processes, "max_concurrency": num_processes}
+        settings.update(rate_settings or {})
+        rate_controller = manager.RateController(**settings)
+        metrics = manager.Metrics()
+        last_report = time.time()
+        last_export = time.time()
+        if remote:
+            # Bản ghi được gửi về máy chủ frontier, nơi có tiến trình ghi chung của mọi node
+            writer = multiprocessing.Process(target=remote_sink_process,
+                                             kwargs={"record_queue": record_queue, "address": frontier_file,
+                                                     "metrics": metrics, "quiet": quiet})
+        else:
+            writer = multiprocessing.Process(target=csv_writer_process,
+                                             kwargs={"record_queue": record_queue, "output_file": output_file,
+                                                     "frontier_file": frontier_file, "parquet_dir": parquet_dir,
+                                                     "fingerprint_file": fingerprint_file,
+                                                     "events_file": events_file, "metrics": metrics,
+                                                     "quiet": quiet, "index_dir": index_dir})
+        writer.start()
         
-        print(f"Khởi tạo {num_processes} tiến trình, mỗi tiến trình xử lý {chunk_size} URLs")
+        # Một thanh tiến trình duy nhất thay cho các dòng in của từng URL. Số trang đã xử lý lấy từ
+        # metrics (cập nhật sau mỗi lô) vì frontier chỉ đánh dấu done sau khi tiến trình ghi đã ghi xong
+        counts = frontier.counts(DETAIL)
+        finished_before = counts['done'] + counts['failed']
+        progress = tqdm(total=sum(counts.values()), initial=finished_before, unit="trang", disable=not quiet)
         
-        # Khởi tạo và chạy các tiến trình
-        with Pool(processes=num_processes) as pool:
-            # Bắt đầu xử lý và chờ kết quả
-            for process_id in pool.imap_unordered(process_url_batch, url_batches):
-                print(f"Tiến trình {process_id} đã hoàn thành")
+        workers = {}
+        try:
+            while True:
+                # Tiến trình ghi bị lỗi (đầy đĩa, lỗi Parquet/chỉ mục...): các tiến trình cào sẽ bị treo
+                # khi hàng đợi đầy, nên dừng cả lượt chạy. URL chưa ghi vẫn chưa done và được làm lại sau
+                if not writer.is_alive():
+                    raise RuntimeError(f"Tiến trình ghi đã dừng bất thường (mã thoát {writer.exitcode})")
+                
+                # Dọn các tiến trình đã kết thúc
+                for process_id, process in list(workers.items()):
+                    if not process.is_alive():
+                        process.join()
+                        del workers[process_id]
+                        if not quiet:
+                            print(f"Tiến trình {process_id} đã hoàn thành")
+                
+                if not frontier.heartbeat(node_id):
+                    # Node bị coi là đã chết (ví dụ mất mạng quá lâu), công việc của nó đã được trả lại
+                    print(f"⚠ Node {node_id} đã bị coi là dừng, đăng ký lại")
+                    frontier.register_node(node_id, node_info)
+                
+                counts = frontier.counts(DETAIL)
+                # Tổng số URL tăng dần khi liên kết vẫn đang được thêm vào (nhiều máy, pipeline.py)
+                progress.total = sum(counts.values())
+                if quiet and remote:
+                    # Khi chạy nhiều máy, tiến trình chung lấy từ frontier vì metrics chỉ có trang của node này
+                    progress.update(counts['done'] + counts['failed'] - progress.n)
+                elif quiet:
+                    snapshot = metrics.snapshot()
+                    finished = (counter_value(snapshot, "pages_total", outcome="ok")
+                                + counter_value(snapshot, "pages_total", outcome="dead_letter"))
+                    progress.update(min(progress.total, finished_before + finished) - progress.n)
+                progress.set_postfix({"lỗi": counts['failed'], "đang chờ": counts['pending'],
+                                      "tiến trình": len(workers)}, refresh=False)
+                producing = producer_done is not None and not producer_done.is_set()
+                if counts['pending'] + counts['leased'] == 0 and not workers and not producing:
+                    break
+                
+                # Khởi động thêm tiến trình khi còn việc và chưa đủ số tiến trình mong muốn
+                desired = frontier.get_setting(setting, num_processes)
+                if frontier.available(DETAIL):
+                    for process_id in range(1, desired + 1):
+                        if process_id not in workers:
+                            worker_data = (process_id, record_queue, rate_controller, frontier_file, pool_size,
+                                           max_pages_per_driver, engine, lease_batch, lease_seconds,
+                                           page_interval, dead_letter_file, lean, metrics, quiet, node_id,
+                                           producer_done)
+                            process = multiprocessing.Process(target=process_url_batch, args=(worker_data,))
+                            process.start()
+                            workers[process_id] = process
+                            if not quiet:
+                                print(f"Khởi động tiến trình {process_id} ({len(workers)}/{desired})")
+                
+                # Báo cáo giới hạn hiện tại của RateController mỗi phút
+                if not quiet and time.time() - last_report >= 60:
+                    print(format_limits(rate_controller.limits()))
+                    last_report = time.time()
+                
+                if metrics_file and time.time() - last_export >= metrics_interval:
+                    export(metrics.snapshot(), metrics_file)
+                    last_export = time.time()
+                
+                time.sleep(poll_interval)
+        finally:
+            for process in workers.values():
+                while process.is_alive():
+                    if not writer.is_alive():
+                        # Không còn ai nhận bản ghi, tiến trình cào có thể đang chờ hàng đợi đầy
+                        process.terminate()
+                    process.join(1)
+            # Báo cho tiến trình ghi kết thúc sau khi ghi hết dữ liệu còn lại
+            if writer.is_alive():
+                record_queue.put(None)
+            writer.join()
+            progress.close()
+            frontier.unregister_node(node_id)
+            frontier.close()
+            limits = rate_controller.limits()
+            print(format_limits(limits))
+            snapshot = metrics.snapshot()
+            if metrics_file:
+                export(snapshot, metrics_file)
+            print(format_summary(snapshot))
+            driver_pages = counter_value(snapshot, "driver_pages_total")
+            if driver_pages:
+                print(f"🚀 Trình duyệt: {counter_value(snapshot, 'driver_launches_total'):.0f} lần khởi động cho "
+                      f"{driver_pages:.0f} trang, tiết kiệm ~"
+                      f"{counter_value(snapshot, 'driver_launch_saved_seconds_total'):.0f} giây khởi động")
+    return limits
 
 if __name__ == "__main__":
     # File đầu vào và đầu ra    
     input_csv = 'linkProduct.csv'
     output_csv = 'property_data.csv'
+    output_parquet = 'property_data_parquet'  # Thư mục Parquet chia theo ngày cào và loại tin, None để tắt
+    # Trạng thái từng URL, dùng để tiếp tục khi bị dừng. Khi chạy nhiều máy, đặt là địa chỉ máy chủ
+    # frontier (python frontierServer.py --host 0.0.0.0), ví dụ 'http://10.0.0.5:8770'
+    frontier_file = 'frontier.db'
     num_processes = 8  # Số tiến trình xử lý đồng thời
+    driver_pool_size = 1  # Số trình duyệt giữ sẵn trong mỗi tiến trình
+    max_pages_per_driver = 50  # Khởi động lại trình duyệt sau số trang này
+    engine = 'http'  # 'http' (HTTP + lxml, Selenium dự phòng) hoặc 'selenium'
+    page_interval = (1.0, 1.5)  # Khoảng cách giữa hai lần bắt đầu tải trang của mỗi tiến trình (giây)
+    lean_mode = True  # Không tải ảnh, font, quảng cáo, tracker khi dùng Selenium
+    incremental = True  # Chỉ tải tin mới, tin đã hết hạn hoặc đến hạn làm mới; ghi thay đổi thành sự kiện
+    refresh_days = 7  # Tải lại tin đã tải quá số ngày này (None để tắt)
+    fingerprint_file = 'fingerprints.db'  # Dấu vân tay của từng tin đã tải
+    events_file = 'change_events.jsonl'  # Sự kiện thay đổi: đổi giá, đăng lại, gia hạn...
+    quiet = True  # Chỉ hiện một thanh tiến trình thay vì in từng URL
+    metrics_file = 'metrics.prom'  # Metrics cho Prometheus textfile collector (.json để ghi JSON)
+    index_dir = 'property_index'  # Chỉ mục truy vấn của file CSV (python queryIndex.py query ...), None để tắt
     
     # Hiển thị tiêu đề
     print("\n" + "="*70)
     print("🏠 BẮT ĐẦU CÀO DỮ LIỆU BẤT ĐỘNG SẢN ĐA TIẾN TRÌNH")
     print("="*70 + "\n")
     
-    # Đọc các URL từ file CSV
+    # Đọc các URL từ file CSV và thêm vào frontier (URL đã có sẽ được bỏ qua)
     print("📂 Đang đọc danh sách URL...")
     urls = read_urls_from_csv(input_csv)
+    with open_frontier(frontier_file) as frontier:
+        added = frontier.add(DETAIL, urls)
+        # Khi chạy nhiều máy, dấu vân tay nằm trên máy chủ frontier (frontierServer.py --fingerprints)
+        if incremental and not is_remote(frontier_file):
+            with FingerprintStore(fingerprint_file) as fingerprints:
+                refreshed = schedule_refresh(frontier, fingerprints, refresh_days)
+            print(f"🔄 {refreshed} tin đến hạn làm mới hoặc đã hết hạn được đưa lại vào frontier")
+        summary = frontier.summary(DETAIL)
     
-    if urls:
-        print(f"🔍 Đã tìm thấy {len(urls)} URL để xử lý với {num_processes} tiến trình\n")
+    pending = summary['pending'] + summary['leased']
+    if pending:
+        print(f"🔍 Frontier có {summary['total']} URL ({added} mới): {summary['done']} xong, "
+              f"{summary['failed']} lỗi, {pending} URL cần xử lý với {num_processes} tiến trình\n")
         
         # Ghi lại thời gian bắt đầu
         start_time = time.time()
         
         # Xử lý URL với đa tiến trình
-        process_with_multiprocessing(urls[3574:], num_processes, output_csv)
+        process_with_multiprocessing(frontier_file, num_processes, output_csv,
+                                     driver_pool_size, max_pages_per_driver, engine,
+                                     page_interval=page_interval, lean=lean_mode,
+                                     parquet_dir=output_parquet,
+                                     fingerprint_file=fingerprint_file if incremental else None,
+                                     events_file=events_file, quiet=quiet, metrics_file=metrics_file,
+                                     index_dir=index_dir)
         
         # Tính thời gian thực hiện
         elapsed_time = time.time() - start_time
-        hours, remainder = divmod(elapsed_time, 3600)
-        minutes, seconds = divmod(remainder, 60)
         
         # Hiển thị thông báo hoàn thành
         print("\n" + "="*70)
-        print(f"✅ HOÀN THÀNH! Thời gian: {int(hours):02d}:{int(minutes):02d}:{int(seconds):02d}")
+        print(f"✅ HOÀN THÀNH! Thời gian: {format_eta(elapsed_time)}")
         print(f"📊 Dữ liệu đã được lưu vào: {output_csv}")
         print("="*70)
     else:
-        print("❌ Không có URL để xử lý.")
\ No newline at end of file
+        print("❌ Không có URL để xử lý.")
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Ngưỡng (giây) của các histogram thời gian
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Tiền tố tên metric khi xuất theo định dạng Prometheus
+PROMETHEUS_PREFIX = "housecrawl_"
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """
+    Bộ đếm (counter) và histogram thời gian cho từng giai đoạn: khởi động trình duyệt,
+    tải trang, chờ trang, trích xuất, ghi file, lỗi...
+
+    Dùng chung được giữa nhiều luồng. Mỗi tiến trình nên ghi vào một Metrics riêng rồi định kỳ
+    gửi phần mới bằng merge(drain()) vào Metrics chung (chia sẻ qua multiprocessing manager),
+    để không phải gọi sang tiến trình khác cho từng trang.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        """Tăng bộ đếm name (kèm nhãn labels) thêm value"""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Ghi một giá trị thời gian (giây) vào histogram name"""
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"counts": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0}
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    index = i
+                    break
+            histogram["counts"][index] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Đo thời gian chạy của khối with và ghi vào histogram name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """
+        Trạng thái hiện tại dưới dạng dict có thể ghi ra JSON.
+
+        Returns:
+            dict: {"uptime_seconds", "buckets", "counters": [...], "histograms": [...]}
+        """
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "buckets": list(self.buckets),
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self._counters.items())],
+                "histograms": [{"name": name, "labels": dict(labels), "counts": list(h["counts"]),
+                                "count": h["count"], "sum": round(h["sum"], 6)}
+                               for (name, labels), h in sorted(self._histograms.items())],
+            }
+
+    def drain(self):
+        """Lấy snapshot rồi xóa các giá trị đã ghi, dùng để gửi phần mới sang Metrics chung"""
+        with self._lock:
+            snapshot_counters, self._counters = self._counters, {}
+            snapshot_histograms, self._histograms = self._histograms, {}
+        return {
+            "buckets": list(self.buckets),
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in snapshot_counters.items()],
+            "histograms": [{"name": name, "labels": dict(labels), **h}
+                           for (name, labels), h in snapshot_histograms.items()],
+        }
+
+    def merge(self, snapshot):
+        """Cộng dồn một snapshot (thường từ drain() của tiến trình khác) vào Metrics này"""
+        if list(snapshot["buckets"]) != list(self.buckets):
+            raise ValueError("Không thể gộp histogram có ngưỡng khác nhau")
+        with self._lock:
+            for counter in snapshot["counters"]:
+                key = _key(counter["name"], counter["labels"])
+                self._counters[key] = self._counters.get(key, 0) + counter["value"]
+            for h in snapshot["histograms"]:
+                key = _key(h["name"], h["labels"])
+                current = self._histograms.get(key)
+                if current is None:
+                    current = self._histograms[key] = {"counts": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0}
+                current["counts"] = [a + b for a, b in zip(current["counts"], h["counts"])]
+                current["count"] += h["count"]
+                current["sum"] += h["sum"]
+
+def counter_value(snapshot, name, **labels):
+    """Tổng giá trị của bộ đếm name trên các nhãn khớp với labels"""
+    return sum(c["value"] for c in snapshot["counters"]
+               if c["name"] == name and all(c["labels"].get(k) == str(v) for k, v in labels.items()))
+
+def _label_text(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+def to_prometheus(snapshot, prefix=PROMETHEUS_PREFIX):
+    """Chuyển snapshot sang định dạng văn bản của Prometheus (dùng với textfile collector)"""
+    lines = []
+    typed = set()
+    for counter in snapshot["counters"]:
+        name = prefix + counter["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_label_text(counter['labels'])} {counter['value']}")
+    for h in snapshot["histograms"]:
+        name = prefix + h["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(list(snapshot["buckets"]) + ["+Inf"], h["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_label_text(h['labels'], {'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{_label_text(h['labels'])} {h['sum']}")
+        lines.append(f"{name}_count{_label_text(h['labels'])} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+def export(snapshot, path):
+    """
+    Ghi snapshot ra file: định dạng Prometheus nếu path có đuôi .prom, ngược lại JSON.
+    File được ghi vào file tạm rồi đổi tên để bên đọc không thấy file ghi dở.
+    """
+    if path.endswith(".prom"):
+        content = to_prometheus(snapshot)
+    else:
+        content = json.dumps(snapshot, ensure_ascii=False, indent=4)
+    temp_file = path + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(temp_file, path)
+
+def format_summary(snapshot):
+    """Tóm tắt snapshot thành các dòng: giá trị bộ đếm, số lần và thời gian trung bình của histogram"""
+    lines = []
+    for counter in snapshot["counters"]:
+        lines.append(f"{counter['name']}{_label_text(counter['labels'])}: {counter['value']}")
+    for h in snapshot["histograms"]:
+        mean = h["sum"] / h["count"] if h["count"] else 0.0
+        lines.append(f"{h['name']}{_label_text(h['labels'])}: {h['count']} lần, trung bình {mean:.3f} giây")
+    return "\n".join(lines)
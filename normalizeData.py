@@ -0,0 +1,134 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Hệ số quy đổi đơn vị giá sang đồng
+PRICE_UNITS = {
+    "tỷ": 1_000_000_000,
+    "triệu": 1_000_000,
+    "nghìn": 1_000,
+}
+
+# Số theo cách viết Việt Nam: dấu chấm ngăn cách hàng nghìn, dấu phẩy ngăn cách phần thập phân
+NUMBER_PATTERN = r"\d+(?:[.,]\d+)*"
+PRICE_PATTERN = rf"^(?P<value>{NUMBER_PATTERN})\s*(?P<unit>tỷ|triệu|nghìn)(?P<per_m2>\s*/\s*m²)?$"
+NEGOTIABLE_PATTERN = r"^(?:thỏa|thoả)\s+thuận"
+DATE_FORMAT = "%d/%m/%Y"
+
+# Cột số dạng "<số> <đơn vị>": cột gốc -> (cột mới, đơn vị, kiểu dữ liệu)
+MEASURE_COLUMNS = {
+    "Diện tích": ("area_m2", "m²", "float64"),
+    "Số phòng ngủ": ("bedrooms", "phòng", "Int64"),
+    "Số phòng tắm, vệ sinh": ("bathrooms", "phòng", "Int64"),
+    "Số tầng": ("floors", "tầng", "Int64"),
+    "Mặt tiền": ("frontage_m", "m", "float64"),
+    "Đường vào": ("access_road_m", "m", "float64"),
+}
+
+# Cột ngày: cột gốc -> cột mới
+DATE_COLUMNS = {
+    "Ngày đăng": "posted_date",
+    "Ngày hết hạn": "expiry_date",
+}
+
+PRICE_COLUMN = "Khoảng giá"
+LISTING_ID_COLUMN = "Mã tin"
+
+def parse_number(values):
+    """Chuyển chuỗi số kiểu Việt Nam ("6,5", "1.510") thành float, giá trị không hợp lệ thành NaN"""
+    values = values.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    return pd.to_numeric(values, errors="coerce")
+
+def parse_measure(values, unit):
+    """Lấy phần số của các giá trị dạng "<số> <unit>", giá trị không đúng đơn vị thành NaN"""
+    pattern = rf"^({NUMBER_PATTERN})\s*{unit}$"
+    return parse_number(values.str.strip().str.extract(pattern, expand=False))
+
+def parse_price(values, area=None):
+    """
+    Tách cột giá ("6,5 tỷ", "120 triệu/m²", "Thỏa thuận") thành các cột số.
+
+    Parameters:
+        values (Series): Cột giá dạng chuỗi
+        area (Series): Diện tích (m²), dùng để quy đổi giữa tổng giá và giá mỗi m²
+
+    Returns:
+        DataFrame: price_vnd, price_per_m2_vnd (đồng), price_is_per_m2, price_negotiable
+    """
+    text = values.astype("string").str.strip()
+    parts = text.str.extract(PRICE_PATTERN)
+    unit = parts["unit"].map(PRICE_UNITS).astype("float64")
+    amount = parse_number(parts["value"]).astype("float64") * unit
+    per_m2 = parts["per_m2"].notna().to_numpy()
+    if area is None:
+        area = pd.Series(np.nan, index=values.index)
+    area = area.astype("float64").where(area > 0)
+
+    return pd.DataFrame({
+        "price_vnd": np.where(per_m2, amount * area, amount),
+        "price_per_m2_vnd": np.where(per_m2, amount, amount / area),
+        "price_is_per_m2": per_m2 & amount.notna().to_numpy(),
+        "price_negotiable": text.str.contains(NEGOTIABLE_PATTERN, case=False, regex=True).fillna(False).astype(bool),
+    }, index=values.index)
+
+def normalize_frame(df):
+    """
+    Chuyển các cột dạng chuỗi hiển thị của property_data.csv thành các cột có kiểu dữ liệu.
+
+    Các cột gốc đã chuyển được thay bằng cột mới (giá, diện tích, số phòng, số tầng,
+    mặt tiền, đường vào, ngày đăng/hết hạn, mã tin); các cột còn lại giữ nguyên.
+    Giá trị không đúng định dạng (kể cả dữ liệu bị lệch cột) trở thành giá trị rỗng.
+    """
+    df = df.copy()
+    columns = {}
+
+    for source, (target, unit, dtype) in MEASURE_COLUMNS.items():
+        if source in df:
+            parsed = parse_measure(df[source].astype("string"), unit)
+            if dtype == "Int64":
+                # Số phòng/số tầng phải là số nguyên
+                parsed = parsed.where(parsed % 1 == 0).round()
+            columns[target] = parsed.astype(dtype)
+
+    if PRICE_COLUMN in df:
+        price = parse_price(df[PRICE_COLUMN], columns.get("area_m2"))
+        for name in price:
+            columns[name] = price[name]
+
+    for source, target in DATE_COLUMNS.items():
+        if source in df:
+            columns[target] = pd.to_datetime(df[source], format=DATE_FORMAT, errors="coerce")
+
+    if LISTING_ID_COLUMN in df:
+        listing_id = df[LISTING_ID_COLUMN].astype("string").str.strip()
+        columns["listing_id"] = pd.to_numeric(listing_id.where(listing_id.str.fullmatch(r"\d+")),
+                                              errors="coerce").astype("Int64")
+
+    parsed_sources = [c for c in [PRICE_COLUMN, LISTING_ID_COLUMN, *MEASURE_COLUMNS, *DATE_COLUMNS] if c in df]
+    rest = df.drop(columns=parsed_sources)
+    return pd.concat([pd.DataFrame(columns, index=df.index), rest], axis=1)
+
+def normalize_csv(input_file='property_data.csv', output_file='property_normalized.csv'):
+    """
+    Đọc file dữ liệu đã cào, chuẩn hóa thành các cột có kiểu dữ liệu và lưu ra file CSV.
+
+    Returns:
+        DataFrame: Dữ liệu đã chuẩn hóa, None nếu có lỗi
+    """
+    if not os.path.exists(input_file):
+        print(f"Lỗi: File {input_file} không tồn tại.")
+        return None
+
+    try:
+        df = pd.read_csv(input_file, dtype=str, encoding='utf-8-sig')
+        normalized = normalize_frame(df)
+        normalized.to_csv(output_file, index=False, encoding='utf-8-sig', date_format='%Y-%m-%d')
+        print(f"Đã chuẩn hóa {len(normalized)} dòng dữ liệu và lưu vào {output_file}")
+        return normalized
+
+    except Exception as e:
+        print(f"Lỗi khi chuẩn hóa dữ liệu: {e}")
+        return None
+
+if __name__ == "__main__":
+    normalize_csv()
@@ -0,0 +1,201 @@
+import collections
+import random
+import threading
+import time
+
+
+class Pacer:
+    """
+    Chính sách giãn cách giữa các lần tải trang, tách riêng khỏi việc chờ trang tải xong.
+
+    Khoảng cách được tính giữa hai lần bắt đầu tải trang: nếu trang trước đã tải lâu hơn
+    khoảng cách này thì không phải ngủ thêm. Dùng được chung giữa nhiều luồng.
+
+    Parameters:
+        min_interval (float): Khoảng cách tối thiểu (giây) giữa hai lần tải trang
+        max_interval (float): Nếu có, khoảng cách được chọn ngẫu nhiên trong [min_interval, max_interval]
+    """
+
+    def __init__(self, min_interval=0.0, max_interval=None):
+        self.min_interval = min_interval
+        self.max_interval = min_interval if max_interval is None else max_interval
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+        self.slept = 0.0
+
+    def wait(self):
+        """
+        Ngủ cho đến lượt tải trang tiếp theo.
+
+        Returns:
+            float: Số giây đã ngủ
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next_time - now)
+            self._next_time = max(now, self._next_time) + random.uniform(self.min_interval, self.max_interval)
+            self.slept += delay
+        if delay:
+            time.sleep(delay)
+        return delay
+
+def percentile(values, fraction):
+    """Giá trị tại phân vị fraction (0-1) của values theo phương pháp gần nhất, None nếu rỗng"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+# Kết quả của một lần tải trang, dùng cho RateController
+OK = 'ok'
+ERROR = 'error'
+BLOCKED = 'blocked'
+
+
+class RateController:
+    """
+    Điều chỉnh tốc độ (số lần tải/giây) và số lần tải đồng thời cho từng host theo kiểu AIMD:
+    tăng dần khi trang trả về nhanh và không lỗi, giảm một nửa khi lỗi, giảm nhẹ tốc độ
+    (slow_factor) khi trang chậm hơn target_latency, và tạm dừng với thời gian tăng gấp đôi
+    mỗi lần bị chặn (captcha, 403, 429). latency truyền vào record() nên chỉ gồm thời gian
+    tải qua mạng, không gồm thời gian chờ phần tử hay trích xuất.
+
+    Dùng chung được giữa nhiều luồng; main.py chia sẻ một RateController giữa các tiến trình
+    qua multiprocessing manager. Mỗi lần tải gọi acquire() trước và record() sau.
+    """
+
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=20.0,
+                 initial_concurrency=4, min_concurrency=1, max_concurrency=16,
+                 target_latency=3.0, increase_step=0.2, decrease_factor=0.5, slow_factor=0.9,
+                 backoff_base=30.0, backoff_max=900.0, stale_seconds=300.0, latency_samples=1000):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.slow_factor = slow_factor
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stale_seconds = stale_seconds
+        self.latency_samples = latency_samples
+        self._hosts = {}
+        self._next_token = 0
+        self._cond = threading.Condition()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = {
+                "rate": self.initial_rate,
+                "concurrency": self.initial_concurrency,
+                "in_flight": {},
+                "next_time": 0.0,
+                "backoff_until": 0.0,
+                "blocks": 0,
+                "successes": 0,
+                "latency": None,
+                "error_rate": 0.0,
+                "requests": 0,
+                # Độ trễ của các lần tải gần nhất, dùng để tính p50/p95
+                "samples": collections.deque(maxlen=self.latency_samples),
+            }
+            self._hosts[host] = state
+        return state
+
+    def acquire(self, host):
+        """
+        Chờ đến khi được phép tải thêm một trang từ host.
+
+        Returns:
+            int: Mã lượt tải, truyền lại cho record()
+        """
+        with self._cond:
+            state = self._state(host)
+            while True:
+                now = time.monotonic()
+                # Bỏ các lượt tải không được record (ví dụ tiến trình bị dừng đột ngột)
+                for token, started in list(state["in_flight"].items()):
+                    if now - started > self.stale_seconds:
+                        del state["in_flight"][token]
+
+                wait = max(state["backoff_until"], state["next_time"]) - now
+                if wait <= 0 and len(state["in_flight"]) < state["concurrency"]:
+                    self._next_token += 1
+                    state["in_flight"][self._next_token] = now
+                    state["next_time"] = now + 1.0 / state["rate"]
+                    state["requests"] += 1
+                    return self._next_token
+                self._cond.wait(timeout=wait if wait > 0 else 1.0)
+
+    def record(self, host, token, latency, outcome=OK):
+        """Ghi nhận kết quả một lượt tải và điều chỉnh giới hạn của host"""
+        with self._cond:
+            state = self._state(host)
+            state["in_flight"].pop(token, None)
+            state["latency"] = latency if state["latency"] is None else 0.8 * state["latency"] + 0.2 * latency
+            state["samples"].append(latency)
+            state["error_rate"] = 0.8 * state["error_rate"] + (0.2 if outcome != OK else 0.0)
+
+            if outcome == BLOCKED:
+                # Bị chặn: tạm dừng host, thời gian dừng tăng gấp đôi sau mỗi lần bị chặn liên tiếp
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** state["blocks"])
+                state["blocks"] += 1
+                state["backoff_until"] = time.monotonic() + backoff
+                state["rate"] = max(self.min_rate, state["rate"] * self.decrease_factor)
+                state["concurrency"] = self.min_concurrency
+                state["successes"] = 0
+            elif outcome == ERROR:
+                state["rate"] = max(self.min_rate, state["rate"] * self.decrease_factor)
+                state["concurrency"] = max(self.min_concurrency, int(state["concurrency"] * self.decrease_factor))
+                state["successes"] = 0
+            elif latency > self.target_latency:
+                # Trang chậm nhưng không lỗi: chỉ giảm nhẹ tốc độ, giữ số lần tải đồng thời
+                state["blocks"] = 0
+                state["rate"] = max(self.min_rate, state["rate"] * self.slow_factor)
+                state["successes"] = 0
+            else:
+                state["blocks"] = 0
+                state["rate"] = min(self.max_rate, state["rate"] + self.increase_step)
+                # Tăng thêm một lượt đồng thời sau mỗi "cửa sổ" thành công
+                state["successes"] += 1
+                if state["successes"] >= state["concurrency"]:
+                    state["concurrency"] = min(self.max_concurrency, state["concurrency"] + 1)
+                    state["successes"] = 0
+            self._cond.notify_all()
+
+    def limits(self):
+        """Giới hạn hiện tại của từng host"""
+        with self._cond:
+            now = time.monotonic()
+            return {
+                host: {
+                    "rate": round(state["rate"], 2),
+                    "concurrency": state["concurrency"],
+                    "in_flight": len(state["in_flight"]),
+                    "latency": round(state["latency"], 3) if state["latency"] is not None else None,
+                    "p50": _round(percentile(state["samples"], 0.5)),
+                    "p95": _round(percentile(state["samples"], 0.95)),
+                    "error_rate": round(state["error_rate"], 3),
+                    "backoff_seconds": round(max(0.0, state["backoff_until"] - now), 1),
+                    "requests": state["requests"],
+                }
+                for host, state in self._hosts.items()
+            }
+
+def _round(value, digits=3):
+    return round(value, digits) if value is not None else None
+
+def format_limits(limits):
+    """Định dạng giới hạn của RateController thành một dòng cho mỗi host"""
+    lines = []
+    for host, info in limits.items():
+        line = (f"{host}: {info['rate']} trang/giây, {info['concurrency']} đồng thời, "
+                f"độ trễ {info['latency']} giây, lỗi {info['error_rate'] * 100:.0f}%")
+        if info['backoff_seconds']:
+            line += f", tạm dừng {info['backoff_seconds']} giây"
+        lines.append(line)
+    return "\n".join(lines)
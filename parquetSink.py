@@ -0,0 +1,104 @@
+import os
+import re
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Cột dùng để chia thư mục: ngày cào và loại tin (lấy từ cột "Loại tin")
+CRAWL_DATE_COLUMN = "crawl_date"
+LISTING_TYPE_COLUMN = "listing_type"
+LISTING_TYPE_SOURCE = "Loại tin"
+# Giá trị "Loại tin" hợp lệ có dạng "Tin thường", "Tin VIP Bạc"...; giá trị khác (dữ liệu lệch cột)
+# được xếp vào thư mục __HIVE_DEFAULT_PARTITION__ để không sinh ra thư mục rác
+LISTING_TYPE_PATTERN = re.compile(r"^Tin [^,.:;/\d]{1,30}$")
+PARTITION_SCHEMA = pa.schema([(CRAWL_DATE_COLUMN, pa.string()), (LISTING_TYPE_COLUMN, pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+
+def records_to_table(records, crawl_date=None):
+    """
+    Chuyển các bản ghi (list các dict) thành bảng Arrow với mọi cột dạng chuỗi.
+
+    Bản ghi không có một cột nào đó được ghi giá trị rỗng cho cột đó. Thêm hai cột chia thư mục:
+    crawl_date là ngày cào (mặc định hôm nay, dạng YYYY-MM-DD), listing_type là loại tin.
+    """
+    columns = []
+    known = set()
+    for record in records:
+        for key in record:
+            if key not in known and key not in PARTITION_SCHEMA.names:
+                known.add(key)
+                columns.append(key)
+
+    crawl_date = crawl_date or time.strftime("%Y-%m-%d")
+    data = {column: [_as_text(record.get(column)) for record in records] for column in columns}
+    data[CRAWL_DATE_COLUMN] = [crawl_date] * len(records)
+    data[LISTING_TYPE_COLUMN] = [_listing_type(record.get(LISTING_TYPE_SOURCE)) for record in records]
+    schema = pa.schema([(column, pa.string()) for column in columns]).append(
+        PARTITION_SCHEMA.field(CRAWL_DATE_COLUMN)).append(PARTITION_SCHEMA.field(LISTING_TYPE_COLUMN))
+    return pa.table(data, schema=schema)
+
+def _listing_type(value):
+    """Loại tin dùng để chia thư mục, None nếu giá trị không phải loại tin"""
+    value = _as_text(value)
+    if value is None or not LISTING_TYPE_PATTERN.match(value.strip()):
+        return None
+    return value.strip()
+
+def _as_text(value):
+    """Giá trị rỗng (None, NaN, "") thành None, còn lại thành chuỗi"""
+    if value is None or value == "" or value != value:
+        return None
+    return str(value)
+
+def write_parquet_records(records, output_dir, crawl_date=None, compression="zstd", replace=False):
+    """
+    Ghi một lô bản ghi vào thư mục Parquet chia theo crawl_date=.../listing_type=...
+
+    Mỗi lô được ghi thành file mới trong từng thư mục con nên không phải đọc lại dữ liệu cũ.
+    Lô mới có thể có thêm cột (ví dụ "Mức giá điện"); read_parquet gộp các schema khi đọc.
+    replace=True xóa dữ liệu cũ trong các thư mục con mà lô này ghi vào.
+
+    Returns:
+        int: Số bản ghi đã ghi
+    """
+    if not records:
+        return 0
+    table = records_to_table(records, crawl_date)
+    pq.write_to_dataset(
+        table,
+        output_dir,
+        partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="delete_matching" if replace else "overwrite_or_ignore",
+        compression=compression,
+    )
+    return table.num_rows
+
+def parquet_dataset(output_dir):
+    """
+    Mở thư mục Parquet với schema gộp từ tất cả các file, cột thiếu trong file cũ được đọc là rỗng.
+    Chỉ đọc phần metadata của từng file, không đọc dữ liệu.
+    """
+    dataset = ds.dataset(output_dir, format="parquet", partitioning=PARTITIONING)
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    schema = pa.unify_schemas(schemas + [PARTITION_SCHEMA])
+    return ds.dataset(output_dir, format="parquet", partitioning=PARTITIONING, schema=schema)
+
+def read_parquet(output_dir, columns=None, filter=None):
+    """
+    Đọc dữ liệu từ thư mục Parquet thành DataFrame.
+
+    Parameters:
+        output_dir (str): Thư mục Parquet
+        columns (list): Chỉ đọc các cột này, None là đọc tất cả
+        filter: Biểu thức lọc của pyarrow, ví dụ ds.field("listing_type") == "Tin thường".
+            Lọc theo crawl_date hoặc listing_type sẽ bỏ qua các thư mục không khớp.
+
+    Returns:
+        DataFrame: Dữ liệu đọc được, rỗng nếu thư mục chưa có
+    """
+    if not os.path.isdir(output_dir):
+        return pa.table({}).to_pandas()
+    return parquet_dataset(output_dir).to_table(columns=columns, filter=filter).to_pandas()
@@ -0,0 +1,132 @@
+import multiprocessing
+import threading
+import time
+from crawlLink import LISTING_URL, discover_links, record_page
+from frontier import DETAIL, LISTING, format_eta
+from frontierServer import is_remote, open_frontier
+from linkStore import LinkStore
+from main import process_with_multiprocessing
+from metrics import Metrics, export, format_summary
+from pacing import Pacer, RateController
+from retryQueue import fail_exhausted
+
+def backpressured(pages, frontier, max_backlog, poll_interval=0.5):
+    """
+    Trả lần lượt các trang danh sách, tạm dừng khi frontier có từ max_backlog URL chi tiết
+    đang chờ trở lên để trang danh sách không chạy quá xa so với các tiến trình tải trang chi tiết.
+    """
+    for page in pages:
+        while frontier.available(DETAIL) >= max_backlog:
+            time.sleep(poll_interval)
+        yield page
+
+def discovery_process(start_page, end_page, frontier_file='frontier.db', link_db='linkProduct.db', concurrency=8,
+                      max_backlog=500, listing_url=LISTING_URL, page_interval=(0.2, 0.5), rate_settings=None,
+                      quiet=False, metrics_file=None):
+    """
+    Tiến trình tìm liên kết của pipeline: tải các trang danh sách [start_page, end_page) bằng HTTP
+    song song, bỏ liên kết trùng (LinkStore và khóa của frontier) và đưa liên kết mới thẳng vào
+    frontier ngay sau mỗi trang để các tiến trình tải trang chi tiết nhận được trong vài giây.
+
+    Trang danh sách đã xong ở lần chạy trước được bỏ qua, trang lỗi được thử lại như crawlLink.py.
+    Việc tải trang danh sách tạm dừng khi số URL chi tiết đang chờ đạt max_backlog (backpressure).
+    """
+    frontier = open_frontier(frontier_file)
+    link_store = LinkStore(link_db)
+    metrics = Metrics()
+    pacer = Pacer(*page_interval)
+    settings = {"initial_rate": 2.0, "initial_concurrency": 4, "max_concurrency": concurrency}
+    settings.update(rate_settings or {})
+    rate_controller = RateController(**settings)
+    frontier.add(LISTING, range(start_page, end_page))
+    if not is_remote(frontier_file):
+        frontier.reset_leases(LISTING)
+
+    queued = 0
+    try:
+        while True:
+            fail_exhausted(frontier, LISTING)
+            pages = [int(page) for page in frontier.lease(LISTING, lease_seconds=24 * 3600)]
+            if not pages:
+                next_retry = frontier.next_retry_time(LISTING)
+                if next_retry is None:
+                    break
+                time.sleep(max(0, next_retry - time.time()))
+                continue
+
+            results = discover_links(backpressured(pages, frontier, max_backlog), concurrency, pacer=pacer,
+                                     rate_controller=rate_controller, listing_url=listing_url, metrics=metrics)
+            for page, product_links, error in results:
+                queued += record_page(frontier, link_store, page, product_links, error, metrics, quiet)
+    finally:
+        counts = frontier.counts(LISTING)
+        frontier.close()
+        link_store.close()
+        snapshot = metrics.snapshot()
+        if metrics_file:
+            export(snapshot, metrics_file)
+        print(f"🔗 Trang danh sách: {counts['done']} xong, {counts['failed']} lỗi, "
+              f"{queued} liên kết mới đưa vào frontier")
+        if not quiet:
+            print(format_summary(snapshot))
+
+def run_pipeline(start_page, end_page, frontier_file='frontier.db', link_db='linkProduct.db', num_processes=4,
+                 concurrency=8, max_backlog=500, listing_url=LISTING_URL, listing_interval=(0.2, 0.5),
+                 listing_rate_settings=None, links_metrics_file=None, **detail_options):
+    """
+    Chạy liền một mạch từ trang danh sách đến trang chi tiết, thay cho ba bước crawlLink.py,
+    filterData.py và main.py nối với nhau qua linkProduct.json/linkProduct.csv.
+
+    Một tiến trình (discovery_process) tìm liên kết và đưa vào frontier, đồng thời
+    process_with_multiprocessing tải các trang chi tiết ngay khi có liên kết. Frontier là hàng đợi
+    giữa hai bên, có giới hạn max_backlog URL đang chờ và lưu trên đĩa nên có thể dừng rồi chạy tiếp;
+    bản ghi đi tiếp qua hàng đợi có giới hạn của tiến trình ghi như main.py.
+
+    detail_options được truyền cho process_with_multiprocessing (output_file, engine, lean...).
+
+    Returns:
+        dict: Giới hạn cuối cùng của RateController của các trang chi tiết
+    """
+    producer_done = multiprocessing.Event()
+    discovery = multiprocessing.Process(
+        target=discovery_process, args=(start_page, end_page, frontier_file, link_db, concurrency, max_backlog,
+                                        listing_url, listing_interval, listing_rate_settings,
+                                        detail_options.get("quiet", False), links_metrics_file))
+    discovery.start()
+
+    def watch_discovery():
+        # Báo cho các tiến trình tải trang chi tiết khi tìm liên kết kết thúc, kể cả khi bị lỗi
+        discovery.join()
+        producer_done.set()
+
+    threading.Thread(target=watch_discovery, daemon=True).start()
+    detail_options.setdefault("poll_interval", 1)
+    try:
+        return process_with_multiprocessing(frontier_file, num_processes, producer_done=producer_done,
+                                            **detail_options)
+    finally:
+        discovery.join()
+
+if __name__ == "__main__":
+    start_page, end_page = 2245, 2890
+    frontier_file = 'frontier.db'  # Trạng thái từng trang danh sách và URL chi tiết
+    link_db = 'linkProduct.db'  # Kho liên kết đã tìm được
+    concurrency = 8  # Số trang danh sách tải cùng lúc
+    max_backlog = 500  # Tạm dừng tải trang danh sách khi có ngần này URL chi tiết đang chờ
+    num_processes = 8  # Số tiến trình tải trang chi tiết
+    output_csv = 'property_data.csv'
+    output_parquet = 'property_data_parquet'  # None để tắt
+    engine = 'http'  # 'http' (HTTP + lxml, Selenium dự phòng) hoặc 'selenium'
+    lean_mode = True  # Không tải ảnh, font, quảng cáo, tracker khi dùng Selenium
+    quiet = True  # Chỉ hiện một thanh tiến trình thay vì in từng URL
+    index_dir = 'property_index'  # Chỉ mục truy vấn của file CSV (python queryIndex.py query ...), None để tắt
+
+    print("\n" + "="*70)
+    print("🏠 CÀO LIÊN TỤC TỪ TRANG DANH SÁCH ĐẾN TRANG CHI TIẾT")
+    print("="*70 + "\n")
+    start_time = time.time()
+    run_pipeline(start_page, end_page, frontier_file, link_db, num_processes, concurrency, max_backlog,
+                 links_metrics_file='metrics_links.prom', output_file=output_csv, parquet_dir=output_parquet,
+                 engine=engine, lean=lean_mode, quiet=quiet, metrics_file='metrics.prom',
+                 index_dir=index_dir)
+    print(f"✅ HOÀN THÀNH! Thời gian: {format_eta(time.time() - start_time)}")
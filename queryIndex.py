@@ -0,0 +1,357 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from normalizeData import normalize_frame, PRICE_UNITS
+
+# Cột số được đánh chỉ mục (lấy từ normalize_frame); cột ngày lưu dạng số ngày kể từ 1970-01-01
+NUMERIC_COLUMNS = ("price_vnd", "price_per_m2_vnd", "area_m2", "bedrooms", "bathrooms", "floors",
+                   "frontage_m", "access_road_m", "posted_date", "expiry_date")
+DATE_COLUMNS = ("posted_date", "expiry_date")
+
+# Cột dạng chữ được đánh chỉ mục ngược (giá trị -> danh sách dòng)
+CATEGORY_COLUMNS = ("Pháp lý", "Nội thất", "Hướng nhà", "Loại tin")
+
+META_FILE = "meta.json"
+BOUND_PATTERN = re.compile(r"^(\d+(?:[.,]\d+)?)\s*(tỷ|triệu|nghìn)?$")
+
+def category_key(value):
+    """Khóa chỉ mục của giá trị dạng chữ: bỏ khoảng trắng và dấu chấm ở cuối ("Sổ đỏ/ Sổ hồng." = "Sổ đỏ/ Sổ hồng")"""
+    if value is None or value != value:
+        return None
+    value = str(value).strip().rstrip(".").strip()
+    return value or None
+
+def parse_bound(text):
+    """Giới hạn của một khoảng từ dòng lệnh: "-" là không giới hạn, "7 tỷ", "2025-10-01" hoặc số"""
+    text = str(text).strip()
+    if text in ("", "-"):
+        return None
+    if re.match(r"^\d{4}-\d{2}-\d{2}$", text):
+        return text
+    match = BOUND_PATTERN.match(text.lower())
+    if match:
+        return float(match.group(1).replace(",", ".")) * PRICE_UNITS.get(match.group(2), 1)
+    return float(text)
+
+def _read_header(csv_file):
+    """Dòng tiêu đề của file CSV: (danh sách cột, số byte của dòng tiêu đề)"""
+    with open(csv_file, "rb") as f:
+        line = f.readline()
+    return next(csv.reader([line.decode("utf-8-sig")]), []), len(line)
+
+def _read_record(f):
+    """Đọc một dòng CSV (có thể gồm nhiều dòng vật lý nếu trong ô có xuống dòng), None nếu dòng chưa ghi xong"""
+    record = f.readline()
+    while record.count(b'"') % 2:
+        more = f.readline()
+        if not more:
+            return None
+        record += more
+    if not record.endswith(b"\n"):
+        return None
+    return next(csv.reader([record.decode("utf-8")]), [])
+
+def _read_rows(csv_file, start):
+    """
+    Đọc các dòng từ vị trí byte start đến hết file.
+
+    Returns:
+        tuple: (các dòng, vị trí byte bắt đầu mỗi dòng, vị trí byte sau dòng cuối cùng đã đọc)
+    """
+    rows, offsets = [], []
+    with open(csv_file, "rb") as f:
+        f.seek(start)
+        end = start
+        while True:
+            position = f.tell()
+            row = _read_record(f)
+            if row is None:
+                break
+            rows.append(row)
+            offsets.append(position)
+            end = f.tell()
+    return rows, offsets, end
+
+def _as_days(values):
+    """Chuyển cột ngày thành số ngày kể từ 1970-01-01 (NaN nếu rỗng)"""
+    days = pd.to_datetime(values, errors="coerce").to_numpy(dtype="datetime64[D]")
+    result = days.astype("int64").astype("float64")
+    result[np.isnat(days)] = np.nan
+    return result
+
+
+class PropertyIndex:
+    """
+    Chỉ mục lưu trên đĩa của property_data.csv để lọc và tổng hợp trong vài mili giây mà không
+    phải đọc và phân tích lại file CSV.
+
+    - Cột số (giá, diện tích, số phòng, ngày đăng...): mảng giá trị theo dòng và mảng dòng sắp xếp
+      theo giá trị, lọc khoảng bằng tìm kiếm nhị phân.
+    - Cột dạng chữ (Pháp lý, Nội thất, Hướng nhà, Loại tin): chỉ mục ngược, mỗi giá trị một danh
+      sách dòng tăng dần.
+    - Vị trí byte của từng dòng trong file CSV để chỉ đọc các dòng kết quả.
+
+    update() chỉ đọc phần được ghi thêm vào cuối file kể từ lần trước (kể cả khi tiến trình ghi
+    thêm cột mới vào dòng tiêu đề); file bị thay thế hoặc ngắn đi thì chỉ mục được xây lại.
+    """
+
+    def __init__(self, index_dir="property_index"):
+        self.index_dir = index_dir
+        self.meta = None
+        self.arrays = {}
+        if os.path.exists(os.path.join(index_dir, META_FILE)):
+            self._load()
+
+    def _load(self):
+        with open(os.path.join(self.index_dir, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.arrays = {name: np.load(os.path.join(self.index_dir, name + ".npy"), mmap_mode="r")
+                       for name in self.meta["arrays"]}
+
+    def __len__(self):
+        return self.meta["rows"] if self.meta else 0
+
+    def _array(self, name, dtype):
+        return np.asarray(self.arrays[name]) if name in self.arrays else np.empty(0, dtype=dtype)
+
+    def update(self, csv_file="property_data.csv"):
+        """
+        Đưa các dòng mới của csv_file vào chỉ mục.
+
+        Returns:
+            int: Số dòng mới được đánh chỉ mục
+        """
+        header, header_bytes = _read_header(csv_file)
+        meta = self.meta
+        shift = 0
+        if meta is not None:
+            shift = header_bytes - meta["header_bytes"]
+            same_file = (meta["csv_file"] == os.path.abspath(csv_file)
+                         and header[:len(meta["header"])] == meta["header"]
+                         and os.path.getsize(csv_file) >= meta["indexed_bytes"] + shift)
+            if not same_file:
+                meta, shift = None, 0
+        if meta is None:
+            self.arrays = {}
+            meta = {"rows": 0, "indexed_bytes": header_bytes, "categories": {c: [] for c in CATEGORY_COLUMNS}}
+
+        rows, offsets, end = _read_rows(csv_file, meta["indexed_bytes"] + shift)
+        base = meta["rows"]
+        arrays = {"offsets": np.concatenate([self._array("offsets", "int64") + shift,
+                                             np.asarray(offsets, dtype="int64")])}
+        frame = pd.DataFrame([(row + [""] * len(header))[:len(header)] for row in rows], columns=header, dtype=str)
+        normalized = normalize_frame(frame) if rows else pd.DataFrame(index=frame.index)
+        new_ids = np.arange(base, base + len(rows), dtype="int64")
+
+        for i, column in enumerate(NUMERIC_COLUMNS):
+            if column not in normalized:
+                new_values = np.full(len(rows), np.nan)
+            elif column in DATE_COLUMNS:
+                new_values = _as_days(normalized[column])
+            else:
+                new_values = normalized[column].astype("float64").to_numpy(na_value=np.nan)
+            values = np.concatenate([self._array(f"values_{i}", "float64"), new_values])
+            # Chèn các dòng mới vào mảng đã sắp xếp thay vì sắp xếp lại toàn bộ
+            valid = ~np.isnan(new_values)
+            new_order = new_ids[valid][np.argsort(new_values[valid], kind="stable")]
+            sorted_values = self._array(f"sorted_{i}", "float64")
+            positions = np.searchsorted(sorted_values, values[new_order], side="right")
+            arrays[f"values_{i}"] = values
+            arrays[f"order_{i}"] = np.insert(self._array(f"order_{i}", "int64"), positions, new_order)
+            arrays[f"sorted_{i}"] = np.insert(sorted_values, positions, values[new_order])
+
+        for i, column in enumerate(CATEGORY_COLUMNS):
+            vocabulary = list(meta["categories"][column])
+            codes = {key: code for code, key in enumerate(vocabulary)}
+            new_codes = np.full(len(rows), -1, dtype="int64")
+            if column in frame:
+                for row, value in enumerate(frame[column]):
+                    key = category_key(value)
+                    if key is not None:
+                        new_codes[row] = codes.setdefault(key, len(codes))
+                        if new_codes[row] == len(vocabulary):
+                            vocabulary.append(key)
+            # Danh sách dòng của mỗi giá trị nối liền nhau, starts[c]:starts[c + 1] là phần của giá trị c
+            old_ids = self._array(f"postings_{i}", "int64")
+            old_starts = self._array(f"starts_{i}", "int64")
+            old_counts = np.diff(old_starts) if len(old_starts) else np.empty(0, dtype="int64")
+            old_counts = np.concatenate([old_counts, np.zeros(len(vocabulary) - len(old_counts), dtype="int64")])
+            valid = new_codes >= 0
+            order = np.argsort(new_codes[valid], kind="stable")
+            grouped_ids = new_ids[valid][order]
+            new_counts = np.bincount(new_codes[valid], minlength=len(vocabulary))
+            starts = np.concatenate([[0], np.cumsum(old_counts + new_counts)])
+            postings = np.empty(starts[-1], dtype="int64")
+            old_position = new_position = 0
+            for code in range(len(vocabulary)):
+                start = starts[code]
+                postings[start:start + old_counts[code]] = old_ids[old_position:old_position + old_counts[code]]
+                postings[start + old_counts[code]:starts[code + 1]] = \
+                    grouped_ids[new_position:new_position + new_counts[code]]
+                old_position += old_counts[code]
+                new_position += new_counts[code]
+            arrays[f"postings_{i}"] = postings
+            arrays[f"starts_{i}"] = starts
+            meta["categories"][column] = vocabulary
+
+        meta.update({"csv_file": os.path.abspath(csv_file), "header": header, "header_bytes": header_bytes,
+                     "indexed_bytes": end, "rows": base + len(rows), "arrays": sorted(arrays),
+                     "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        self._save(arrays, meta)
+        return len(rows)
+
+    def _save(self, arrays, meta):
+        """Ghi các mảng rồi mới ghi meta.json (qua file tạm) để bên đọc không thấy chỉ mục ghi dở"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        for name, array in arrays.items():
+            temp_file = os.path.join(self.index_dir, name + ".tmp.npy")
+            np.save(temp_file, array)
+            os.replace(temp_file, os.path.join(self.index_dir, name + ".npy"))
+        temp_file = os.path.join(self.index_dir, META_FILE + ".tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_file, os.path.join(self.index_dir, META_FILE))
+        self._load()
+
+    def _codes(self, column, values=None, contains=None):
+        """Mã các giá trị của cột dạng chữ bằng một trong values hoặc chứa chuỗi contains (không phân biệt hoa thường)"""
+        vocabulary = self.meta["categories"][column]
+        if contains is not None:
+            text = contains.casefold()
+            return [code for code, key in enumerate(vocabulary) if text in key.casefold()]
+        wanted = {category_key(value) for value in values}
+        return [code for code, key in enumerate(vocabulary) if key in wanted]
+
+    def _bound(self, column, value):
+        if value is None:
+            return None
+        if column in DATE_COLUMNS:
+            return float(np.datetime64(pd.Timestamp(value).date(), "D").astype("int64"))
+        return float(value)
+
+    def select(self, ranges=None, equals=None, contains=None):
+        """
+        Các dòng thỏa mãn mọi điều kiện.
+
+        Parameters:
+            ranges (dict): Cột số -> (nhỏ nhất, lớn nhất), None là không giới hạn; cột ngày nhận "YYYY-MM-DD"
+            equals (dict): Cột dạng chữ -> danh sách giá trị chấp nhận
+            contains (dict): Cột dạng chữ -> chuỗi cần có trong giá trị, ví dụ {"Pháp lý": "sổ đỏ"}
+
+        Returns:
+            ndarray: Số thứ tự các dòng, tăng dần
+        """
+        rows = len(self)
+        mask = np.ones(rows, dtype=bool)
+
+        def keep(ids):
+            nonlocal mask
+            selected = np.zeros(rows, dtype=bool)
+            selected[ids] = True
+            mask &= selected
+
+        for column, (low, high) in (ranges or {}).items():
+            i = NUMERIC_COLUMNS.index(column)
+            sorted_values = self.arrays[f"sorted_{i}"]
+            low, high = self._bound(column, low), self._bound(column, high)
+            start = 0 if low is None else np.searchsorted(sorted_values, low, side="left")
+            end = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side="right")
+            keep(self.arrays[f"order_{i}"][start:end])
+
+        conditions = [(column, self._codes(column, values=values)) for column, values in (equals or {}).items()]
+        conditions += [(column, self._codes(column, contains=text)) for column, text in (contains or {}).items()]
+        for column, codes in conditions:
+            i = CATEGORY_COLUMNS.index(column)
+            starts, postings = self.arrays[f"starts_{i}"], self.arrays[f"postings_{i}"]
+            keep(np.concatenate([postings[starts[c]:starts[c + 1]] for c in codes] or [np.empty(0, dtype="int64")]))
+        return np.flatnonzero(mask)
+
+    def rows(self, ids, columns=None):
+        """Đọc các dòng ids từ file CSV (chỉ các dòng này) kèm các cột số đã chuẩn hóa"""
+        header = self.meta["header"]
+        records = []
+        with open(self.meta["csv_file"], "rb") as f:
+            for offset in self.arrays["offsets"][ids]:
+                f.seek(int(offset))
+                row = _read_record(f) or []
+                records.append((row + [""] * len(header))[:len(header)])
+        df = pd.DataFrame(records, columns=header, index=ids)
+        for i, column in enumerate(NUMERIC_COLUMNS):
+            values = np.asarray(self.arrays[f"values_{i}"][ids])
+            if column in DATE_COLUMNS:
+                df[column] = pd.to_datetime(values, unit="D")
+            else:
+                df[column] = values
+        return df[columns] if columns else df
+
+    def aggregate(self, ids, column="price_vnd", by=None):
+        """
+        Số dòng, nhỏ nhất, trung vị, trung bình, lớn nhất của cột số column trên các dòng ids,
+        theo từng giá trị của cột dạng chữ by nếu có.
+        """
+        values = pd.Series(np.asarray(self.arrays[f"values_{NUMERIC_COLUMNS.index(column)}"][ids]), index=ids)
+        functions = ["count", "min", "median", "mean", "max"]
+        if by is None:
+            return values.agg(functions).to_frame(column).T
+        i = CATEGORY_COLUMNS.index(by)
+        starts, postings = self.arrays[f"starts_{i}"], self.arrays[f"postings_{i}"]
+        labels = np.full(len(ids), -1, dtype="int64")
+        for code in range(len(self.meta["categories"][by])):
+            # ids và danh sách dòng của mỗi giá trị đều tăng dần nên tìm nhị phân được
+            members = postings[starts[code]:starts[code + 1]]
+            positions = np.searchsorted(ids, members)
+            found = positions < len(ids)
+            found[found] = ids[positions[found]] == members[found]
+            labels[positions[found]] = code
+        groups = pd.Series(pd.Categorical.from_codes(labels, self.meta["categories"][by]), index=ids)
+        return values.groupby(groups, observed=True).agg(functions).sort_values("count", ascending=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lọc và tổng hợp dữ liệu đã cào bằng chỉ mục, không đọc lại file CSV")
+    parser.add_argument("--index", default="property_index", help="Thư mục chỉ mục")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    update_parser = subparsers.add_parser("update", help="Đưa các dòng mới của file CSV vào chỉ mục")
+    update_parser.add_argument("--csv", default="property_data.csv")
+    query_parser = subparsers.add_parser("query", help="Lọc các tin theo điều kiện")
+    query_parser.add_argument("--range", nargs=3, action="append", default=[], metavar=("COT", "TU", "DEN"),
+                              help=f"Khoảng giá trị của cột số ({', '.join(NUMERIC_COLUMNS)}), '-' là không giới hạn")
+    query_parser.add_argument("--equals", nargs=2, action="append", default=[], metavar=("COT", "GIA_TRI"))
+    query_parser.add_argument("--contains", nargs=2, action="append", default=[], metavar=("COT", "CHUOI"))
+    query_parser.add_argument("--posted-days", type=int, default=None, help="Chỉ lấy tin đăng trong số ngày gần đây")
+    query_parser.add_argument("--agg", default=None, help="Tổng hợp cột số này thay vì in các dòng")
+    query_parser.add_argument("--by", default=None, help="Tổng hợp theo từng giá trị của cột dạng chữ này")
+    query_parser.add_argument("--columns", nargs="+", default=None)
+    query_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    index = PropertyIndex(args.index)
+    if args.command == "update":
+        start = time.perf_counter()
+        added = index.update(args.csv)
+        print(f"Đã thêm {added} dòng vào chỉ mục {args.index} ({len(index)} dòng) "
+              f"trong {(time.perf_counter() - start) * 1000:.0f} ms")
+    else:
+        if not len(index):
+            parser.error(f"Chỉ mục {args.index} chưa có, chạy lệnh update trước")
+        ranges = {column: (parse_bound(low), parse_bound(high)) for column, low, high in args.range}
+        equals = {}
+        for column, value in args.equals:
+            equals.setdefault(column, []).append(value)
+        if args.posted_days is not None:
+            since = (pd.Timestamp.now().normalize() - pd.Timedelta(days=args.posted_days)).strftime("%Y-%m-%d")
+            ranges["posted_date"] = (since, None)
+        start = time.perf_counter()
+        ids = index.select(ranges, equals, dict(args.contains))
+        if args.agg:
+            result = index.aggregate(ids, args.agg, args.by)
+        else:
+            result = index.rows(ids[:args.limit], args.columns)
+        elapsed = (time.perf_counter() - start) * 1000
+        with pd.option_context("display.max_columns", None, "display.width", 200):
+            print(result.to_string())
+        print(f"{len(ids)} tin khớp điều kiện ({elapsed:.1f} ms)")
@@ -0,0 +1,109 @@
+import json
+import time
+from httpExtract import BLOCKED_ERROR
+
+# Nhóm lỗi của một lượt tải
+TIMEOUT = 'timeout'
+BLOCKED = 'blocked'
+MISSING_ELEMENT = 'missing_element'
+DRIVER_CRASH = 'driver_crash'
+OTHER = 'other'
+
+# Mở đầu thông báo lỗi của đường Selenium (driverPool.driver_error_message) cho từng nhóm
+TIMEOUT_ERROR = "Hết thời gian tải trang"
+MISSING_ELEMENT_ERROR = "Thiếu phần tử"
+DRIVER_ERROR = "Trình duyệt lỗi"
+LAUNCH_ERROR = "Không thể khởi động trình duyệt"
+
+# Chính sách thử lại cho từng nhóm lỗi: (số giây chờ lần đầu, số lần thử tối đa).
+# Thời gian chờ tăng gấp đôi sau mỗi lần thử.
+RETRY_POLICY = {
+    TIMEOUT: (30, 4),
+    BLOCKED: (300, 5),
+    MISSING_ELEMENT: (60, 2),
+    DRIVER_CRASH: (5, 3),
+    OTHER: (60, 3),
+}
+
+# Dấu hiệu trình duyệt bị treo hoặc đã đóng, chỉ xét với lỗi của đường Selenium (DRIVER_ERROR):
+# "max retries exceeded" ở đó là chromedriver không còn nhận kết nối, còn ở lỗi HTTP thì chỉ là
+# máy chủ không kết nối được
+DRIVER_CRASH_MARKERS = (
+    "invalid session id",
+    "session deleted",
+    "chrome not reachable",
+    "disconnected",
+    "no such window",
+    "target window already closed",
+    "max retries exceeded",
+)
+
+def classify_error(error):
+    """Phân loại thông báo lỗi thành một trong các nhóm TIMEOUT, BLOCKED, MISSING_ELEMENT, DRIVER_CRASH, OTHER"""
+    error = str(error)
+    lowered = error.lower()
+    if error.startswith(BLOCKED_ERROR):
+        return BLOCKED
+    if error.startswith(MISSING_ELEMENT_ERROR):
+        return MISSING_ELEMENT
+    if error.startswith(LAUNCH_ERROR):
+        return DRIVER_CRASH
+    if error.startswith(DRIVER_ERROR) and any(marker in lowered for marker in DRIVER_CRASH_MARKERS):
+        return DRIVER_CRASH
+    if error.startswith(TIMEOUT_ERROR) or "timed out" in lowered or "timeout" in lowered:
+        return TIMEOUT
+    return OTHER
+
+def retry_delay(error_class, attempt):
+    """Số giây chờ trước lần thử tiếp theo sau attempt lần đã thử"""
+    base, _ = RETRY_POLICY[error_class]
+    return base * 2 ** max(0, attempt - 1)
+
+def handle_failure(frontier, kind, key, error, dead_letter_file='dead_letter.jsonl'):
+    """
+    Xử lý một công việc bị lỗi: đưa lại vào frontier để thử sau một khoảng thời gian theo
+    nhóm lỗi, hoặc đánh dấu failed và ghi vào dead_letter_file khi đã thử đủ số lần.
+
+    Returns:
+        tuple: (error_class, retry_in). retry_in là số giây đến lần thử tiếp theo,
+        None nếu công việc đã bị đưa vào dead_letter_file.
+    """
+    error_class = classify_error(error)
+    attempts = frontier.attempts(kind, key)
+    _, max_attempts = RETRY_POLICY[error_class]
+
+    if attempts < max_attempts:
+        delay = retry_delay(error_class, attempts)
+        frontier.retry(kind, key, error, error_class, delay)
+        return error_class, delay
+
+    frontier.fail(kind, key, error, error_class)
+    write_dead_letter(dead_letter_file, kind, key, error, error_class, attempts)
+    return error_class, None
+
+def fail_exhausted(frontier, kind, dead_letter_file='dead_letter.jsonl'):
+    """
+    Đưa vào dead_letter_file các công việc đã được nhận đủ số lần theo RETRY_POLICY (theo nhóm
+    lỗi của lần lỗi gần nhất, OTHER nếu chưa từng lỗi) mà lần cuối không báo lại kết quả, ví dụ
+    trang làm tiến trình chết mỗi lần xử lý. Gọi trước frontier.lease.
+
+    Returns:
+        int: Số công việc đã bị đưa vào dead_letter_file
+    """
+    attempt_limits = {error_class: max_attempts for error_class, (_, max_attempts) in RETRY_POLICY.items()}
+    exhausted = frontier.fail_exhausted(kind, attempt_limits, RETRY_POLICY[OTHER][1])
+    for key, attempts, error, error_class in exhausted:
+        write_dead_letter(dead_letter_file, kind, key, error, error_class or OTHER, attempts)
+    return len(exhausted)
+
+def write_dead_letter(dead_letter_file, kind, key, error, error_class, attempts):
+    """Ghi một công việc đã lỗi hẳn vào dead_letter_file (mỗi dòng một JSON)"""
+    with open(dead_letter_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({
+            "kind": kind,
+            "key": str(key),
+            "error_class": error_class,
+            "error": str(error)[:1000],
+            "attempts": attempts,
+            "failed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }, ensure_ascii=False) + "\n")
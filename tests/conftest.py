@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module của dự án nằm ở thư mục gốc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,124 @@
+"""
+Hai cách trích xuất trang chi tiết phải cho cùng một dict: httpExtract.extract_property_info
+(lxml) và domExtract.extract_spec_data (innerText của Chrome qua Selenium).
+
+inner_text.json lưu innerText của từng khối thông tin mà Chrome trả về cho mỗi file HTML mẫu.
+Các bài kiểm tra đầu chạy không cần trình duyệt; bài kiểm tra cuối mở các file mẫu bằng
+Chrome (bỏ qua nếu máy không có Chrome) để kiểm tra lại chính inner_text.json.
+Có thể thay file mẫu bằng trang ghi từ batdongsan.com.vn (localServer.record_pages).
+"""
+import json
+import os
+import pytest
+from domExtract import SPEC_SELECTORS, SPEC_TEXTS_SCRIPT, extract_spec_data
+from httpExtract import extract_property_info, fetch_property_info, BLOCKED_ERROR, INCOMPLETE_ERROR
+from localServer import detail_html
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+with open(os.path.join(FIXTURES_DIR, "inner_text.json"), encoding="utf-8") as f:
+    INNER_TEXT = json.load(f)
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class RecordedDriver:
+    """Thay cho WebDriver: execute_script trả về innerText đã ghi của các khối thông tin"""
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    def execute_script(self, script, *args):
+        assert script == SPEC_TEXTS_SCRIPT and args[0] == SPEC_SELECTORS
+        return self.texts
+
+
+@pytest.mark.parametrize("name", sorted(INNER_TEXT))
+def test_http_and_selenium_extract_same_dict(name):
+    selenium_data = extract_spec_data(RecordedDriver(INNER_TEXT[name]))
+    assert selenium_data
+    assert extract_property_info(read_fixture(name)) == selenium_data
+
+
+def test_batdongsan_fixture_values():
+    data = extract_property_info(read_fixture("batdongsan_detail.html"))
+    assert data["Khoảng giá"] == "4 tỷ"
+    assert data["Pháp lý"] == "Sổ đỏ/ Sổ hồng"
+    assert data["Mã tin"] == "43768302"
+    assert len(data) == 12
+
+
+def test_nested_markup_follows_inner_text_lines():
+    data = extract_property_info(read_fixture("nested_markup.html"))
+    assert data["Khoảng giá"] == "5,5 tỷ"
+    assert data["Nội thất"] == "Đầy đủ\nĐiều hòa, tủ lạnh\nBàn ghế, giường tủ"
+    assert data["Loại tin"] == "Tin VIP Vàng\nĐẩy tin tự động"
+    assert "Mặt tiền" not in data
+
+
+def test_localserver_fixture_is_current():
+    assert read_fixture("localserver_detail.html") == detail_html(41234567)
+
+
+class FakeResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {"Content-Type": "text/html; charset=utf-8"}
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, timeout=None):
+        return self.response
+
+
+def test_recaptcha_script_is_not_blocked():
+    page = read_fixture("batdongsan_detail.html")
+    assert "captcha" in page[:5000].lower()
+    data, error = fetch_property_info("https://batdongsan.com.vn/x-pr43768302", FakeSession(FakeResponse(200, page)))
+    assert error is None
+    assert data["Mã tin"] == "43768302"
+
+
+@pytest.mark.parametrize("status, page", [
+    (403, "<html><body>Forbidden</body></html>"),
+    (200, "<html><head><title>Just a moment...</title></head><body><div id='cf-challenge'></div></body></html>"),
+])
+def test_block_page_without_data_is_blocked(status, page):
+    data, error = fetch_property_info("https://batdongsan.com.vn/x-pr1", FakeSession(FakeResponse(status, page)))
+    assert data == {}
+    assert error.startswith(BLOCKED_ERROR)
+
+
+@pytest.fixture(scope="module")
+def chrome():
+    webdriver = pytest.importorskip("selenium.webdriver")
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    try:
+        driver = webdriver.Chrome(options=options)
+    except Exception as e:
+        pytest.skip(f"Không khởi động được Chrome: {e}")
+    yield driver
+    driver.quit()
+
+
+@pytest.mark.parametrize("name", sorted(INNER_TEXT))
+def test_recorded_inner_text_matches_chrome(chrome, name):
+    chrome.get("file://" + os.path.join(FIXTURES_DIR, name))
+    assert chrome.execute_script(SPEC_TEXTS_SCRIPT, SPEC_SELECTORS) == INNER_TEXT[name]
+    assert extract_spec_data(chrome) == extract_property_info(read_fixture(name))
+
+
+@pytest.mark.parametrize("page", ["", "   \n", "<!-- -->"])
+def test_empty_body_is_incomplete(page):
+    assert extract_property_info(page) == {}
+    data, error = fetch_property_info("https://batdongsan.com.vn/x-pr1", FakeSession(FakeResponse(200, page)))
+    assert data == {}
+    assert error == INCOMPLETE_ERROR